@@ -1,14 +1,383 @@
 import os
-import google.generativeai as genai
+import re
+import sys
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from dataclasses import dataclass, asdict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from response_cache import cache_from_env
+from metrics import FALLBACKS, timed, record_error, record_usage
+from resilience import token_bucket, CircuitBreaker, ResilientCaller
+from llm_backends import router_from_env
+from traffic_replay import traffic_recorder, record_llm_call, arecord_llm_call, recorded_classification, recorded_batch_classification
+from prompts import CATEGORIES, PRIORITIES, CLASSIFY_JSON, CLASSIFY_TEXT, REPLY, CLASSIFY_BATCH, templates_version
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel('gemini-1.5-flash')
+# "json" asks Gemini for schema-constrained JSON; "text" keeps the older line-prefixed format.
+OUTPUT_MODE = os.getenv("AI_ENGINE_OUTPUT_MODE", "json").lower()
 
+# Send the static prompt instructions as a system instruction (cacheable) rather than inline in every prompt.
+SYSTEM_INSTRUCTION = os.getenv("AI_ENGINE_SYSTEM_INSTRUCTION", "true").lower() in ("1", "true", "yes")
+
+# Batch classification settings
+BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "20"))
+BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "4"))
+
+# Bounded pool used by backends without a native async client (local models, the stub),
+# so blocking calls never run on the event loop itself.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AI_ENGINE_WORKERS", "8")),
+    thread_name_prefix="ai-engine"
+)
+
+# Errors worth retrying: rate limiting, timeouts and transient server failures.
+def _is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    # Gemini errors only exist once the Gemini client has imported google.api_core, so look it up
+    # instead of importing it here.
+    google_exceptions = sys.modules.get("google.api_core.exceptions")
+    if google_exceptions is not None and isinstance(error, google_exceptions.GoogleAPICallError):
+        return error.code in (429, 500, 502, 503, 504)
+    return "429" in str(error)
+
+# Rate limit (per process, or host-wide with LLM_RATE_LIMIT_PATH), retry policy and circuit breaker around every Gemini call.
+llm_guard = ResilientCaller(
+    limiter=token_bucket(
+        rate=float(os.getenv("LLM_RATE_LIMIT_RPM", "0")) / 60,
+        capacity=float(os.getenv("LLM_RATE_LIMIT_BURST", "0")) or None,
+        # Set when running several API workers, so the RPM budget is shared rather than multiplied.
+        path=os.getenv("LLM_RATE_LIMIT_PATH") or None
+    ),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30"))
+    ),
+    retryable=_is_retryable,
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+    deadline=float(os.getenv("LLM_REQUEST_DEADLINE", "20")),
+    retry_ratio=float(os.getenv("LLM_RETRY_RATIO", "0.1"))
+)
+
+# Backends (Gemini, a local llama.cpp model, the test stub) and the rules that pick one per call.
+llm_router = router_from_env(gemini_guard=llm_guard, executor=_executor)
+
+# Calls the routed backend with a rendered Prompt; query and priority, when known, let cheap
+# requests go to the cheap backend. Calls are appended to the traffic log when TRAFFIC_MODE=record.
+def _generate(prompt, query=None, priority=None, **kwargs):
+    call = partial(
+        llm_router.generate,
+        prompt.text, query=query, priority=priority, system_instruction=prompt.system_instruction, **kwargs
+    )
+    return call() if traffic_recorder is None else record_llm_call(prompt, query, call)
+
+# Async version of _generate(); streamed replies are not recorded.
+async def _agenerate(prompt, query=None, priority=None, **kwargs):
+    call = partial(
+        llm_router.agenerate,
+        prompt.text, query=query, priority=priority, system_instruction=prompt.system_instruction, **kwargs
+    )
+    if traffic_recorder is None or kwargs.get("stream"):
+        return await call()
+    return await arecord_llm_call(prompt, query, call)
+
+# Marks where a recording starts, so replays of different engine versions can be told apart.
+if traffic_recorder is not None:
+    traffic_recorder.record(
+        "engine", time.time(), prompts=templates_version(), output_mode=OUTPUT_MODE, backends=",".join(llm_router.backends)
+    )
+
+# Shared cache of successful classifications (None when RESPONSE_CACHE_BACKEND=none), keyed under
+# the prompt templates' version so a template change never serves results produced by the old one.
+response_cache = cache_from_env(namespace=templates_version())
+
+# Optional local first-stage classifier, only imported when FAST_CLASSIFIER_PATH is configured.
+# It is loaded by warm_up() or on first use, since scikit-learn and the model take a while.
+fast_classifier = None
+_fast_classifier_loaded = False
+_fast_classifier_lock = threading.Lock()
+
+# Returns the fast-path classifier, loading it the first time; None when none is configured.
+def load_fast_classifier():
+    global fast_classifier, _fast_classifier_loaded
+    if not _fast_classifier_loaded:
+        with _fast_classifier_lock:
+            if not _fast_classifier_loaded:
+                if os.getenv("FAST_CLASSIFIER_PATH"):
+                    from fast_classifier import classifier_from_env
+                    fast_classifier = classifier_from_env()
+                _fast_classifier_loaded = True
+    return fast_classifier
+
+def warm_up():
+    """
+    Do the slow one-off setup now instead of on the first request: load the fast-path
+    model and build the LLM backend clients.
+
+    Returns:
+        dict: {component: True once ready}, with one "llm_<backend>" entry per backend
+    """
+    status = {"fast_classifier": load_fast_classifier() is not None or not os.getenv("FAST_CLASSIFIER_PATH")}
+    template = CLASSIFY_JSON if OUTPUT_MODE == "json" else CLASSIFY_TEXT
+    instructions = [template.system, REPLY.system, CLASSIFY_BATCH.system] if SYSTEM_INSTRUCTION else [None]
+    status.update({f"llm_{name}": ready for name, ready in llm_router.warm(instructions).items()})
+    return status
+
+# Past LLM classifications are appended here as training data for fast_classifier.py.
+CLASSIFICATION_LOG_PATH = os.getenv("CLASSIFICATION_LOG_PATH")
+_log_lock = threading.Lock()
+
+@dataclass(slots=True)
+class ClassificationResult:
+    """Validated classification of one query."""
+
+    category: str
+    priority: str
+    response: str
+    confidence: float
+
+    @classmethod
+    def from_item(cls, item):
+        """
+        Validate a decoded JSON object.
+
+        Raises:
+            ValueError: If a field is missing, out of range or not one of the allowed labels
+        """
+        if not isinstance(item, dict):
+            raise ValueError(f"Expected an object, got {type(item).__name__}")
+        category = _match_label(item.get("category"), CATEGORIES)
+        priority = _match_label(item.get("priority"), PRIORITIES)
+        response = item.get("response")
+        if not isinstance(response, str) or not response.strip():
+            raise ValueError("Missing response text")
+        try:
+            confidence = float(item.get("confidence", 0.8))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid confidence: {item.get('confidence')!r}")
+        return cls(category, priority, response.strip(), min(1.0, max(0.0, confidence)))
+
+    @classmethod
+    def from_json(cls, text):
+        """Decode and validate a JSON reply, raising ValueError if it is unusable."""
+        return cls.from_item(json.loads(_strip_code_fence(text)))
+
+    def to_dict(self):
+        return asdict(self)
+
+# Matches a label case-insensitively against the allowed values, returning the canonical spelling.
+def _match_label(value, allowed):
+    if isinstance(value, str):
+        for label in allowed:
+            if value.strip().lower() == label.lower():
+                return label
+    raise ValueError(f"Invalid label {value!r}, expected one of {allowed}")
+
+# Removes a Markdown code fence the model may wrap around JSON.
+def _strip_code_fence(text):
+    return re.sub(r"^```(?:json)?|```$", "", text.strip()).strip()
+
+# JSON schemas Gemini must follow in structured-output mode.
+_RESULT_PROPERTIES = {
+    "category": {"type": "string", "format": "enum", "enum": CATEGORIES},
+    "priority": {"type": "string", "format": "enum", "enum": PRIORITIES},
+    "response": {"type": "string"},
+    "confidence": {"type": "number"}
+}
+JSON_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": _RESULT_PROPERTIES,
+        "required": list(_RESULT_PROPERTIES)
+    }
+}
+BATCH_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {"index": {"type": "integer"}, **_RESULT_PROPERTIES},
+            "required": ["index", *_RESULT_PROPERTIES]
+        }
+    }
+}
+
+# Generation config for single-query calls in the configured output mode.
+def _generation_config():
+    return JSON_GENERATION_CONFIG if OUTPUT_MODE == "json" else None
+
+# Appends an LLM-produced classification to the training log, if one is configured.
+def _log_classification(query, result):
+    if not CLASSIFICATION_LOG_PATH:
+        return
+    record = json.dumps({
+        "query": query,
+        "category": result['category'],
+        "priority": result['priority'],
+        "confidence": result['confidence']
+    })
+    with _log_lock, open(CLASSIFICATION_LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(record + "\n")
+
+# Builds the classification prompt for a single query in the configured output mode.
+def _build_prompt(query):
+    if OUTPUT_MODE == "json":
+        return _build_json_prompt(query)
+    return _build_text_prompt(query)
+
+# Compact prompt for structured-output mode; the response schema carries the format and allowed labels.
+def _build_json_prompt(query):
+    return CLASSIFY_JSON.render(inline=not SYSTEM_INSTRUCTION, query=query)
+
+# Builds the line-prefixed classification prompt, also used for streaming.
+def _build_text_prompt(query):
+    return CLASSIFY_TEXT.render(inline=not SYSTEM_INSTRUCTION, query=query)
+
+# Builds a prompt that only asks for the reply text, used once the fast path has classified the query.
+def _build_response_prompt(query, category, priority):
+    return REPLY.render(inline=not SYSTEM_INSTRUCTION, query=query, category=category, priority=priority)
+
+# Runs the local classifier, returning its prediction only when it clears the confidence threshold.
+def _fast_path(query):
+    classifier = load_fast_classifier()
+    if classifier is None:
+        return None
+    try:
+        return classifier.predict(query)
+    except Exception as e:
+        print(f"Error in fast-path classification: {e}")
+        return None
+
+# Async version of _fast_path(). The first call loads the classifier on a worker thread, so a
+# request arriving during warm-up waits there instead of blocking the event loop on the load lock.
+async def _afast_path(query):
+    if not _fast_classifier_loaded:
+        await asyncio.to_thread(load_fast_classifier)
+    return _fast_path(query)
+
+# Merges a fast-path prediction with the generated reply text.
+def _fast_path_result(prediction, response_text):
+    return {
+        'category': prediction['category'],
+        'priority': prediction['priority'],
+        'response': response_text.strip() or "Thank you for your query. Our team will assist you shortly.",
+        'confidence': prediction['confidence']
+    }
+
+# Parses a reply in the configured output mode into the result dict.
+def _parse_result(result_text):
+    if OUTPUT_MODE == "json":
+        return ClassificationResult.from_json(result_text).to_dict()
+    return _parse_response(result_text)
+
+# Parses the model's line-prefixed reply into the result dict, filling defaults where needed.
+def _parse_response(result_text):
+    lines = result_text.strip().split('\n')
+    category = ""
+    priority = ""
+    ai_response = ""
+    confidence = 0.8  # Default confidence
+
+    for line in lines:
+        if line.startswith("Category:"):
+            category = line.replace("Category:", "").strip()
+        elif line.startswith("Priority:"):
+            priority = line.replace("Priority:", "").strip()
+        elif line.startswith("Response:"):
+            ai_response = line.replace("Response:", "").strip()
+        elif line.startswith("Confidence:"):
+            try:
+                confidence = float(line.replace("Confidence:", "").strip())
+            except ValueError:
+                confidence = 0.8
+
+    # If parsing failed, provide defaults
+    if not (category and priority and ai_response):
+        FALLBACKS.inc(reason="parse_default")
+    if not category:
+        category = "General Inquiry"
+    if not priority:
+        priority = "Medium"
+    if not ai_response:
+        ai_response = "Thank you for your query. Our team will assist you shortly."
+
+    return {
+        'category': category,
+        'priority': priority,
+        'response': ai_response,
+        'confidence': confidence
+    }
+
+# Builds one prompt that asks for a JSON array covering every query, keyed by its position.
+def _build_batch_prompt(queries):
+    numbered = "\n".join(f"[{i}] {q}" for i, q in enumerate(queries, start=1))
+    return CLASSIFY_BATCH.render(inline=not SYSTEM_INSTRUCTION, numbered=numbered)
+
+# Maps a batch reply back onto query positions; entries that are missing or malformed stay None.
+def _parse_batch_response(result_text, count):
+    results = [None] * count
+    try:
+        items = json.loads(_strip_code_fence(result_text))
+    except ValueError:
+        return results
+    if not isinstance(items, list):
+        return results
+
+    for item in items:
+        try:
+            index = int(item.get("index", 0)) - 1
+            result = ClassificationResult.from_item(item)
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if 0 <= index < count:
+            results[index] = result.to_dict()
+    return results
+
+# Result returned when the model call itself fails.
+def _error_result():
+    FALLBACKS.inc(reason="error")
+    return {
+        'category': 'General Inquiry',
+        'priority': 'Medium',
+        'response': 'We apologize for the inconvenience. Please try again or contact support.',
+        'confidence': 0.5,
+        'fallback': 'error'
+    }
+
+# Result used when Gemini cannot be reached: the local classifier's best guess if one is loaded.
+# Both fallbacks carry a 'fallback' key naming where they came from, so bulk callers can retry them.
+def _fallback_result(query):
+    classifier = load_fast_classifier()
+    if classifier is not None:
+        try:
+            prediction = classifier.predict_many([query])[0]
+        except Exception as e:
+            print(f"Error in fallback classification: {e}")
+        else:
+            FALLBACKS.inc(reason="local_classifier")
+            return {
+                'category': prediction['category'],
+                'priority': prediction['priority'],
+                'response': (
+                    f"Thank you for contacting us. Our team has received your {prediction['category'].lower()} "
+                    "request and will get back to you shortly."
+                ),
+                'confidence': prediction['confidence'],
+                'fallback': 'local_classifier'
+            }
+    return _error_result()
+
+@recorded_classification
 def classify_query(query):
     """
     Classify customer query into category, predict priority, generate response, and estimate confidence.
@@ -23,71 +392,420 @@ def classify_query(query):
             'response': str,
             'confidence': float
         }
+        plus 'fallback' ('local_classifier' or 'error') when the model could not be used.
     """
-    prompt = f"""
-    Analyze the following customer query and provide:
-    1. Category: Choose from [Billing, Technical Issue, Product Inquiry, Feedback, General Inquiry]
-    2. Priority: Choose from [Low, Medium, High] based on urgency
-    3. Automated Response: A helpful response to the customer
-    4. Confidence Score: A score from 0.0 to 1.0 indicating how confident you are in the classification
-
-    Query: {query}
-
-    Format your response as:
-    Category: [category]
-    Priority: [priority]
-    Response: [response text]
-    Confidence: [score]
-    """
+    if response_cache is not None:
+        cached = response_cache.get(query)
+        if cached is not None:
+            return cached
+    return _classify(query, _fast_path(query))
+
+# Classifies one uncached query: with the fast path's prediction the LLM only writes the reply, and is
+# routed by the predicted priority; without one it does the whole classification.
+def _classify(query, prediction):
+    with timed("prompt_build"):
+        prompt = (
+            _build_prompt(query) if prediction is None
+            else _build_response_prompt(query, prediction['category'], prediction['priority'])
+        )
 
     try:
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-
-        # Parse the response
-        lines = result_text.split('\n')
-        category = ""
-        priority = ""
-        ai_response = ""
-        confidence = 0.8  # Default confidence
-
-        for line in lines:
-            if line.startswith("Category:"):
-                category = line.replace("Category:", "").strip()
-            elif line.startswith("Priority:"):
-                priority = line.replace("Priority:", "").strip()
-            elif line.startswith("Response:"):
-                ai_response = line.replace("Response:", "").strip()
-            elif line.startswith("Confidence:"):
-                try:
-                    confidence = float(line.replace("Confidence:", "").strip())
-                except ValueError:
-                    confidence = 0.8
-
-        # If parsing failed, provide defaults
-        if not category:
-            category = "General Inquiry"
-        if not priority:
-            priority = "Medium"
-        if not ai_response:
-            ai_response = "Thank you for your query. Our team will assist you shortly."
+        with timed("generate_content"):
+            response = _generate(
+                prompt,
+                query=query,
+                priority=prediction['priority'] if prediction is not None else None,
+                generation_config=_generation_config() if prediction is None else None
+            )
+        record_usage(response, prompt.key)
+        with timed("parse"):
+            if prediction is None:
+                result = _parse_result(response.text)
+            else:
+                result = _fast_path_result(prediction, response.text)
+        if prediction is None:
+            _log_classification(query, result)
+        if response_cache is not None:
+            response_cache.set(query, result)
+        return result
 
-        return {
-            'category': category,
-            'priority': priority,
-            'response': ai_response,
-            'confidence': confidence
-        }
+    except Exception as e:
+        print(f"Error in classification: {e}")
+        record_error("classification", e)
+        return _fallback_result(query)
+
+@recorded_classification
+async def aclassify_query(query):
+    """
+    Async counterpart of classify_query() that never blocks the event loop.
+
+    Uses the backend's native async client when it has one (Gemini); blocking
+    backends run on the engine's bounded worker pool.
+
+    Args:
+        query (str): Customer query text
+
+    Returns:
+        dict: Same shape as classify_query()
+    """
+    if response_cache is not None:
+        cached = await response_cache.aget(query)
+        if cached is not None:
+            return cached
+    return await _aclassify(query, await _afast_path(query))
+
+# Async version of _classify().
+async def _aclassify(query, prediction):
+    with timed("prompt_build"):
+        prompt = (
+            _build_prompt(query) if prediction is None
+            else _build_response_prompt(query, prediction['category'], prediction['priority'])
+        )
+
+    try:
+        with timed("generate_content"):
+            response = await _agenerate(
+                prompt,
+                query=query,
+                priority=prediction['priority'] if prediction is not None else None,
+                generation_config=_generation_config() if prediction is None else None
+            )
+        record_usage(response, prompt.key)
+        with timed("parse"):
+            if prediction is None:
+                result = _parse_result(response.text)
+            else:
+                result = _fast_path_result(prediction, response.text)
+        if prediction is None:
+            _log_classification(query, result)
+        if response_cache is not None:
+            await response_cache.aset(query, result)
+        return result
 
     except Exception as e:
         print(f"Error in classification: {e}")
+        record_error("classification", e)
+        return _fallback_result(query)
+
+# Sends one batch prompt and falls back to classify_query() for any item the reply did not cover.
+# When the call itself fails, every item gets the fallback result: the upstream is already failing,
+# and one call per item would only add load to it.
+def _classify_batch(queries):
+    try:
+        with timed("prompt_build"):
+            prompt = _build_batch_prompt(queries)
+        with timed("generate_content"):
+            response = _generate(prompt, generation_config=BATCH_GENERATION_CONFIG)
+        record_usage(response, prompt.key)
+        with timed("parse"):
+            results = _parse_batch_response(response.text, len(queries))
+    except Exception as e:
+        print(f"Error in batch classification: {e}")
+        record_error("batch_classification", e)
+        return [_fallback_result(query) for query in queries]
+
+    for i, result in enumerate(results):
+        if result is None:
+            FALLBACKS.inc(reason="batch_item")
+            results[i] = classify_query(queries[i])
+            continue
+        _log_classification(queries[i], result)
+        if response_cache is not None:
+            response_cache.set(queries[i], result)
+    return results
+
+@recorded_batch_classification
+def classify_queries(queries, batch_size=None, max_concurrency=None):
+    """
+    Classify many customer queries, packing them into as few LLM calls as possible.
+
+    Cached queries are answered directly, and queries the fast path classifies only
+    need their reply generated, one call each. The rest are split into batches of
+    batch_size, each sent as a single prompt, with up to max_concurrency calls
+    in flight. Items a batch reply fails to cover are classified individually; when
+    a batch call fails, its items get fallback results.
+
+    Args:
+        queries (list[str]): Customer query texts
+        batch_size (int): Queries per prompt (defaults to AI_BATCH_SIZE)
+        max_concurrency (int): Batches sent in parallel (defaults to AI_BATCH_CONCURRENCY)
+
+    Returns:
+        list[dict]: One classify_query()-shaped dict per query, in input order
+    """
+    batch_size = batch_size or BATCH_SIZE
+    max_concurrency = max_concurrency or BATCH_CONCURRENCY
+    results = [None] * len(queries)
+
+    pending = []
+    predicted = []  # (index, fast-path prediction)
+    for i, query in enumerate(queries):
+        cached = response_cache.get(query) if response_cache is not None else None
+        if cached is not None:
+            results[i] = cached
+            continue
+        prediction = _fast_path(query)
+        if prediction is not None:
+            predicted.append((i, prediction))
+        else:
+            pending.append(i)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    # Calls run in this call's context, so traffic recording sees their fallbacks as part of it.
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches) + len(predicted)))) as pool:
+        single_results = [
+            pool.submit(lambda i, prediction: context.copy().run(_classify, queries[i], prediction), i, prediction)
+            for i, prediction in predicted
+        ]
+        batch_results = pool.map(
+            lambda batch: context.copy().run(_classify_batch, [queries[i] for i in batch]), batches
+        )
+        for batch, batch_result in zip(batches, batch_results):
+            for i, result in zip(batch, batch_result):
+                results[i] = result
+        for (i, _), future in zip(predicted, single_results):
+            results[i] = future.result()
+
+    return results
+
+# Async version of _classify_batch().
+async def _aclassify_batch(queries):
+    try:
+        with timed("prompt_build"):
+            prompt = _build_batch_prompt(queries)
+        with timed("generate_content"):
+            response = await _agenerate(prompt, generation_config=BATCH_GENERATION_CONFIG)
+        record_usage(response, prompt.key)
+        with timed("parse"):
+            results = _parse_batch_response(response.text, len(queries))
+    except Exception as e:
+        print(f"Error in batch classification: {e}")
+        record_error("batch_classification", e)
+        return [_fallback_result(query) for query in queries]
+
+    for i, result in enumerate(results):
+        if result is None:
+            FALLBACKS.inc(reason="batch_item")
+            results[i] = await aclassify_query(queries[i])
+            continue
+        _log_classification(queries[i], result)
+        if response_cache is not None:
+            await response_cache.aset(queries[i], result)
+    return results
+
+@recorded_batch_classification
+async def aclassify_queries(queries, batch_size=None, max_concurrency=None):
+    """
+    Async counterpart of classify_queries().
+
+    Args:
+        queries (list[str]): Customer query texts
+        batch_size (int): Queries per prompt (defaults to AI_BATCH_SIZE)
+        max_concurrency (int): Batches sent in parallel (defaults to AI_BATCH_CONCURRENCY)
+
+    Returns:
+        list[dict]: One classify_query()-shaped dict per query, in input order
+    """
+    batch_size = batch_size or BATCH_SIZE
+    semaphore = asyncio.Semaphore(max_concurrency or BATCH_CONCURRENCY)
+    results = [None] * len(queries)
+
+    pending = []
+    predicted = []  # (index, fast-path prediction)
+    for i, query in enumerate(queries):
+        cached = await response_cache.aget(query) if response_cache is not None else None
+        if cached is not None:
+            results[i] = cached
+            continue
+        prediction = await _afast_path(query)
+        if prediction is not None:
+            predicted.append((i, prediction))
+        else:
+            pending.append(i)
+
+    async def run(batch):
+        async with semaphore:
+            batch_result = await _aclassify_batch([queries[i] for i in batch])
+        for i, result in zip(batch, batch_result):
+            results[i] = result
+
+    async def run_predicted(i, prediction):
+        async with semaphore:
+            results[i] = await _aclassify(queries[i], prediction)
+
+    await asyncio.gather(
+        *(run(pending[i:i + batch_size]) for i in range(0, len(pending), batch_size)),
+        *(run_predicted(i, prediction) for i, prediction in predicted)
+    )
+    return results
+
+class _StreamParser:
+    """
+    Incremental parser for the line-prefixed reply format.
+
+    feed() returns (event, value) pairs as soon as they can be parsed: category and
+    priority once their line is complete, and response text chunk by chunk.
+    """
+
+    _CONFIDENCE = "\nConfidence:"
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_response = False
+        self.category = ""
+        self.priority = ""
+        self.response = ""
+        self.confidence = 0.8
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        while True:
+            if self.in_response:
+                end = self.buffer.find(self._CONFIDENCE)
+                if end == -1:
+                    # Hold back a possible partial "\nConfidence:" marker until the next chunk.
+                    safe = max(0, len(self.buffer) - len(self._CONFIDENCE) + 1)
+                    events += self._response_text(self.buffer[:safe])
+                    self.buffer = self.buffer[safe:]
+                    return events
+                events += self._response_text(self.buffer[:end])
+                self.buffer = self.buffer[end + 1:]
+                self.in_response = False
+                continue
+
+            # Switch to streaming as soon as the Response: prefix arrives, without waiting for its line to end.
+            stripped = self.buffer.lstrip()
+            if stripped.startswith("Response:"):
+                self.in_response = True
+                self.buffer = stripped[len("Response:"):]
+                continue
+
+            end = self.buffer.find("\n")
+            if end == -1:
+                return events
+            line, self.buffer = self.buffer[:end].strip(), self.buffer[end + 1:]
+            events += self._line(line)
+
+    def close(self):
+        events = self._response_text(self.buffer) if self.in_response else self._line(self.buffer.strip())
+        self.buffer = ""
+        return events
+
+    def _response_text(self, text):
+        if not self.response:
+            text = text.lstrip()
+        if not text:
+            return []
+        self.response += text
+        return [("token", text)]
+
+    def _line(self, line):
+        if line.startswith("Category:"):
+            self.category = line.replace("Category:", "").strip()
+            return [("category", self.category)]
+        if line.startswith("Priority:"):
+            self.priority = line.replace("Priority:", "").strip()
+            return [("priority", self.priority)]
+        if line.startswith("Response:"):
+            self.in_response = True
+            return self._response_text(line.replace("Response:", "", 1))
+        if line.startswith("Confidence:"):
+            try:
+                self.confidence = float(line.replace("Confidence:", "").strip())
+            except ValueError:
+                self.confidence = 0.8
+        return []
+
+    def result(self):
         return {
-            'category': 'General Inquiry',
-            'priority': 'Medium',
-            'response': 'We apologize for the inconvenience. Please try again or contact support.',
-            'confidence': 0.5
+            'category': self.category or "General Inquiry",
+            'priority': self.priority or "Medium",
+            'response': self.response.strip() or "Thank you for your query. Our team will assist you shortly.",
+            'confidence': self.confidence
         }
 
+# Replays a finished result as stream events.
+def _result_events(result):
+    return [
+        ("category", result['category']),
+        ("priority", result['priority']),
+        ("token", result['response']),
+        ("done", result)
+    ]
+
+async def astream_classify_query(query):
+    """
+    Stream a classification as it is generated.
+
+    Yields ("category", str) and ("priority", str) as soon as each is known, then
+    ("token", str) chunks of the response text, and finally ("done", dict) with the
+    same dict shape classify_query() returns.
+
+    Args:
+        query (str): Customer query text
+    """
+    if response_cache is not None:
+        cached = await response_cache.aget(query)
+        if cached is not None:
+            for event in _result_events(cached):
+                yield event
+            return
+
+    prediction = await _afast_path(query)
+    if prediction is not None:
+        yield ("category", prediction['category'])
+        yield ("priority", prediction['priority'])
+        prompt = _build_response_prompt(query, prediction['category'], prediction['priority'])
+    else:
+        # Streaming needs a format that can be parsed before the reply is complete.
+        prompt = _build_text_prompt(query)
+
+    parser = _StreamParser()
+    completed = False
+    try:
+        with timed("generate_content"):
+            response = await _agenerate(
+                prompt,
+                query=query,
+                priority=prediction['priority'] if prediction is not None else None,
+                stream=True
+            )
+            chunk = None
+            async for chunk in response:
+                if prediction is not None:
+                    parser.response += chunk.text
+                    yield ("token", chunk.text)
+                else:
+                    for event in parser.feed(chunk.text):
+                        yield event
+        # Usage metadata on the final chunk covers the whole stream.
+        record_usage(chunk, prompt.key)
+        completed = True
+    except Exception as e:
+        print(f"Error in streaming classification: {e}")
+        record_error("stream_classification", e)
+        if not parser.response:
+            for event in _result_events(_fallback_result(query)):
+                yield event
+            return
+
+    if prediction is not None:
+        result = _fast_path_result(prediction, parser.response)
+    else:
+        for event in parser.close():
+            yield event
+        result = parser.result()
+
+    # Only complete replies are worth keeping; a stream cut off mid-response is not.
+    if completed:
+        if prediction is None:
+            _log_classification(query, result)
+        if response_cache is not None:
+            await response_cache.aset(query, result)
+    yield ("done", result)
+
 # Test the function
 if __name__ == "__main__":
     test_query = "I can't access my account after the recent update."
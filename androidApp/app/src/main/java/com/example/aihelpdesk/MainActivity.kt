@@ -93,7 +93,7 @@ class MainActivity : AppCompatActivity() {
 
         val jsonObjectRequest = JsonObjectRequest(
             Request.Method.POST,
-            "$API_URL/create_case",
+            "$API_URL/create_case?compact=true",
             jsonObject,
             { response ->
                 // Handle success
@@ -163,6 +163,7 @@ class MainActivity : AppCompatActivity() {
                 // Salesforce status
                 val caseId = response.optString("salesforce_case_id", "")
                 val status = response.optString("salesforce_status", "")
+                val trackingId = if (response.isNull("salesforce_tracking_id")) "" else response.optString("salesforce_tracking_id", "")
                 val escalated = response.getBoolean("escalated")
 
                 if (caseId.isNotEmpty()) {
@@ -170,6 +171,11 @@ class MainActivity : AppCompatActivity() {
                     if (escalated) {
                         salesforceStatusText.append("\n\n🚨 Escalated to human agent")
                     }
+                } else if (trackingId.isNotEmpty()) {
+                    salesforceStatusText.text = "📨 Case queued for Salesforce\n\n📋 Tracking ID: $trackingId\n📊 Status: $status"
+                    if (escalated) {
+                        salesforceStatusText.append("\n\n🚨 Escalated to human agent")
+                    }
                 } else {
                     salesforceStatusText.text = "❌ Failed to create Salesforce case\n\nPlease check your backend configuration"
                 }
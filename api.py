@@ -1,17 +1,274 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional
-from ai_engine import classify_query
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import ai_engine
+from ai_engine import aclassify_query, aclassify_queries, astream_classify_query, response_cache, llm_guard, llm_router, SYSTEM_INSTRUCTION
 from salesforce_integration import sf_integration
+from request_coalescer import RequestCoalescer
+from case_queue import queue_from_env
+from priority_scheduler import pre_score, priority_class, scheduler_from_env
+from traffic_replay import traffic_stats
+from job_queue import JobWorkerPool, process_job, store_from_env as job_store_from_env
+from functools import partial
+from contextlib import asynccontextmanager, nullcontext
+from metrics import REGISTRY, HANDLER_SECONDS, SamplingProfiler, token_usage_by_prompt
+from prompts import templates_version
+from local_state import state_dir
+import os
+import json
+import time
+import asyncio
 import uvicorn
 
+# orjson encodes responses several times faster than the standard json module; optional.
+try:
+    from fastapi.responses import ORJSONResponse
+    import orjson  # noqa: F401  (ORJSONResponse needs it at render time)
+    FastJSONResponse = ORJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+# Brotli compresses JSON better than gzip when brotli-asgi is installed; optional.
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# Starts the background workers and kicks off warm-up; on shutdown, drains them.
+@asynccontextmanager
+async def lifespan(app):
+    global job_store, job_workers
+    if coalescer is not None:
+        await coalescer.start()
+    if case_queue is not None:
+        case_queue.start()
+    if BACKGROUND_JOBS:
+        job_store = await asyncio.to_thread(job_store_from_env)
+        job_workers = JobWorkerPool(
+            job_store,
+            threads=int(os.getenv("JOB_WORKERS", "2")),
+            handler=partial(process_job, create_case=deduplicator.create_case) if deduplicator else process_job
+        )
+        job_workers.start()
+    if profiler is not None:
+        profiler.start()
+    # Warm-up runs while the server is already answering, so liveness checks never wait on it.
+    warm_up_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        if profiler is not None:
+            profiler.stop()
+        if coalescer is not None:
+            await coalescer.stop()
+        if case_queue is not None:
+            # Flushing is blocking network I/O, so keep it off the event loop.
+            await asyncio.to_thread(case_queue.stop)
+        if job_workers is not None:
+            # Running jobs finish; queued ones stay in the store for the next start.
+            await asyncio.to_thread(job_workers.stop)
+
 # Initializes the FastAPI app with metadata.
-app = FastAPI(title="AI-Powered Helpdesk Automation", version="1.0.0")
+app = FastAPI(
+    title="AI-Powered Helpdesk Automation",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least minimum_size bytes for clients that accept it: Brotli when
+    brotli-asgi is installed (falling back to gzip for clients without br), gzip otherwise.
+    Server-sent event streams are left alone, since a compressor would hold events back.
+    """
+
+    def __init__(self, app, minimum_size=500, exclude_paths=()):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, quality=4, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=6)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in self.exclude_paths:
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+# Responses below COMPRESS_MIN_BYTES are sent as they are; 0 turns compression off.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "500"))
+if COMPRESS_MIN_BYTES > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES, exclude_paths={"/predict/stream"})
+
+# Optional micro-batching of /predict: concurrent queries are merged into batched LLM calls.
+coalescer = None
+if os.getenv("PREDICT_COALESCE", "false").lower() in ("1", "true", "yes"):
+    coalescer = RequestCoalescer(
+        max_wait_ms=float(os.getenv("PREDICT_COALESCE_WAIT_MS", "10")),
+        max_batch=int(os.getenv("PREDICT_COALESCE_MAX_BATCH", "16"))
+    )
+
+# Optional write-behind queue: /create_case returns a tracking ID and cases are created in groups.
+case_queue = None
+if os.getenv("SALESFORCE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes"):
+    case_queue = queue_from_env(sf_integration)
+
+# Optional priority scheduling: escalated and high-priority tickets get classification and Salesforce
+# slots ahead of the backlog (None when PRIORITY_SCHEDULING is off).
+classify_scheduler = scheduler_from_env("classify", default_concurrency=16)
+salesforce_scheduler = scheduler_from_env("salesforce", default_concurrency=8)
+
+# Upper bound on IDs per GET /cases request.
+MAX_CASE_LOOKUP = int(os.getenv("CASE_LOOKUP_MAX_IDS", "2000"))
+
+# Upper bounds on items per POST /predict/batch request and on the queries packed into one prompt.
+MAX_BATCH_ITEMS = int(os.getenv("PREDICT_BATCH_MAX_ITEMS", "1000"))
+MAX_BATCH_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "100"))
+
+# Optional duplicate detection: near-identical reports within the window become Tasks on one parent case
+# (imported only when enabled, since it pulls in numpy).
+deduplicator = None
+if os.getenv("DUPLICATE_DETECTION", "false").lower() in ("1", "true", "yes"):
+    from duplicate_detector import deduplicator_from_env
+    deduplicator = deduplicator_from_env(sf_integration)
+    # Duplicates attach a Task to the parent case's ID, which a queued case does not have yet.
+    if case_queue is not None:
+        raise ValueError("DUPLICATE_DETECTION cannot be combined with SALESFORCE_WRITE_BEHIND")
+
+# Optional durable job store behind POST /jobs, opened at startup; JOB_WORKERS in-process worker threads
+# drain it (set it to 0 when running `python job_queue.py worker` processes instead).
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "false").lower() in ("1", "true", "yes")
+job_store = None
+job_workers = None
+
+# Opt-in sampling profiler for finding hot paths under real load (see GET /debug/profile).
+profiler = None
+if os.getenv("PROFILE_SAMPLING", "false").lower() in ("1", "true", "yes"):
+    profiler = SamplingProfiler(interval=float(os.getenv("PROFILE_INTERVAL_MS", "10")) / 1000)
+
+# Component stats exposed as gauges on GET /metrics.
+REGISTRY.register_collector("helpdesk_response_cache", lambda: response_cache.stats() if response_cache else None)
+REGISTRY.register_collector("helpdesk_fast_path", lambda: ai_engine.fast_classifier.stats() if ai_engine.fast_classifier else None)
+REGISTRY.register_collector("helpdesk_coalescer", lambda: coalescer.stats() if coalescer else None)
+REGISTRY.register_collector("helpdesk_scheduler_classify", lambda: classify_scheduler.stats() if classify_scheduler else None)
+REGISTRY.register_collector("helpdesk_scheduler_salesforce", lambda: salesforce_scheduler.stats() if salesforce_scheduler else None)
+REGISTRY.register_collector("helpdesk_case_queue", lambda: case_queue.stats() if case_queue else None)
+REGISTRY.register_collector("helpdesk_salesforce", lambda: sf_integration.session_manager.metrics())
+REGISTRY.register_collector("helpdesk_case_cache", sf_integration.case_cache_stats)
+REGISTRY.register_collector("helpdesk_llm_circuit", lambda: llm_guard.breaker.stats())
+REGISTRY.register_collector("helpdesk_llm_router", llm_router.stats)
+REGISTRY.register_collector("helpdesk_jobs", lambda: job_workers.stats() if job_workers else None)
+REGISTRY.register_collector("helpdesk_traffic", traffic_stats)
+REGISTRY.register_collector("helpdesk_duplicates", lambda: deduplicator.stats() if deduplicator else None)
+
+# Response fields that only echo the request; ?compact=true leaves them out.
+ECHOED_FIELDS = {"customer_name", "query"}
+
+# Parses ?fields= against a response model, rejecting names the model does not have.
+def _field_selection(fields, model):
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)} (available: {', '.join(model.model_fields)})"
+        )
+    return selected
+
+# Applies ?fields= (keep only those) or ?compact=true (drop echoed and empty fields) to one result.
+def _shape(data, compact=False, selected=None):
+    if selected:
+        return {f: data[f] for f in selected}
+    if compact:
+        return {k: v for k, v in data.items() if k not in ECHOED_FIELDS and v is not None}
+    return data
+
+# Renders an already validated result with the fast encoder, so FastAPI does not validate and encode
+# it a second time through response_model (which still documents the full shape).
+def _json(content, headers=None):
+    return FastJSONResponse(content, headers=headers)
+
+# Formats stage durations in seconds as a Server-Timing header, so clients can see where a request's time went.
+def server_timing(**stages):
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items())
+
+# Holds a slot of the stage's scheduler for the block, yielding the seconds waited; no-op when scheduling is off.
+def scheduled(scheduler, priority_class):
+    if scheduler is None:
+        return nullcontext(0.0)
+    return scheduler.slot(priority_class)
+
+# Estimated scheduling class of a request before it is classified (None when scheduling is off).
+def pre_scored(request, escalated=False):
+    if classify_scheduler is None:
+        return None
+    return pre_score(request.query, escalated, request.customer_tier, ai_engine.fast_classifier)
+
+# Records total handler time per route.
+@app.middleware("http")
+async def time_handlers(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HANDLER_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
+# Components GET /ready waits for: "llm" (every LLM backend), "fast_classifier", "salesforce".
+READY_REQUIRES = [c.strip() for c in os.getenv("READY_REQUIRES", "llm,fast_classifier").split(",") if c.strip()]
+WARM_UP_RETRY_INTERVAL = float(os.getenv("WARM_UP_RETRY_INTERVAL", "10"))
+
+# Warm-up progress reported by GET /ready.
+warm_up_state = {"components": {}, "seconds": None}
+
+# Component is ready, where "llm" stands for all LLM backends.
+def _component_ready(component):
+    components = warm_up_state["components"]
+    if component == "llm":
+        llm = [ready for name, ready in components.items() if name.startswith("llm_")]
+        return bool(llm) and all(llm)
+    return components.get(component, False)
+
+# Logs in to Salesforce, builds the LLM clients and loads the fast-path model, retrying whatever
+# is not ready yet until every required component is.
+async def warm_up():
+    start = time.perf_counter()
+    while True:
+        engine, salesforce = await asyncio.gather(
+            asyncio.to_thread(ai_engine.warm_up),
+            asyncio.to_thread(sf_integration.connect),
+            return_exceptions=True
+        )
+        if isinstance(engine, Exception):
+            print(f"Error warming up AI engine: {engine}")
+            engine = {}
+        warm_up_state["components"] = {**engine, "salesforce": salesforce is True}
+        if all(_component_ready(c) for c in READY_REQUIRES):
+            warm_up_state["seconds"] = time.perf_counter() - start
+            return
+        await asyncio.sleep(WARM_UP_RETRY_INTERVAL)
 
 # Input for prediction endpoint.
 class QueryRequest(BaseModel):
     customer_name: str
     query: str
+    customer_tier: Optional[str] = None
 
 # Output of prediction endpoint.
 class PredictionResponse(BaseModel):
@@ -22,11 +279,21 @@ class PredictionResponse(BaseModel):
     response: str
     confidence: float
 
+# Input for batch prediction endpoint.
+class BatchQueryRequest(BaseModel):
+    items: List[QueryRequest] = Field(..., max_length=MAX_BATCH_ITEMS)
+    batch_size: Optional[int] = Field(None, gt=0, le=MAX_BATCH_SIZE)
+
+# Output of batch prediction endpoint, in the same order as the request items.
+class BatchPredictionResponse(BaseModel):
+    results: List[PredictionResponse]
+
 # Input for case creation endpoint.
 class CaseCreationRequest(BaseModel):
     customer_name: str
     query: str
     escalated: bool = False
+    customer_tier: Optional[str] = None
 
 # Output of case creation endpoint.
 class CaseCreationResponse(BaseModel):
@@ -38,49 +305,187 @@ class CaseCreationResponse(BaseModel):
     confidence: float
     salesforce_case_id: Optional[str] = None
     salesforce_status: Optional[str] = None
+    salesforce_tracking_id: Optional[str] = None
+    salesforce_task_id: Optional[str] = None
+    duplicate: bool = False
     escalated: bool
 
-# Accepts customer name and query and then calls the classify_query() to get:
+# Delivery state of a case accepted by the write-behind queue.
+class QueuedCaseStatus(BaseModel):
+    tracking_id: str
+    state: str
+    case_id: Optional[str] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+# Accepted background job.
+class JobSubmission(BaseModel):
+    job_id: str
+    status: str
+
+# State of a background job; result is filled in once status is done.
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    attempts: int
+    result: Optional[CaseCreationResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+# Accepts customer name and query and then awaits aclassify_query() to get:
 # Category, Priority, AI-generated response, Confidence score and Returns the prediction in structured format.
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(request: QueryRequest):
+async def predict(request: QueryRequest, compact: bool = False, fields: Optional[str] = None):
     """
     Predict category, priority, and generate response for customer query.
+
+    ?compact=true omits the echoed customer_name and query; ?fields=category,priority returns only those fields.
     """
+    selected = _field_selection(fields, PredictionResponse)
     try:
-        result = classify_query(request.query)
-        return PredictionResponse(
+        async with scheduled(classify_scheduler, pre_scored(request)):
+            if coalescer is not None:
+                result = await coalescer.classify(request.query)
+            else:
+                result = await aclassify_query(request.query)
+        return _json(_shape(PredictionResponse(
             customer_name=request.customer_name,
             query=request.query,
             category=result['category'],
             priority=result['priority'],
             response=result['response'],
             confidence=result['confidence']
-        )
+        ).model_dump(), compact, selected))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-# Accepts customer name, query, and escalation flag, then calls the classify_query() to get predictions, sf_integration.create_case() to create a Salesforce case and finally returns prediction, Salesforce case ID and status.
+# Formats one server-sent event.
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Streams the prediction as server-sent events: category and priority as soon as they are parsed,
+# then the response text token by token, and finally a done event carrying the full PredictionResponse.
+@app.post("/predict/stream")
+async def predict_stream(request: QueryRequest):
+    """
+    Stream category, priority, and the generated response for a customer query.
+    """
+    async def events():
+        try:
+            async for event, value in astream_classify_query(request.query):
+                if event == "done":
+                    yield _sse("done", PredictionResponse(
+                        customer_name=request.customer_name,
+                        query=request.query,
+                        category=value['category'],
+                        priority=value['priority'],
+                        response=value['response'],
+                        confidence=value['confidence']
+                    ).model_dump())
+                elif event == "token":
+                    yield _sse("token", {"text": value})
+                else:
+                    yield _sse(event, {event: value})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Prediction failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Accepts a list of customer queries and classifies them with aclassify_queries(), which packs
+# many queries into each LLM call, then returns one prediction per item in request order.
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(request: BatchQueryRequest, compact: bool = False, fields: Optional[str] = None):
+    """
+    Predict category, priority, and generate responses for many customer queries at once.
+
+    ?compact= and ?fields= apply to each result as on /predict.
+    """
+    selected = _field_selection(fields, PredictionResponse)
+    try:
+        start = time.perf_counter()
+        results = await aclassify_queries(
+            [item.query for item in request.items],
+            batch_size=request.batch_size
+        )
+        timing = server_timing(classify=time.perf_counter() - start)
+        return _json({"results": [
+            _shape(PredictionResponse(
+                customer_name=item.customer_name,
+                query=item.query,
+                category=result['category'],
+                priority=result['priority'],
+                response=result['response'],
+                confidence=result['confidence']
+            ).model_dump(), compact, selected)
+            for item, result in zip(request.items, results)
+        ]}, headers={"Server-Timing": timing})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+# Accepts customer name, query, and escalation flag, then awaits aclassify_query() to get predictions, sf_integration.acreate_case() to create a Salesforce case and finally returns prediction, Salesforce case ID and status.
 @app.post("/create_case", response_model=CaseCreationResponse)
-async def create_case(request: CaseCreationRequest):
+async def create_case(request: CaseCreationRequest, compact: bool = False, fields: Optional[str] = None):
     """
     Predict category, priority, generate response, and create Salesforce case.
+
+    ?compact=true omits the echoed customer_name and query and unset fields; ?fields= returns only the listed fields.
     """
+    selected = _field_selection(fields, CaseCreationResponse)
     try:
         # Get AI prediction
-        result = classify_query(request.query)
+        start = time.perf_counter()
+        waits = {}
+        async with scheduled(classify_scheduler, pre_scored(request, request.escalated)) as waited:
+            result = await aclassify_query(request.query)
+        classified = time.perf_counter()
+        if classify_scheduler is not None:
+            waits["classify_queue"] = waited
 
-        # Create Salesforce case
-        sf_result = sf_integration.create_case(
-            customer_name=request.customer_name,
-            query=request.query,
-            category=result['category'],
-            priority=result['priority'],
-            ai_response=result['response'],
-            escalated=request.escalated
-        )
+        # Create Salesforce case, or hand it to the write-behind queue (which never runs with duplicate
+        # detection; its flushes are background calls, so the Salesforce scheduler does not apply)
+        if case_queue is not None:
+            sf_result = case_queue.enqueue(
+                customer_name=request.customer_name,
+                query=request.query,
+                category=result['category'],
+                priority=result['priority'],
+                ai_response=result['response'],
+                escalated=request.escalated
+            )
+        else:
+            # The classified priority replaces the pre-score for the Salesforce stage.
+            cls = priority_class(result['priority'], request.escalated, request.customer_tier)
+            async with scheduled(salesforce_scheduler, cls) as waited:
+                if deduplicator is not None:
+                    # On the Salesforce pool, like acreate_case(), so Salesforce concurrency stays bounded.
+                    sf_result = await sf_integration._run_async(
+                        deduplicator.create_case,
+                        customer_name=request.customer_name,
+                        query=request.query,
+                        category=result['category'],
+                        priority=result['priority'],
+                        ai_response=result['response'],
+                        escalated=request.escalated
+                    )
+                else:
+                    sf_result = await sf_integration.acreate_case(
+                        customer_name=request.customer_name,
+                        query=request.query,
+                        category=result['category'],
+                        priority=result['priority'],
+                        ai_response=result['response'],
+                        escalated=request.escalated
+                    )
+            if salesforce_scheduler is not None:
+                waits["salesforce_queue"] = waited
 
-        return CaseCreationResponse(
+        timing = server_timing(classify=classified - start, salesforce=time.perf_counter() - classified, **waits)
+        return _json(_shape(CaseCreationResponse(
             customer_name=request.customer_name,
             query=request.query,
             category=result['category'],
@@ -89,14 +494,242 @@ async def create_case(request: CaseCreationRequest):
             confidence=result['confidence'],
             salesforce_case_id=sf_result.get('case_id') if sf_result['success'] else None,
             salesforce_status=sf_result.get('status') if sf_result['success'] else None,
+            salesforce_tracking_id=sf_result.get('tracking_id'),
+            salesforce_task_id=sf_result.get('task_id'),
+            duplicate=sf_result.get('duplicate', False),
             escalated=request.escalated
-        )
+        ).model_dump(), compact, selected), headers={"Server-Timing": timing})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Case creation failed: {str(e)}")
 
+# Queues classification plus case creation as a durable background job and returns its ID at once.
+@app.post("/jobs", response_model=JobSubmission, status_code=202)
+async def submit_job(request: CaseCreationRequest):
+    """
+    Queue a case creation job; poll GET /jobs/{job_id} or subscribe to /jobs/{job_id}/ws for the result.
+    """
+    if job_store is None:
+        raise HTTPException(status_code=404, detail="Background jobs are not enabled")
+    try:
+        job_id = await asyncio.to_thread(job_store.create, request.model_dump())
+        return JobSubmission(job_id=job_id, status="queued")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Job submission failed: {str(e)}")
+
+# Reports job counts by status and the in-process worker counters (registered before /jobs/{job_id}).
+@app.get("/jobs/stats")
+async def jobs_stats():
+    if job_workers is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(job_workers.stats)}
+
+# Returns the state of a background job and, once done, the same fields as /create_case.
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str):
+    if job_store is None:
+        raise HTTPException(status_code=404, detail="Background jobs are not enabled")
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job ID")
+    return JobStatus(**job)
+
+# Pushes the job's state every time it changes and closes once the job is done or failed.
+@app.websocket("/jobs/{job_id}/ws")
+async def job_updates(websocket: WebSocket, job_id: str):
+    await websocket.accept()
+    try:
+        if job_store is None:
+            await websocket.send_json({"job_id": job_id, "status": "unknown", "error": "Background jobs are not enabled"})
+            await websocket.close()
+            return
+        last_update = None
+        while True:
+            job = await asyncio.to_thread(job_store.get, job_id)
+            if job is None:
+                await websocket.send_json({"job_id": job_id, "status": "unknown", "error": "Unknown job ID"})
+                break
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                await websocket.send_json(JobStatus(**job).model_dump())
+            if job["status"] in ("done", "failed"):
+                break
+            await asyncio.sleep(job_workers.poll_interval)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+# Exposes stage timings, token and error counters and component stats in Prometheus text format.
+# Rendered off the event loop, since some collectors query SQLite (disk cache, case cache, job store).
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    text = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+# Returns the sampling profiler's hottest stacks in collapsed-stack (flame graph) format.
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(limit: int = 100, reset: bool = False):
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is not enabled (set PROFILE_SAMPLING=true)")
+    report = profiler.report(limit)
+    if reset:
+        profiler.reset()
+    return PlainTextResponse(report)
+
+# Reports the prompt template version and per-call token usage for each template, including
+# the tokens Gemini served from the context cache.
+@app.get("/prompts/stats")
+async def prompt_stats():
+    return {
+        "version": templates_version(),
+        "system_instruction": SYSTEM_INSTRUCTION,
+        "templates": token_usage_by_prompt()
+    }
+
+# Reports hit/miss counters of the classification response cache.
+@app.get("/cache/stats")
+async def cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    # The disk backend counts its rows in SQLite, so keep that off the event loop.
+    return {"enabled": True, **(await asyncio.to_thread(response_cache.stats))}
+
+# Reports how much LLM classification traffic the local fast-path classifier absorbs.
+@app.get("/fast_path/stats")
+async def fast_path_stats():
+    if ai_engine.fast_classifier is None:
+        return {"enabled": False}
+    return {"enabled": True, **ai_engine.fast_classifier.stats()}
+
+# Reports depth and delivery counters of the Salesforce write-behind queue.
+@app.get("/case_queue/stats")
+async def case_queue_stats():
+    if case_queue is None:
+        return {"enabled": False}
+    return {"enabled": True, **case_queue.stats()}
+
+# Maps a write-behind tracking ID to its Salesforce case ID once the case has been created.
+@app.get("/case_queue/{tracking_id}", response_model=QueuedCaseStatus)
+async def queued_case_status(tracking_id: str):
+    if case_queue is None:
+        raise HTTPException(status_code=404, detail="Write-behind queue is not enabled")
+    entry = case_queue.status(tracking_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown tracking ID")
+    return QueuedCaseStatus(**entry)
+
+# Lists the parent cases that collected the most duplicate reports in the window, for triaging storms.
+@app.get("/duplicates")
+async def duplicate_clusters(limit: int = 20):
+    if deduplicator is None:
+        return {"enabled": False, "clusters": []}
+    return {"enabled": True, **deduplicator.stats(), "clusters": deduplicator.clusters(limit)}
+
+# Looks up many cases in one call: cached ones from memory, the rest with batched SOQL queries.
+@app.get("/cases")
+async def get_cases(ids: str, fields: Optional[str] = None):
+    """
+    Return the given cases, e.g. GET /cases?ids=500xx...,500yy...&fields=Status,Priority
+    """
+    case_ids = [i.strip() for i in ids.split(",") if i.strip()]
+    if not case_ids:
+        raise HTTPException(status_code=400, detail="No case IDs given")
+    if len(case_ids) > MAX_CASE_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CASE_LOOKUP} case IDs per request")
+    try:
+        result = await sf_integration.aget_cases(case_ids, [f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not result['success']:
+        raise HTTPException(status_code=502, detail=f"Case lookup failed: {result['error']}")
+    return {"cases": result['cases'], "missing": result['missing']}
+
+# Relay for Salesforce Change Data Capture: a CaseChangeEvent subscriber (Pub/Sub API client, or a
+# Flow posting the event) sends the events here and the changed cases are dropped from the case cache.
+@app.post("/salesforce/case_changes")
+async def case_changes(request: Request):
+    events = await request.json()
+    if isinstance(events, dict):
+        events = [events]
+    case_ids = [
+        record_id
+        for event in events if isinstance(event, dict)
+        for record_id in (event.get("ChangeEventHeader") or {}).get("recordIds", [])
+    ]
+    invalidated = await asyncio.to_thread(sf_integration.invalidate_cases, case_ids)
+    return {"received": len(events), "invalidated": invalidated}
+
+# Reports Salesforce login, session reuse and refresh counters, plus the case cache counters.
+@app.get("/salesforce/stats")
+async def salesforce_stats():
+    case_cache = await asyncio.to_thread(sf_integration.case_cache_stats)
+    return {**sf_integration.session_manager.metrics(), "case_cache": case_cache}
+
+# Reports queue depth, running requests and queue-wait times per priority class of each scheduled stage.
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    if classify_scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, "classify": classify_scheduler.stats(), "salesforce": salesforce_scheduler.stats()}
+
+# Reports request, de-duplication and upstream call counters of the /predict coalescer.
+@app.get("/coalescer/stats")
+async def coalescer_stats():
+    if coalescer is None:
+        return {"enabled": False}
+    return {"enabled": True, **coalescer.stats()}
+
 @app.get("/")
 async def root():
     return {"message": "AI-Powered Helpdesk Automation API", "status": "running"}
 
+# Readiness probe: 200 once the components in READY_REQUIRES are warm, 503 until then. GET / stays a
+# plain liveness check that answers as soon as the process is up.
+@app.get("/ready")
+async def ready():
+    required = {c: _component_ready(c) for c in READY_REQUIRES}
+    body = {
+        "ready": all(required.values()),
+        "required": required,
+        "components": warm_up_state["components"],
+        "warm_up_seconds": warm_up_state["seconds"]
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+# uvicorn worker processes from API_WORKERS; "auto" means one per CPU core.
+def worker_count():
+    workers = os.getenv("API_WORKERS", "1").lower()
+    if workers == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+# Moves the LLM rate limit, case cache and Salesforce session into files in the private state directory
+# (unless configured otherwise), so worker processes share them instead of each keeping its own. The
+# response cache is shared with RESPONSE_CACHE_BACKEND=disk.
+def use_shared_state():
+    shared_dir = state_dir()
+    os.environ.setdefault("LLM_RATE_LIMIT_PATH", os.path.join(shared_dir, "rate_limit.sqlite3"))
+    os.environ.setdefault("SALESFORCE_CASE_CACHE_PATH", os.path.join(shared_dir, "case_cache.sqlite3"))
+    os.environ.setdefault("SALESFORCE_SESSION_CACHE", os.path.join(shared_dir, "salesforce_session.json"))
+
+# Features whose state lives in one process and would give wrong answers across workers: a tracking ID
+# can only be polled on the worker that enqueued it, and each worker only sees its own duplicates.
+PER_PROCESS_FEATURES = ("SALESFORCE_WRITE_BEHIND", "DUPLICATE_DETECTION")
+
+# Refuses to start several workers while a per-process feature is enabled.
+def check_worker_features(workers):
+    enabled = [name for name in PER_PROCESS_FEATURES if os.getenv(name, "false").lower() in ("1", "true", "yes")]
+    if workers > 1 and enabled:
+        raise SystemExit(f"{', '.join(enabled)} keeps its state in one process and cannot be used with API_WORKERS={workers}; "
+                         "run a single worker or turn it off")
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = worker_count()
+    host = os.getenv("API_HOST", "0.0.0.0")
+    port = int(os.getenv("API_PORT", "8000"))
+    check_worker_features(workers)
+    if workers > 1:
+        # Workers are fresh processes that import api:app themselves and inherit these settings.
+        use_shared_state()
+        uvicorn.run("api:app", host=host, port=port, workers=workers)
+    else:
+        uvicorn.run(app, host=host, port=port)
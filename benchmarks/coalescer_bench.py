@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Compare /predict classification latency and upstream call counts with and without
+the request coalescer, against a fake Gemini model.
+
+Usage:
+    python -m benchmarks.coalescer_bench --requests 500 --concurrency 100
+"""
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+# Benchmarks measure the upstream path, so keep the response cache out of the way.
+os.environ["RESPONSE_CACHE_BACKEND"] = "none"
+
+import ai_engine
+from request_coalescer import RequestCoalescer
+from benchmarks.fakes import FakeGenerativeModel, install_fake_model
+
+# Returns the given percentile of a list of latencies, in milliseconds.
+def percentile(latencies, pct):
+    ordered = sorted(latencies)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+# Fires total requests with at most concurrency outstanding, returning per-request latencies.
+async def drive(classify, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await classify(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    return latencies, time.perf_counter() - start
+
+async def run(args):
+    rng = random.Random(42)
+    pool = [f"Customer issue number {i}" for i in range(args.distinct)]
+    queries = [rng.choice(pool) for _ in range(args.requests)]
+
+    rows = []
+
+    model = FakeGenerativeModel(latency=args.latency / 1000, per_item_latency=args.per_item_latency / 1000)
+    install_fake_model(ai_engine.llm_router, model)
+    latencies, elapsed = await drive(ai_engine.aclassify_query, queries, args.concurrency)
+    rows.append(("uncoalesced", latencies, elapsed, model.calls))
+
+    model = FakeGenerativeModel(latency=args.latency / 1000, per_item_latency=args.per_item_latency / 1000)
+    install_fake_model(ai_engine.llm_router, model)
+    coalescer = RequestCoalescer(max_wait_ms=args.wait_ms, max_batch=args.max_batch)
+    await coalescer.start()
+    latencies, elapsed = await drive(coalescer.classify, queries, args.concurrency)
+    await coalescer.stop()
+    rows.append(("coalesced", latencies, elapsed, model.calls))
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.distinct} distinct queries")
+    print(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'upstream':>9}")
+    for name, latencies, elapsed, calls in rows:
+        print(
+            f"{name:<12} {len(latencies) / elapsed:>8.1f} {percentile(latencies, 50):>8.1f} "
+            f"{percentile(latencies, 99):>8.1f} {statistics.mean(latencies) * 1000:>8.1f} {calls:>9}"
+        )
+    print(f"coalescer: {coalescer.stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /predict request coalescer.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--distinct", type=int, default=200, help="Distinct query texts in the workload")
+    parser.add_argument("--latency", type=float, default=200, help="Fake model base latency (ms)")
+    parser.add_argument("--per-item-latency", type=float, default=5, help="Extra fake latency per query (ms)")
+    parser.add_argument("--wait-ms", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=16)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
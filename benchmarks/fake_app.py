@@ -0,0 +1,29 @@
+"""
+api.app wired to local fakes instead of Gemini and Salesforce.
+
+Serve it like the real app (e.g. `uvicorn benchmarks.fake_app:app`); it is configured
+through environment variables so every uvicorn worker builds the same fakes:
+
+    FAKE_LLM_LATENCY_MS     base latency of each fake model call (default 200)
+    FAKE_LLM_ITEM_MS        extra latency per query in a call (default 5)
+    FAKE_LLM_ERROR_RATE     fraction of model calls that raise (default 0)
+    FAKE_SALESFORCE_URL     base URL of a running FakeSalesforceServer
+
+The LLM_* routing settings still apply: only the Gemini backend is replaced, so a local
+or stub backend configured as cheap or hedge backend runs for real.
+"""
+
+import os
+import ai_engine
+from salesforce_integration import sf_integration
+from benchmarks.fakes import FakeGenerativeModel, fake_salesforce_client, install_fake_model
+from api import app  # noqa: F401  (re-exported for uvicorn)
+
+install_fake_model(ai_engine.llm_router, FakeGenerativeModel(
+    latency=float(os.getenv("FAKE_LLM_LATENCY_MS", "200")) / 1000,
+    per_item_latency=float(os.getenv("FAKE_LLM_ITEM_MS", "5")) / 1000,
+    error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+))
+
+if os.getenv("FAKE_SALESFORCE_URL"):
+    sf_integration.sf = fake_salesforce_client(os.getenv("FAKE_SALESFORCE_URL"))
@@ -0,0 +1,246 @@
+"""
+Local stand-ins for upstream services, so benchmarks run without network access or quota.
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+from llm_backends import GeminiBackend
+
+CATEGORIES = ["Billing", "Technical Issue", "Product Inquiry", "Feedback", "General Inquiry"]
+PRIORITIES = ["Low", "Medium", "High"]
+
+# Host name the fake Salesforce client believes it is talking to.
+FAKE_INSTANCE = "fake.my.salesforce.com"
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in replacement for genai.GenerativeModel with configurable latency and error rate.
+
+    Replies are derived deterministically from the query text: a JSON array for batch
+    prompts, a JSON object when structured output is requested, and the line-prefixed
+    format otherwise.
+    """
+
+    def __init__(self, latency=0.2, per_item_latency=0.005, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    # Picks a stable category/priority for a query so repeated runs agree.
+    @staticmethod
+    def _classify(query):
+        digest = sum(query.encode("utf-8"))
+        return CATEGORIES[digest % len(CATEGORIES)], PRIORITIES[digest % len(PRIORITIES)]
+
+    # Builds the reply text and how long the call should take, or raises to simulate a failure.
+    def _reply(self, prompt, generation_config=None):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise RuntimeError("429 Resource has been exhausted (fake)")
+
+        batch = re.findall(r"^\s*\[(\d+)\] (.*)$", prompt, re.MULTILINE)
+        if batch:
+            items = []
+            for index, query in batch:
+                category, priority = self._classify(query)
+                items.append({
+                    "index": int(index),
+                    "category": category,
+                    "priority": priority,
+                    "response": f"Thanks for reaching out about: {query}",
+                    "confidence": 0.9
+                })
+            return json.dumps(items), self.latency + self.per_item_latency * len(batch)
+
+        match = re.search(r"Query: (.*)", prompt)
+        query = match.group(1).strip() if match else prompt.strip()
+        category, priority = self._classify(query)
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            text = json.dumps({
+                "category": category,
+                "priority": priority,
+                "response": f"Thanks for reaching out about: {query}",
+                "confidence": 0.9
+            })
+            return text, self.latency + self.per_item_latency
+        text = (
+            f"Category: {category}\n"
+            f"Priority: {priority}\n"
+            f"Response: Thanks for reaching out about: {query}\n"
+            f"Confidence: 0.9"
+        )
+        return text, self.latency + self.per_item_latency
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        text, delay = self._reply(prompt, generation_config)
+        time.sleep(delay)
+        return types.SimpleNamespace(text=text)
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        text, delay = self._reply(prompt, generation_config)
+        if stream:
+            return self._stream(text, delay)
+        await asyncio.sleep(delay)
+        return types.SimpleNamespace(text=text)
+
+    # Yields the reply in small chunks spread over the call's latency, like a streamed generation.
+    async def _stream(self, text, delay, chunk_size=8):
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield types.SimpleNamespace(text=chunk)
+
+# Points every Gemini backend of an LLMRouter at a fake model, keeping the configured routing.
+def install_fake_model(router, model):
+    for backend in router.backends.values():
+        if isinstance(backend, GeminiBackend):
+            backend.model = model
+
+
+class FakeSalesforceHandler(BaseHTTPRequestHandler):
+    """Serves the handful of Salesforce REST endpoints the integration uses, from memory."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _route(self):
+        time.sleep(self.server.latency)
+        self.server.count_request()
+        return urlparse(self.path)
+
+    def do_POST(self):
+        url = self._route()
+        if url.path.endswith("/composite/sobjects"):
+            records = self._read_json().get("records", [])
+            self._send_json(200, [
+                {"id": self.server.store_case(record), "success": True, "errors": []}
+                for record in records
+            ])
+        elif re.search(r"/sobjects/(Case|Task)/?$", url.path):
+            case_id = self.server.store_case(self._read_json())
+            self._send_json(201, {"id": case_id, "success": True, "errors": []})
+        else:
+            self._send_json(404, [{"errorCode": "NOT_FOUND", "message": url.path}])
+
+    def do_PATCH(self):
+        url = self._route()
+        match = re.search(r"/sobjects/Case/([^/]+)$", url.path)
+        if match and match.group(1) in self.server.cases:
+            self.server.cases[match.group(1)].update(self._read_json())
+            self._send_json(204)
+        else:
+            self._send_json(404, [{"errorCode": "NOT_FOUND", "message": url.path}])
+
+    def do_GET(self):
+        url = self._route()
+        match = re.search(r"/sobjects/Case/([^/]+)$", url.path)
+        if match and match.group(1) in self.server.cases:
+            self._send_json(200, {"Id": match.group(1), **self.server.cases[match.group(1)]})
+        elif url.path.endswith("/query") or url.path.endswith("/query/"):
+            # Understands "SELECT a, b FROM Case [WHERE Id IN ('x', ...)]"; other clauses are ignored.
+            soql = parse_qs(url.query).get("q", [""])[0]
+            select = re.match(r"\s*SELECT\s+(.+?)\s+FROM\s", soql, re.IGNORECASE)
+            ids = re.search(r"WHERE\s+Id\s+IN\s*\(([^)]*)\)", soql, re.IGNORECASE)
+            wanted = set(re.findall(r"'([^']*)'", ids.group(1))) if ids else None
+            records = []
+            for case_id, fields in list(self.server.cases.items()):
+                if wanted is not None and case_id not in wanted and case_id[:15] not in wanted:
+                    continue
+                record = {"Id": case_id, **fields}
+                if select:
+                    record = {name: record.get(name) for name in (f.strip() for f in select.group(1).split(","))}
+                records.append({"attributes": {"type": "Case"}, **record})
+            self._send_json(200, {"totalSize": len(records), "done": True, "records": records})
+        else:
+            self._send_json(404, [{"errorCode": "NOT_FOUND", "message": url.path}])
+
+
+class FakeSalesforceServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the Salesforce REST API with configurable latency.
+
+    Use fake_salesforce_client(server.url) to get a simple_salesforce client wired to it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.05):
+        super().__init__(("127.0.0.1", port), FakeSalesforceHandler)
+        self.latency = latency
+        self.cases = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def store_case(self, record):
+        with self._lock:
+            # 18-character IDs whose first 15 characters are unique, like real ones.
+            case_id = f"500FAKE{len(self.cases):08d}AAA"
+            self.cases[case_id] = {k: v for k, v in record.items() if k != "attributes"}
+        return case_id
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-salesforce", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _LoopbackAdapter(HTTPAdapter):
+    """Rewrites requests for the fake instance's https URL to the local plain-HTTP server."""
+
+    def __init__(self, target, **kwargs):
+        self.target = target
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(f"https://{FAKE_INSTANCE}", self.target, 1)
+        return super().send(request, **kwargs)
+
+# Builds a simple_salesforce client whose REST calls go to a FakeSalesforceServer at base_url.
+def fake_salesforce_client(base_url, pool_size=50):
+    from simple_salesforce.api import Salesforce
+
+    session = requests.Session()
+    session.mount(f"https://{FAKE_INSTANCE}", _LoopbackAdapter(base_url, pool_connections=pool_size, pool_maxsize=pool_size))
+    return Salesforce(instance_url=f"https://{FAKE_INSTANCE}", session_id="FAKE_SESSION", session=session)
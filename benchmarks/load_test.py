@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the API.
+
+Starts api.app under uvicorn against a fake Gemini model and a local Salesforce
+stand-in, drives /predict and/or /create_case at the given concurrency, and reports
+throughput, latency percentiles and resident memory per worker. No network access
+or credentials are needed.
+
+Usage:
+    python -m benchmarks.load_test --endpoint both --requests 1000 --concurrency 50
+"""
+
+import os
+import sys
+import time
+import socket
+import random
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from benchmarks.fakes import FakeSalesforceServer
+
+ENDPOINTS = {"predict": "/predict", "create_case": "/create_case"}
+
+QUERY_TEMPLATES = [
+    "I can't log in to my account after the update (ticket {n})",
+    "I was charged twice on my last invoice, reference {n}",
+    "Does the premium plan include API access? Asking for team {n}",
+    "The app crashes when I upload a file, build {n}",
+    "Love the new dashboard, great work! - customer {n}",
+    "What are your support hours? Store {n}"
+]
+
+# Returns the given percentile of a list of latencies, in milliseconds.
+def percentile(latencies, pct):
+    ordered = sorted(latencies)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# Resident set size in MB of a process, read from /proc (Linux only).
+def _rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+# PIDs of the server process and its uvicorn worker children.
+def _worker_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(c) for c in f.read().split()]
+    except OSError:
+        children = []
+    return children or [pid]
+
+# Starts the fake-backed app in a uvicorn subprocess and waits until it answers.
+def start_server(args, salesforce_url):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        FAKE_LLM_LATENCY_MS=str(args.llm_latency),
+        FAKE_LLM_ITEM_MS=str(args.llm_item_latency),
+        FAKE_LLM_ERROR_RATE=str(args.llm_error_rate),
+        FAKE_SALESFORCE_URL=salesforce_url,
+        RESPONSE_CACHE_BACKEND=os.environ.get("RESPONSE_CACHE_BACKEND", "none"),
+        SALESFORCE_SESSION_CACHE="none"
+    )
+    command = [
+        sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning"
+    ]
+    process = subprocess.Popen(command, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f"{base_url}/", timeout=1)
+            return process, base_url
+        except requests.exceptions.RequestException:
+            if process.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not start within 60 s")
+
+# Sends total requests with the given concurrency, one pooled session per thread.
+def drive(base_url, path, total, concurrency, distinct):
+    local = threading.local()
+    rng = random.Random(7)
+    queries = [rng.choice(QUERY_TEMPLATES).format(n=rng.randrange(distinct)) for _ in range(total)]
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(
+                f"{base_url}{path}",
+                json={"customer_name": f"Load Test {i}", "query": queries[i]},
+                timeout=60
+            )
+            ok = response.status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            (latencies if ok else errors).append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return latencies, errors, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against fake Gemini and Salesforce backends.")
+    parser.add_argument("--endpoint", choices=["predict", "create_case", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--distinct", type=int, default=1000, help="Distinct query variants in the workload")
+    parser.add_argument("--llm-latency", type=float, default=200, help="Fake model base latency (ms)")
+    parser.add_argument("--llm-item-latency", type=float, default=5, help="Fake model latency per query (ms)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of fake model calls that fail")
+    parser.add_argument("--sf-latency", type=float, default=50, help="Fake Salesforce latency per request (ms)")
+    args = parser.parse_args()
+
+    salesforce = FakeSalesforceServer(latency=args.sf_latency / 1000).start()
+    process, base_url = start_server(args, salesforce.url)
+    try:
+        # Warm up connections and lazy initialisation before measuring.
+        drive(base_url, "/predict", min(args.concurrency, 20), min(args.concurrency, 20), args.distinct)
+
+        names = list(ENDPOINTS) if args.endpoint == "both" else [args.endpoint]
+        print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, {args.workers} worker(s)")
+        print(f"fake LLM {args.llm_latency:.0f} ms (error rate {args.llm_error_rate:.0%}), fake Salesforce {args.sf_latency:.0f} ms")
+        print(f"{'endpoint':<14} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name in names:
+            latencies, errors, elapsed = drive(base_url, ENDPOINTS[name], args.requests, args.concurrency, args.distinct)
+            print(
+                f"{name:<14} {len(latencies) / elapsed:>8.1f} {percentile(latencies, 50):>8.1f} "
+                f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {len(errors):>7}"
+            )
+
+        rss = [_rss_mb(pid) for pid in _worker_pids(process.pid)]
+        rss = [r for r in rss if r is not None]
+        if rss:
+            print(f"memory per worker: {', '.join(f'{r:.0f} MB' for r in rss)} RSS")
+        print(f"fake Salesforce requests served: {salesforce.requests}")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        salesforce.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Queue wait per priority class under a backlog, first-come-first-served vs. the priority scheduler.
+
+Simulates one scheduled stage (the classification call) in-process: a burst of
+low-priority tickets arrives first, then a steady mix of escalated, high, medium and
+low tickets keeps arriving while the burst drains. Each ticket holds a slot for the
+simulated service time. Reports wait p50/p99 per class with one FIFO queue and with
+PriorityScheduler, plus how often starvation protection had to step in.
+
+Usage:
+    python -m benchmarks.priority_bench --backlog 500 --arrivals 300 --slots 8
+"""
+
+import time
+import random
+import asyncio
+import argparse
+from priority_scheduler import PriorityScheduler, PRIORITY_CLASSES
+from benchmarks.load_test import percentile
+
+# Share of each class among the tickets arriving after the backlog.
+MIX = {"escalated": 0.05, "high": 0.15, "medium": 0.3, "low": 0.5}
+
+# Runs the workload through scheduler; classify maps a ticket's class to the class it is queued under.
+async def run(scheduler, tickets, service, classify):
+    waits = {cls: [] for cls in PRIORITY_CLASSES}
+
+    async def ticket(cls, delay):
+        await asyncio.sleep(delay)
+        async with scheduler.slot(classify(cls)) as waited:
+            waits[cls].append(waited)
+            await asyncio.sleep(service * random.uniform(0.5, 1.5))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ticket(cls, delay) for cls, delay in tickets))
+    return waits, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-class queue wait with and without priority scheduling.")
+    parser.add_argument("--backlog", type=int, default=500, help="Low-priority tickets queued at the start")
+    parser.add_argument("--arrivals", type=int, default=300, help="Mixed tickets arriving while the backlog drains")
+    parser.add_argument("--rate", type=float, default=150, help="Arrivals per second")
+    parser.add_argument("--slots", type=int, default=8, help="Concurrent slots of the stage")
+    parser.add_argument("--service-ms", type=float, default=40, help="Mean time a ticket holds a slot (ms)")
+    parser.add_argument("--max-wait", type=float, default=1, help="Starvation protection threshold (s)")
+    parser.add_argument("--low-limit", type=float, default=None, help="Fraction of slots low-priority work may hold")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    tickets = [("low", 0.0)] * args.backlog
+    classes, shares = zip(*MIX.items())
+    tickets += [(random.choices(classes, shares)[0], i / args.rate) for i in range(args.arrivals)]
+
+    fifo = PriorityScheduler("fifo", max_concurrency=args.slots, weights={"all": 1}, max_wait=0)
+    scheduled = PriorityScheduler(
+        "classify", max_concurrency=args.slots, max_wait=args.max_wait,
+        class_limits={"low": max(1, int(args.low_limit * args.slots))} if args.low_limit else None
+    )
+    print(f"{args.backlog} low-priority backlog + {args.arrivals} mixed arrivals at {args.rate:.0f}/s, "
+          f"{args.slots} slots, {args.service_ms:.0f} ms service")
+    print(f"{'mode':<10} {'class':<10} {'count':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for mode, scheduler, classify in (("fifo", fifo, lambda cls: "all"), ("priority", scheduled, lambda cls: cls)):
+        random.seed(args.seed)
+        waits, elapsed = asyncio.run(run(scheduler, tickets, args.service_ms / 1000, classify))
+        for cls in PRIORITY_CLASSES:
+            if waits[cls]:
+                print(f"{mode:<10} {cls:<10} {len(waits[cls]):>6} {percentile(waits[cls], 50):>9.1f} "
+                      f"{percentile(waits[cls], 99):>9.1f}")
+        print(f"{mode:<10} {'total':<10} {len(tickets):>6} drained in {elapsed:.1f} s")
+    promotions = {cls: count for cls, count in scheduled.promoted.items() if count}
+    print(f"starvation promotions: {promotions or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling of the API across uvicorn worker processes.
+
+Runs the load test's /predict workload against 1, 2, 4, ... workers (up to the CPU
+count by default) and reports requests per second and scaling efficiency relative
+to one worker. The fake model latency defaults to a few milliseconds so the
+per-request CPU work, not the simulated upstream, is what the workers share.
+
+Usage:
+    python -m benchmarks.scaling_bench --requests 2000 --concurrency 64
+    python -m benchmarks.scaling_bench --workers 1 2 4 8 --shared-state
+"""
+
+import os
+import argparse
+import tempfile
+from benchmarks.fakes import FakeSalesforceServer
+from benchmarks.load_test import start_server, drive, percentile, ENDPOINTS
+
+# 1, 2, 4, ... up to the CPU count, always ending with the CPU count itself.
+def default_worker_counts():
+    cpus = os.cpu_count() or 1
+    counts = []
+    workers = 1
+    while workers < cpus:
+        counts.append(workers)
+        workers *= 2
+    return counts + [cpus]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API throughput as uvicorn workers are added.")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Worker counts to test (default: 1, 2, 4, ... CPU count)")
+    parser.add_argument("--endpoint", choices=list(ENDPOINTS), default="predict")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per worker count")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=100000, help="Distinct query variants in the workload")
+    parser.add_argument("--llm-latency", type=float, default=2, help="Fake model base latency (ms)")
+    parser.add_argument("--llm-item-latency", type=float, default=0, help="Fake model latency per query (ms)")
+    parser.add_argument("--sf-latency", type=float, default=5, help="Fake Salesforce latency per request (ms)")
+    parser.add_argument("--shared-state", action="store_true",
+                        help="Share the response cache, rate limit and case cache between workers through SQLite files")
+    args = parser.parse_args()
+    args.llm_error_rate = 0.0
+
+    if args.shared_state:
+        shared_dir = tempfile.mkdtemp(prefix="helpdesk-scaling-")
+        os.environ.update(
+            RESPONSE_CACHE_BACKEND="disk",
+            RESPONSE_CACHE_PATH=os.path.join(shared_dir, "response_cache.sqlite3"),
+            LLM_RATE_LIMIT_PATH=os.path.join(shared_dir, "rate_limit.sqlite3"),
+            SALESFORCE_CASE_CACHE_PATH=os.path.join(shared_dir, "case_cache.sqlite3")
+        )
+
+    salesforce = FakeSalesforceServer(latency=args.sf_latency / 1000).start()
+    print(f"{args.requests} {args.endpoint} requests at concurrency {args.concurrency} on {os.cpu_count()} CPU(s), "
+          f"fake LLM {args.llm_latency:.0f} ms, shared state {'on' if args.shared_state else 'off'}")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8} {'efficiency':>10}")
+    base = None
+    try:
+        for workers in args.workers or default_worker_counts():
+            process, base_url = start_server(argparse.Namespace(**{**vars(args), "workers": workers}), salesforce.url)
+            try:
+                # Every worker has to finish starting up and warm its connections before measuring.
+                drive(base_url, ENDPOINTS[args.endpoint], args.concurrency * 4, args.concurrency, args.distinct)
+                latencies, errors, elapsed = drive(
+                    base_url, ENDPOINTS[args.endpoint], args.requests, args.concurrency, args.distinct
+                )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            throughput = len(latencies) / elapsed
+            base = base or throughput
+            print(
+                f"{workers:>7} {throughput:>9.1f} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} "
+                f"{len(errors):>7} {throughput / base:>7.2f}x {throughput / base / workers:>10.0%}"
+            )
+    finally:
+        salesforce.stop()
+
+if __name__ == "__main__":
+    main()
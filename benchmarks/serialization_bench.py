@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Serialization cost and payload size of /create_case and /predict/batch responses.
+
+Compares, per response, FastAPI's response_model path with the standard json
+encoder (how the endpoints used to answer) against the direct orjson path, in full
+and ?compact=true form, and reports CPU time per response and bytes on the wire
+uncompressed, gzipped and (when the brotli package is installed) Brotli-compressed,
+plus the CPU the gzip middleware spends per response.
+
+Usage:
+    python -m benchmarks.serialization_bench --iterations 20000
+"""
+
+import gzip
+import time
+import asyncio
+import argparse
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from api import CaseCreationResponse, BatchPredictionResponse, PredictionResponse, FastJSONResponse, _shape
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+REPLY = (
+    "Thank you for reaching out about the duplicate charge on your March invoice. I can see two payments "
+    "of $49.00 were taken on the same day for your Pro subscription. One of them has been flagged for a "
+    "refund, which usually reaches your card within 5-7 business days. If it has not arrived by then, "
+    "reply to this message with your invoice number and we will escalate it to our billing team. "
+    "We are sorry for the inconvenience and appreciate your patience."
+)
+QUERY = (
+    "Hi, I was charged twice for my Pro subscription this month (two payments of $49 on March 3rd). "
+    "Can you refund one of them? My account email is the one I am writing from."
+)
+
+def sample_case():
+    return CaseCreationResponse(
+        customer_name="Jordan Smith", query=QUERY, category="Billing", priority="High", response=REPLY,
+        confidence=0.93, salesforce_case_id="500Hs00001XyZabIAF", salesforce_status="Closed", escalated=False
+    )
+
+def sample_batch(size):
+    return BatchPredictionResponse(results=[
+        PredictionResponse(customer_name=f"Customer {i}", query=QUERY, category="Billing", priority="High",
+                           response=REPLY, confidence=0.93)
+        for i in range(size)
+    ])
+
+# The old path, as fastapi.routing.serialize_response does it: dump the returned model, validate the
+# dump against response_model, serialize it again, then json.dumps the result.
+def render_response_model(field, model):
+    value, _ = field.validate(model.model_dump(by_alias=True), {}, loc=("response",))
+    return JSONResponse(field.serialize(value, mode="json", by_alias=True)).body
+
+# The new path: the endpoint dumps the model once and orjson encodes it, optionally compacted.
+def render_direct(model, compact):
+    data = model.model_dump()
+    if "results" in data:
+        return FastJSONResponse({"results": [_shape(item, compact) for item in data["results"]]}).body
+    return FastJSONResponse(_shape(data, compact)).body
+
+# Mean microseconds per call of render().
+def time_per_call(render, iterations):
+    render()
+    start = time.process_time()
+    for _ in range(iterations):
+        render()
+    return (time.process_time() - start) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response serialization CPU and payload sizes.")
+    parser.add_argument("--iterations", type=int, default=5000, help="Responses serialized per measurement")
+    parser.add_argument("--batch-size", type=int, default=25, help="Results per /predict/batch response")
+    args = parser.parse_args()
+
+    cases = [
+        ("/create_case", sample_case(), create_response_field("case", CaseCreationResponse)),
+        (f"/predict/batch x{args.batch_size}", sample_batch(args.batch_size),
+         create_response_field("batch", BatchPredictionResponse))
+    ]
+    print(f"encoder: {FastJSONResponse.__name__}, brotli: {'yes' if brotli else 'not installed'}")
+    print(f"{'response':<22} {'mode':<26} {'CPU us':>8} {'gzip us':>8} {'bytes':>7} {'gzip':>7} {'br':>7}")
+    for name, model, field in cases:
+        # Same output as FastAPI's own serialize_response, which this mirrors without an event loop per call.
+        assert render_response_model(field, model) == JSONResponse(
+            asyncio.run(serialize_response(field=field, response_content=model))
+        ).body
+        modes = [
+            ("response_model + json", lambda: render_response_model(field, model)),
+            ("direct orjson", lambda: render_direct(model, compact=False)),
+            ("direct orjson, compact", lambda: render_direct(model, compact=True))
+        ]
+        for mode, render in modes:
+            body = render()
+            micros = time_per_call(render, args.iterations)
+            gzip_micros = time_per_call(lambda: gzip.compress(body, compresslevel=6), args.iterations)
+            compressed = len(gzip.compress(body, compresslevel=6))
+            br = len(brotli.compress(body, quality=4)) if brotli else None
+            print(f"{name:<22} {mode:<26} {micros:>8.1f} {gzip_micros:>8.1f} {len(body):>7} {compressed:>7} {br if br else '-':>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the API.
+
+Measures, in fresh interpreters, how long `import api` takes and which modules
+dominate it, then starts the fake-backed app under uvicorn and reports the time
+until GET / (liveness) and GET /ready (readiness) first succeed. Run it before and
+after changes that touch module-level initialization.
+
+Usage:
+    python -m benchmarks.startup_bench --runs 5 --top 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import requests
+from benchmarks.fakes import FakeSalesforceServer
+from benchmarks.load_test import _free_port
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a fresh interpreter spends importing module.
+def import_seconds(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+# The slowest top-level imports of module by cumulative time, from python -X importtime.
+def import_profile(module, top):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Two spaces of indent per nesting level; depth 1 means imported directly by module.
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        if depth == 1 or name.strip() == module:
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+# Starts uvicorn and returns (seconds until GET / answers, seconds until GET /ready is 200).
+def startup_seconds(salesforce_url, timeout=60):
+    port = _free_port()
+    env = dict(os.environ, FAKE_SALESFORCE_URL=salesforce_url, SALESFORCE_SESSION_CACHE="none")
+    command = [
+        sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=REPO_ROOT)
+    base_url = f"http://127.0.0.1:{port}"
+    live = ready = None
+    try:
+        while ready is None and time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            try:
+                if live is None:
+                    requests.get(f"{base_url}/", timeout=1)
+                    live = time.perf_counter() - start
+                if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                    ready = time.perf_counter() - start
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    if ready is None:
+        raise RuntimeError(f"API server was not ready within {timeout} s")
+    return live, ready
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to liveness/readiness of the API.")
+    parser.add_argument("--module", default="api", help="Module whose import time is measured")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list (0 to skip)")
+    parser.add_argument("--no-server", action="store_true", help="Only measure the import")
+    args = parser.parse_args()
+
+    imports = [import_seconds(args.module) for _ in range(args.runs)]
+    print(f"import {args.module}: median {statistics.median(imports) * 1000:.0f} ms, "
+          f"min {min(imports) * 1000:.0f} ms over {args.runs} runs")
+    if args.top:
+        print(f"{'cumulative ms':>14}  module")
+        for seconds, name in import_profile(args.module, args.top):
+            print(f"{seconds * 1000:>14.1f}  {name}")
+
+    if args.no_server:
+        return
+    salesforce = FakeSalesforceServer(latency=0).start()
+    try:
+        results = [startup_seconds(salesforce.url) for _ in range(args.runs)]
+    finally:
+        salesforce.stop()
+    print(f"uvicorn start -> GET / answers: median {statistics.median(r[0] for r in results) * 1000:.0f} ms")
+    print(f"uvicorn start -> GET /ready 200: median {statistics.median(r[1] for r in results) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Bulk ingest of historic tickets: classify every record of a JSONL or CSV file and
+optionally create the Salesforce cases.
+
+The input is read lazily one chunk at a time, so memory stays flat however large the
+file is. Each chunk is classified with classify_queries() (concurrent batched LLM
+calls), checkpointed, optionally pushed to Salesforce in groups and appended to the
+output JSONL; a crashed or interrupted run picks up after the last completed chunk
+when started again with the same arguments.
+
+Records whose classification fell back (the LLM could not be reached) are neither
+written nor pushed. The checkpoint keeps their positions and the next run classifies
+them again before continuing, so their rows end up after the ones written meanwhile.
+A chunk whose Salesforce push was cut off by a crash is not pushed again, since some
+of its cases may exist already; its rows are written with an error instead.
+
+Usage:
+    python bulk_ingest.py tickets.jsonl --output classified.jsonl
+    python bulk_ingest.py tickets.csv --output classified.jsonl --salesforce --chunk-size 1000
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+from itertools import islice, chain
+from concurrent.futures import ThreadPoolExecutor
+from ai_engine import classify_queries
+from salesforce_integration import sf_integration
+from metrics import record_error
+
+# Yields the records of a JSONL or CSV file as dicts, skipping the first `skip`.
+def iter_records(path, file_format=None, skip=0):
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        yield from islice(records, skip, None)
+
+# Yields (position, record) for the records at the given positions of the input.
+def iter_positions(path, positions, file_format=None):
+    wanted = set(positions)
+    if not wanted:
+        return
+    records = enumerate(iter_records(path, file_format))
+    yield from ((i, record) for i, record in islice(records, max(wanted) + 1) if i in wanted)
+
+# Groups an iterator into lists of at most size items.
+def iter_chunks(records, size):
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Reads the progress of an earlier run, or a fresh checkpoint when there is none.
+# retry holds the positions of records to classify again; unpushed holds classified rows whose
+# Salesforce push has not finished, and pushing is set while that push is under way.
+def load_checkpoint(path, input_path):
+    checkpoint = {"input": input_path, "records_done": 0, "output_bytes": 0, "cases_created": 0,
+                  "retry": [], "unpushed": [], "pushing": False}
+    if not os.path.exists(path):
+        return checkpoint
+    with open(path, encoding="utf-8") as f:
+        checkpoint.update(json.load(f))
+    if checkpoint.get("input") != input_path:
+        raise ValueError(f"Checkpoint {path} belongs to {checkpoint.get('input')}, not {input_path}")
+    return checkpoint
+
+# Writes the checkpoint atomically so a crash never leaves it half written.
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BulkIngest:
+    """Classifies records chunk by chunk, overlapping Salesforce pushes with the next chunk's LLM calls."""
+
+    def __init__(self, query_field="query", name_field="customer_name", escalated_field="escalated",
+                 push_to_salesforce=False, use_bulk_api=False, batch_size=None, max_concurrency=None):
+        self.query_field = query_field
+        self.name_field = name_field
+        self.escalated_field = escalated_field
+        self.push_to_salesforce = push_to_salesforce
+        self.use_bulk_api = use_bulk_api
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+
+    def classify(self, chunk):
+        """Return one output row per input record: the record plus its classification.
+
+        Rows whose classification fell back carry a "fallback" field naming the reason.
+        """
+        queries = [str(record.get(self.query_field) or "") for record in chunk]
+        results = classify_queries(queries, batch_size=self.batch_size, max_concurrency=self.max_concurrency)
+        rows = []
+        for record, result in zip(chunk, results):
+            row = {**record, "category": result['category'], "priority": result['priority'],
+                   "response": result['response'], "confidence": result['confidence']}
+            if result.get('fallback'):
+                row["fallback"] = result['fallback']
+            rows.append(row)
+        return rows
+
+    def push(self, rows):
+        """Create the Salesforce cases for classified rows, adding case ID or error to each row."""
+        case_data = [
+            sf_integration.build_case_data(
+                customer_name=str(row.get(self.name_field) or "Unknown"),
+                query=str(row.get(self.query_field) or ""),
+                category=row['category'],
+                priority=row['priority'],
+                ai_response=row['response'],
+                escalated=str(row.get(self.escalated_field, "")).lower() in ("1", "true", "yes")
+            )
+            for row in rows
+        ]
+        try:
+            if self.use_bulk_api:
+                results = sf_integration.bulk_create_cases(case_data)
+            else:
+                results = sf_integration.create_cases(case_data)
+        except Exception as e:
+            print(f"Error creating cases: {e}")
+            record_error("bulk_ingest_salesforce", e)
+            # Rows before the failing request were created; PartialCreateError carries their results.
+            created = getattr(e, "results", [])
+            results = created + [{"success": False, "error": str(e)}] * (len(rows) - len(created))
+        for row, result in zip(rows, results):
+            row["salesforce_case_id"] = result.get("case_id") if result["success"] else None
+            row["salesforce_error"] = None if result["success"] else result["error"]
+        return sum(1 for result in results if result["success"])
+
+    # Pushes the checkpointed unpushed rows and writes them out. A push cut off by a crash is not
+    # repeated, because some of its cases may have been created; those rows get an error instead.
+    def _push_unpushed(self, checkpoint, checkpoint_path, out):
+        rows = checkpoint["unpushed"]
+        interrupted = 0
+        if checkpoint["pushing"]:
+            for row in rows:
+                row["salesforce_case_id"] = None
+                row["salesforce_error"] = "Push interrupted; the case may already exist in Salesforce"
+            interrupted = len(rows)
+        elif self.push_to_salesforce:
+            checkpoint["pushing"] = True
+            save_checkpoint(checkpoint_path, checkpoint)
+            checkpoint["cases_created"] += self.push(rows)
+        self._write(rows, checkpoint, out)
+        checkpoint["unpushed"] = []
+        checkpoint["pushing"] = False
+        save_checkpoint(checkpoint_path, checkpoint)
+        return interrupted
+
+    @staticmethod
+    def _write(rows, checkpoint, out):
+        out.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        out.flush()
+        os.fsync(out.fileno())
+        checkpoint["output_bytes"] = out.tell()
+
+    def run(self, input_path, output_path, checkpoint_path, file_format=None, chunk_size=500, limit=None):
+        """
+        Process the whole input, resuming from the checkpoint if there is one.
+
+        Returns:
+            dict: {"records", "seconds", "records_per_second", "cases_created", "fallbacks",
+                   "retry_pending", "push_interrupted"}
+        """
+        checkpoint = load_checkpoint(checkpoint_path, input_path)
+        skip = checkpoint["records_done"]
+        if skip:
+            print(f"↪️  Resuming after {skip} records ({len(checkpoint['retry'])} to classify again)")
+
+        fresh = enumerate(iter_records(input_path, file_format, skip=skip), start=skip)
+        if limit is not None:
+            fresh = islice(fresh, max(0, limit - skip))
+        records = chain(iter_positions(input_path, checkpoint["retry"], file_format), fresh)
+
+        # Anything past the last checkpoint was written by a run that crashed mid-chunk.
+        with open(output_path, "a", encoding="utf-8"):
+            pass
+        with open(output_path, "r+", encoding="utf-8") as out:
+            out.truncate(checkpoint["output_bytes"])
+
+        start = time.perf_counter()
+        processed = 0
+        fallbacks = 0
+        with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            push_interrupted = self._push_unpushed(checkpoint, checkpoint_path, out) if checkpoint["unpushed"] else 0
+
+            # Checkpoints one classified chunk, then pushes and writes the rows that did not fall back.
+            # Rows that fell back go back on the retry list instead.
+            def finish(positions, rows):
+                done = [row for row in rows if "fallback" not in row]
+                failed = [i for i, row in zip(positions, rows) if "fallback" in row]
+                checkpoint["retry"] = sorted(set(checkpoint["retry"]).difference(positions).union(failed))
+                checkpoint["records_done"] = max(checkpoint["records_done"], max(positions) + 1)
+                if self.push_to_salesforce:
+                    checkpoint["unpushed"] = done
+                    save_checkpoint(checkpoint_path, checkpoint)
+                    self._push_unpushed(checkpoint, checkpoint_path, out)
+                else:
+                    self._write(done, checkpoint, out)
+                    save_checkpoint(checkpoint_path, checkpoint)
+
+            for chunk in iter_chunks(records, chunk_size):
+                positions = [i for i, _ in chunk]
+                rows = self.classify([record for _, record in chunk])
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(finish, positions, rows)
+                processed += len(rows)
+                fallbacks += sum(1 for row in rows if "fallback" in row)
+                elapsed = time.perf_counter() - start
+                print(f"📦 {processed} records this run, {fallbacks} fell back "
+                      f"({processed / elapsed:.1f} records/s)", flush=True)
+            if pending is not None:
+                pending.result()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "records": processed,
+            "seconds": elapsed,
+            "records_per_second": processed / elapsed if elapsed else 0.0,
+            "cases_created": checkpoint["cases_created"],
+            "fallbacks": fallbacks,
+            "retry_pending": len(checkpoint["retry"]),
+            "push_interrupted": push_interrupted
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a JSONL or CSV file of tickets, optionally creating Salesforce cases.")
+    parser.add_argument("input", help="JSONL or CSV file with one ticket per record")
+    parser.add_argument("--output", default=None, help="JSONL file for classified records (default: <input file>.classified.jsonl)")
+    parser.add_argument("--checkpoint", default=None, help="Progress file used to resume (default: <output>.checkpoint)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Input format (default: from the file extension)")
+    parser.add_argument("--query-field", default="query", help="Field holding the ticket text")
+    parser.add_argument("--name-field", default="customer_name", help="Field holding the customer name")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Records read, classified and checkpointed together")
+    parser.add_argument("--batch-size", type=int, default=None, help="Queries per LLM call (default: AI_BATCH_SIZE)")
+    parser.add_argument("--concurrency", type=int, default=None, help="LLM calls in flight (default: AI_BATCH_CONCURRENCY)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many input records")
+    parser.add_argument("--salesforce", action="store_true", help="Create a Salesforce case for every record")
+    parser.add_argument("--bulk-api", action="store_true", help="Use the Bulk API instead of sObject Collections")
+    args = parser.parse_args()
+
+    output_path = args.output or f"{args.input}.classified.jsonl"
+    checkpoint_path = args.checkpoint or f"{output_path}.checkpoint"
+    if args.salesforce and not sf_integration.connect():
+        print("❌ Could not connect to Salesforce")
+        sys.exit(1)
+
+    ingest = BulkIngest(
+        query_field=args.query_field,
+        name_field=args.name_field,
+        push_to_salesforce=args.salesforce,
+        use_bulk_api=args.bulk_api,
+        batch_size=args.batch_size,
+        max_concurrency=args.concurrency
+    )
+    try:
+        summary = ingest.run(args.input, output_path, checkpoint_path, args.format, args.chunk_size, args.limit)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {summary['records']} records in {summary['seconds']:.1f}s "
+          f"({summary['records_per_second']:.1f} records/s) -> {output_path}")
+    if args.salesforce:
+        print(f"☁️  {summary['cases_created']} Salesforce cases created")
+    if summary['push_interrupted']:
+        print(f"⚠️  {summary['push_interrupted']} records were being pushed when the last run stopped; "
+              "check Salesforce for their cases")
+    if summary['retry_pending']:
+        print(f"⚠️  {summary['retry_pending']} records fell back and were not written; "
+              "run the same command again to retry them")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import os
+import time
+import uuid
+import random
+import threading
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+from metrics import record_error
+from salesforce_integration import COMPOSITE_BATCH_SIZE
+
+# Load environment variables
+load_dotenv()
+
+
+class CaseWriteQueue:
+    """
+    Write-behind queue for Salesforce Case creation.
+
+    enqueue() returns a local tracking ID immediately; a background thread flushes
+    pending cases in FIFO order through the sObject Collections API (at most 200
+    records per call), or the Bulk API once the backlog reaches bulk_threshold. Failed
+    calls are retried with backoff before the next group is sent, so creation order is
+    kept; a retry only sends the records the failed call never sent. Records of a failed
+    Bulk API job may exist in Salesforce already, so they are failed instead of resent.
+    """
+
+    def __init__(self, integration, flush_interval=1.0, max_batch=200, max_retries=3,
+                 bulk_threshold=2000, max_tracked=100000):
+        self.integration = integration
+        self.flush_interval = flush_interval
+        # One group is one composite call, so a failed call never leaves part of a group created.
+        self.max_batch = min(max_batch, COMPOSITE_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.bulk_threshold = bulk_threshold
+        self.max_tracked = max_tracked
+        self._pending = deque()  # (tracking_id, case_data)
+        self._retry = None  # (group, use_bulk, attempt) waiting out a backoff; sent before _pending
+        self._status = OrderedDict()  # tracking_id -> status dict
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self.enqueued = 0
+        self.created = 0
+        self.failed = 0
+        self.api_calls = 0
+        self.retries = 0
+
+    def start(self):
+        """Start the background flusher thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="case-write-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush=True):
+        """Stop the flusher, optionally sending everything still pending first."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def enqueue(self, customer_name, query, category, priority, ai_response, escalated=False):
+        """
+        Queue a Case for creation and return its tracking ID without waiting for Salesforce.
+
+        Args:
+            customer_name (str): Name of the customer
+            query (str): Original customer query
+            category (str): Predicted category
+            priority (str): Predicted priority
+            ai_response (str): AI-generated response
+            escalated (bool): Whether the case should be escalated
+
+        Returns:
+            dict: {"success": True, "tracking_id": str, "status": str}
+        """
+        case_data = self.integration.build_case_data(
+            customer_name, query, category, priority, ai_response, escalated
+        )
+        tracking_id = uuid.uuid4().hex
+        with self._cond:
+            self._track(tracking_id, {"state": "queued", "case_id": None, "status": case_data["Status"], "error": None})
+            self._pending.append((tracking_id, case_data))
+            self.enqueued += 1
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return {"success": True, "tracking_id": tracking_id, "status": case_data["Status"]}
+
+    def status(self, tracking_id):
+        """
+        Look up a queued case.
+
+        Returns:
+            dict or None: {"tracking_id", "state", "case_id", "status", "error"}, state being
+            queued, created or failed; None for unknown IDs
+        """
+        with self._cond:
+            entry = self._status.get(tracking_id)
+            return {"tracking_id": tracking_id, **entry} if entry is not None else None
+
+    def stats(self):
+        """Return queue depth and delivery counters."""
+        with self._cond:
+            pending = len(self._pending) + (len(self._retry[0]) if self._retry else 0)
+        return {
+            "pending": pending,
+            "enqueued": self.enqueued,
+            "created": self.created,
+            "failed": self.failed,
+            "api_calls": self.api_calls,
+            "retries": self.retries
+        }
+
+    def flush(self):
+        """Send every pending case now, in enqueue order."""
+        while True:
+            with self._flush_lock:
+                with self._cond:
+                    if self._retry is not None:
+                        group, use_bulk, attempt = self._retry
+                        self._retry = None
+                    elif self._pending:
+                        use_bulk = len(self._pending) >= self.bulk_threshold
+                        size = len(self._pending) if use_bulk else self.max_batch
+                        group = [self._pending.popleft() for _ in range(min(size, len(self._pending)))]
+                        attempt = 0
+                    else:
+                        return
+                resend = self._send(group, use_bulk, attempt)
+                if resend:
+                    # Sent before anything newer, whichever flush picks it up next.
+                    with self._cond:
+                        self._retry = (resend, use_bulk, attempt + 1)
+                        self.retries += 1
+            # The backoff runs without the flush lock, so stop() and other flushes are not held up.
+            if resend:
+                time.sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    # Records a tracking entry, dropping the oldest once max_tracked is exceeded.
+    def _track(self, tracking_id, entry):
+        self._status[tracking_id] = entry
+        while len(self._status) > self.max_tracked:
+            self._status.popitem(last=False)
+
+    # Makes one call for a group and returns the records to send again after a backoff. Results a
+    # failed call did return (PartialCreateError) are kept; records it may have created anyway (a
+    # failed Bulk API job) are failed rather than resent, so a retry never duplicates a case.
+    def _send(self, group, use_bulk, attempt):
+        records = [case_data for _, case_data in group]
+        try:
+            self.api_calls += 1
+            if use_bulk:
+                results = self.integration.bulk_create_cases(records)
+            else:
+                results = self.integration.create_cases(records)
+        except Exception as e:
+            record_error("salesforce_queue_flush", e)
+            results = getattr(e, "results", [])
+            uncertain = group[len(results):len(results) + getattr(e, "uncertain", 0)]
+            rest = group[len(results) + len(uncertain):]
+            self._resolve(group[:len(results)], results)
+            self._resolve(uncertain, [{"success": False, "error": f"The case may have been created; not resent: {e}"}] * len(uncertain))
+            if rest and attempt < self.max_retries:
+                return rest
+            print(f"Error flushing queued cases: {e}")
+            self._resolve(rest, [{"success": False, "error": str(e)}] * len(rest))
+            return []
+
+        # Entries Salesforce returned no result for are failed rather than left queued forever.
+        results = results[:len(group)]
+        missing = len(group) - len(results)
+        self._resolve(group, results + [{"success": False, "error": "No result returned by Salesforce"}] * missing)
+        return []
+
+    # Stores the outcome of each (tracking_id, case_data) entry.
+    def _resolve(self, entries, results):
+        with self._cond:
+            for (tracking_id, case_data), result in zip(entries, results):
+                if result["success"]:
+                    self.created += 1
+                    entry = {"state": "created", "case_id": result["case_id"], "status": result["status"], "error": None}
+                else:
+                    self.failed += 1
+                    entry = {"state": "failed", "case_id": None, "status": case_data["Status"], "error": result["error"]}
+                self._track(tracking_id, entry)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if len(self._pending) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+            self.flush()
+
+# Builds a queue from the SALESFORCE_QUEUE_* environment variables.
+def queue_from_env(integration):
+    return CaseWriteQueue(
+        integration,
+        flush_interval=float(os.getenv("SALESFORCE_QUEUE_FLUSH_INTERVAL", "1.0")),
+        max_batch=int(os.getenv("SALESFORCE_QUEUE_BATCH_SIZE", "200")),
+        max_retries=int(os.getenv("SALESFORCE_QUEUE_MAX_RETRIES", "3")),
+        bulk_threshold=int(os.getenv("SALESFORCE_QUEUE_BULK_THRESHOLD", "2000"))
+    )
@@ -0,0 +1,239 @@
+import os
+import time
+import zlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from response_cache import normalize_query
+from metrics import record_error
+
+# Load environment variables
+load_dotenv()
+
+# Mersenne prime used by the MinHash permutations; coefficients stay below it and shingle hashes
+# below 2**32, so a * x + b never overflows uint64.
+_PRIME = (1 << 31) - 1
+
+# Character 5-gram shingles of the normalized text; very short texts are one shingle.
+def _shingles(text, size=5):
+    normalized = normalize_query(text)
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+class MinHashLSH:
+    """
+    In-memory near-duplicate index over recent texts.
+
+    Each text gets a MinHash signature of num_perm values, split into bands; texts
+    sharing any band are candidates, and candidates whose estimated Jaccard
+    similarity reaches threshold are matches. Entries older than window seconds are
+    dropped, as are the oldest ones beyond max_entries.
+    """
+
+    def __init__(self, num_perm=128, bands=32, threshold=0.5, window=1800.0, max_entries=50000, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window = window
+        self.max_entries = max_entries
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._entries = OrderedDict()  # key -> (signature, added_at, group)
+        self._buckets = {}  # (band, band hash) -> set of keys
+
+    def signature(self, text):
+        """Return the MinHash signature of a text."""
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in _shingles(text)), dtype=np.uint64)
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def expire(self, now=None):
+        """Drop entries that fell out of the time window or beyond max_entries, returning their keys."""
+        cutoff = (now or time.time()) - self.window
+        removed = []
+        while self._entries:
+            key, (_, added_at, _) = next(iter(self._entries.items()))
+            if added_at >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self.remove(key)
+            removed.append(key)
+        return removed
+
+    def add(self, key, signature, group=None, now=None):
+        """Index a signature under key; only entries with the same group can match each other."""
+        self._entries[key] = (signature, now or time.time(), group)
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in self._band_keys(entry[0]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def query(self, signature, group=None):
+        """
+        Find the most similar indexed entry.
+
+        Returns:
+            tuple or None: (key, estimated Jaccard similarity) of the best match at or above threshold
+        """
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self._buckets.get(band_key, set())
+        best = None
+        for key in candidates:
+            candidate, _, candidate_group = self._entries[key]
+            if candidate_group != group:
+                continue
+            similarity = float(np.mean(candidate == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _ParentCase:
+    """A case other reports can be merged into; ready is set once its creation has finished."""
+
+    def __init__(self, query, category):
+        self.query = query
+        self.category = category
+        self.case_id = None
+        self.status = None
+        self.reports = 1
+        self.first_seen = time.time()
+        self.ready = threading.Event()
+
+
+class CaseDeduplicator:
+    """
+    Creates Salesforce cases, attaching near-duplicate reports to an existing parent case.
+
+    A report whose query is a near-duplicate of a case created within the window (same
+    category and escalation flag) becomes a Task on that case instead of a new Case.
+    Reports arriving while the parent is still being created wait up to wait_timeout
+    seconds for its ID. A new Case is created whenever no parent can be used, so no
+    report is lost.
+    """
+
+    def __init__(self, integration, index, wait_timeout=10.0):
+        self.integration = integration
+        self.index = index
+        self.wait_timeout = wait_timeout
+        self._parents = {}  # index key -> _ParentCase
+        self._lock = threading.Lock()
+        self._next_key = 0
+        self.cases_created = 0
+        self.duplicates_attached = 0
+        self.attach_failures = 0
+
+    def create_case(self, customer_name, query, category, priority, ai_response, escalated=False):
+        """
+        Create a Case, or a Task on the parent case when the query duplicates a recent one.
+
+        Returns:
+            dict: The create_case() result; for duplicates {"success", "case_id", "status",
+            "duplicate": True, "task_id"} where case_id is the parent case
+        """
+        signature = self.index.signature(query)
+        group = (category, bool(escalated))
+        with self._lock:
+            for expired in self.index.expire():
+                self._parents.pop(expired, None)
+            match = self.index.query(signature, group)
+            if match is not None:
+                parent = self._parents[match[0]]
+            else:
+                parent = None
+                key = self._next_key
+                self._next_key += 1
+                own = self._parents[key] = _ParentCase(query, category)
+                self.index.add(key, signature, group)
+
+        if parent is not None:
+            attached = self._attach(parent, customer_name, query, ai_response)
+            if attached is not None:
+                return attached
+            # No usable parent: open a case of its own.
+            return self.integration.create_case(customer_name, query, category, priority, ai_response, escalated)
+
+        result = self.integration.create_case(customer_name, query, category, priority, ai_response, escalated)
+        with self._lock:
+            if result['success']:
+                own.case_id, own.status = result['case_id'], result.get('status')
+                self.cases_created += 1
+            else:
+                # Later duplicates must not wait on a case that does not exist.
+                self.index.remove(key)
+                self._parents.pop(key, None)
+        own.ready.set()
+        return result
+
+    # Adds a Task to the parent case, or returns None if the parent never got a case ID.
+    def _attach(self, parent, customer_name, query, ai_response):
+        if not parent.ready.wait(self.wait_timeout) or parent.case_id is None:
+            return None
+        task = self.integration.create_task(
+            parent.case_id,
+            subject=f"Duplicate report: {customer_name}",
+            description=f"Customer Query: {query}\n\nAI Response: {ai_response}"
+        )
+        if not task['success']:
+            print(f"Error attaching duplicate to case {parent.case_id}: {task['error']}")
+            record_error("duplicate_attach", RuntimeError(task['error']))
+            with self._lock:
+                self.attach_failures += 1
+            return None
+        with self._lock:
+            parent.reports += 1
+            self.duplicates_attached += 1
+        return {"success": True, "case_id": parent.case_id, "status": parent.status, "duplicate": True, "task_id": task['task_id']}
+
+    def clusters(self, limit=20):
+        """Return the parent cases with the most reports in the window, largest first."""
+        with self._lock:
+            for expired in self.index.expire():
+                self._parents.pop(expired, None)
+            parents = list(self._parents.values())
+        parents.sort(key=lambda p: p.reports, reverse=True)
+        return [
+            {"case_id": p.case_id, "category": p.category, "reports": p.reports, "first_seen": p.first_seen, "query": p.query}
+            for p in parents[:limit] if p.reports > 1
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "indexed": len(self.index),
+                "cases_created": self.cases_created,
+                "duplicates_attached": self.duplicates_attached,
+                "attach_failures": self.attach_failures
+            }
+
+# Builds a deduplicator from the DUPLICATE_* environment variables, or None when detection is off.
+def deduplicator_from_env(integration):
+    if os.getenv("DUPLICATE_DETECTION", "false").lower() not in ("1", "true", "yes"):
+        return None
+    index = MinHashLSH(
+        threshold=float(os.getenv("DUPLICATE_THRESHOLD", "0.5")),
+        window=float(os.getenv("DUPLICATE_WINDOW_MINUTES", "30")) * 60,
+        max_entries=int(os.getenv("DUPLICATE_MAX_ENTRIES", "50000"))
+    )
+    return CaseDeduplicator(integration, index, wait_timeout=float(os.getenv("DUPLICATE_WAIT_TIMEOUT", "10")))
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Local first-stage classifier for customer queries.
+
+A TF-IDF vectorizer feeds two logistic-regression models (category and priority).
+It is trained from past classify_query() outputs, as logged to CLASSIFICATION_LOG_PATH,
+and lets the engine skip the LLM classification step for tickets it is confident about.
+
+Usage:
+    python fast_classifier.py train --data classifications.jsonl --model fast_classifier.joblib
+    python fast_classifier.py report --data classifications.jsonl --model fast_classifier.joblib
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+CATEGORIES = ["Billing", "Technical Issue", "Product Inquiry", "Feedback", "General Inquiry"]
+PRIORITIES = ["Low", "Medium", "High"]
+
+
+class FastClassifier:
+    """TF-IDF + linear models predicting category and priority with a confidence gate."""
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        self.category_model = LogisticRegression(max_iter=1000)
+        self.priority_model = LogisticRegression(max_iter=1000)
+        self.attempts = 0
+        self.accepted = 0
+        self._lock = threading.Lock()
+
+    def fit(self, queries, categories, priorities):
+        """Fit the vectorizer and both models on labelled queries."""
+        features = self.vectorizer.fit_transform(queries)
+        self.category_model.fit(features, categories)
+        self.priority_model.fit(features, priorities)
+        return self
+
+    def predict_many(self, queries):
+        """
+        Predict category and priority for many queries in one sparse pass.
+
+        Args:
+            queries (list[str]): Customer query texts
+
+        Returns:
+            list[dict]: {'category', 'priority', 'confidence'} per query, where confidence
+            is the lower of the two models' top class probabilities
+        """
+        features = self.vectorizer.transform(queries)
+        category_proba = self.category_model.predict_proba(features)
+        priority_proba = self.priority_model.predict_proba(features)
+        category_idx = category_proba.argmax(axis=1)
+        priority_idx = priority_proba.argmax(axis=1)
+        confidence = np.minimum(category_proba.max(axis=1), priority_proba.max(axis=1))
+        return [
+            {
+                'category': str(self.category_model.classes_[c]),
+                'priority': str(self.priority_model.classes_[p]),
+                'confidence': float(conf)
+            }
+            for c, p, conf in zip(category_idx, priority_idx, confidence)
+        ]
+
+    def predict(self, query):
+        """
+        Predict a single query, returning None unless it clears the confidence threshold.
+
+        Args:
+            query (str): Customer query text
+
+        Returns:
+            dict or None: {'category', 'priority', 'confidence'} when confident
+        """
+        prediction = self.predict_many([query])[0]
+        confident = prediction['confidence'] >= self.threshold
+        with self._lock:
+            self.attempts += 1
+            if confident:
+                self.accepted += 1
+        return prediction if confident else None
+
+    def stats(self):
+        """Return how many lookups were answered locally instead of by the LLM."""
+        return {
+            "threshold": self.threshold,
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "llm_classifications_saved": self.accepted / self.attempts if self.attempts else 0.0
+        }
+
+    def save(self, path):
+        joblib.dump(
+            {
+                "threshold": self.threshold,
+                "vectorizer": self.vectorizer,
+                "category_model": self.category_model,
+                "priority_model": self.priority_model
+            },
+            path
+        )
+
+    @classmethod
+    def load(cls, path, threshold=None):
+        state = joblib.load(path)
+        classifier = cls(threshold=state["threshold"] if threshold is None else threshold)
+        classifier.vectorizer = state["vectorizer"]
+        classifier.category_model = state["category_model"]
+        classifier.priority_model = state["priority_model"]
+        return classifier
+
+# Reads {"query", "category", "priority"} records from a JSONL classification log, skipping unknown labels.
+def load_records(path):
+    queries, categories, priorities = [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("category") in CATEGORIES and record.get("priority") in PRIORITIES:
+                queries.append(record["query"])
+                categories.append(record["category"])
+                priorities.append(record["priority"])
+    return queries, categories, priorities
+
+# Loads the model named by FAST_CLASSIFIER_PATH, or None when unset or missing.
+def classifier_from_env():
+    path = os.getenv("FAST_CLASSIFIER_PATH")
+    if not path or not os.path.exists(path):
+        return None
+    threshold = os.getenv("FAST_CLASSIFIER_THRESHOLD")
+    try:
+        return FastClassifier.load(path, threshold=float(threshold) if threshold else None)
+    except Exception as e:
+        print(f"Failed to load fast classifier: {e}")
+        return None
+
+# Prints how much LLM classification traffic the model would have absorbed on the given records.
+def print_report(classifier, queries, categories, priorities):
+    predictions = classifier.predict_many(queries)
+    confident = [
+        (p, c, pr) for p, c, pr in zip(predictions, categories, priorities)
+        if p['confidence'] >= classifier.threshold
+    ]
+    agreement = sum(1 for p, c, pr in confident if p['category'] == c and p['priority'] == pr)
+
+    print(f"Records evaluated:     {len(queries)}")
+    print(f"Confidence threshold:  {classifier.threshold:.2f}")
+    print(f"Handled locally:       {len(confident)} ({len(confident) / max(len(queries), 1):.1%} of LLM classifications saved)")
+    if confident:
+        print(f"Agreement with LLM:    {agreement / len(confident):.1%} on locally handled records")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the local fast-path classifier.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train a model from a classification log")
+    train_parser.add_argument("--data", required=True, help="JSONL file of past classify_query() outputs")
+    train_parser.add_argument("--model", default="fast_classifier.joblib", help="Where to write the model")
+    train_parser.add_argument("--threshold", type=float, default=0.8, help="Confidence needed to skip the LLM")
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of records kept for the report")
+
+    report_parser = subparsers.add_parser("report", help="Report LLM traffic a saved model would save")
+    report_parser.add_argument("--data", required=True, help="JSONL file of past classify_query() outputs")
+    report_parser.add_argument("--model", default="fast_classifier.joblib", help="Saved model to evaluate")
+    report_parser.add_argument("--threshold", type=float, default=None, help="Override the saved threshold")
+
+    args = parser.parse_args()
+    queries, categories, priorities = load_records(args.data)
+    if len(queries) < 10:
+        print(f"❌ Need at least 10 labelled records, found {len(queries)}")
+        sys.exit(1)
+    if len(set(categories)) < 2 or len(set(priorities)) < 2:
+        print("❌ Need at least two distinct categories and priorities to train")
+        sys.exit(1)
+
+    if args.command == "train":
+        train_q, test_q, train_c, test_c, train_p, test_p = train_test_split(
+            queries, categories, priorities, test_size=args.holdout, random_state=42
+        )
+        classifier = FastClassifier(threshold=args.threshold).fit(train_q, train_c, train_p)
+        print_report(classifier, test_q, test_c, test_p)
+
+        # Refit on everything before saving so no labelled data is wasted.
+        classifier = FastClassifier(threshold=args.threshold).fit(queries, categories, priorities)
+        classifier.save(args.model)
+        print(f"✅ Model saved to {args.model}")
+    else:
+        classifier = FastClassifier.load(args.model, threshold=args.threshold)
+        print_report(classifier, queries, categories, priorities)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Durable background jobs for classification plus Salesforce case creation.
+
+Jobs live in a local SQLite database in WAL mode, so they survive restarts and can be
+shared by the API process and any number of worker processes on the same host.
+Workers claim jobs with a lease that they renew while the job runs; a job whose worker
+died is picked up again once its lease expires. Each claim gets its own lease token, and
+a worker only records the outcome of a job while it still holds that lease.
+
+Run extra worker processes (one per core by default) with:
+    python job_queue.py worker --processes 4 --threads 4
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from functools import partial
+from dotenv import load_dotenv
+from metrics import record_error
+from local_state import state_path
+
+# Load environment variables
+load_dotenv()
+
+# Job store file; defaults to the private state directory, which is only created once a store is opened.
+JOB_DB_PATH = os.getenv("JOB_DB_PATH")
+
+
+class JobStore:
+    """SQLite-backed job table with lease-based claiming."""
+
+    def __init__(self, path=None, lease_seconds=120.0, max_attempts=3):
+        self.path = path or JOB_DB_PATH or state_path("jobs.sqlite3")
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, lease_expires REAL, lease_token TEXT)"
+        )
+        # Stores created before leases had tokens.
+        if "lease_token" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+            conn.execute("ALTER TABLE jobs ADD COLUMN lease_token TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    # One connection per thread; WAL lets the API and workers in other processes share the file.
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, payload):
+        """Store a new queued job and return its ID."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+            (job_id, json.dumps(payload), now, now)
+        )
+        return job_id
+
+    def get(self, job_id):
+        """
+        Look up a job.
+
+        Returns:
+            dict or None: {"job_id", "status", "payload", "result", "error", "attempts", "created_at", "updated_at"}
+        """
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "payload": json.loads(row["payload"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def claim(self):
+        """
+        Atomically take the oldest runnable job: queued, or running with an expired lease and attempts
+        left. An expired lease whose job has used all its attempts marks the job failed instead, so a job
+        that keeps killing its worker is not retried forever.
+
+        Returns:
+            tuple or None: (job_id, payload, lease_token)
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', lease_expires = NULL, "
+                "lease_token = NULL, updated_at = ? WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_expires < ? AND attempts < ?) ORDER BY created_at LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            token = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                "lease_expires = ?, lease_token = ?, updated_at = ? WHERE id = ?",
+                (now + self.lease_seconds, token, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            return row["id"], json.loads(row["payload"]), token
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def renew(self, job_id, token):
+        """Extend a running job's lease; returns False when the lease has passed to another worker."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'running' AND lease_token = ?",
+            (time.time() + self.lease_seconds, job_id, token)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, token, result):
+        """Store a job's result; returns False, storing nothing, when the lease is no longer ours."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires = NULL, lease_token = NULL, "
+            "updated_at = ? WHERE id = ? AND status = 'running' AND lease_token = ?",
+            (json.dumps(result), time.time(), job_id, token)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, token, error):
+        """Record a failed attempt, re-queueing the job until it runs out of attempts (only while the lease is ours)."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = ?, lease_expires = NULL, lease_token = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND lease_token = ?",
+            (self.max_attempts, error, time.time(), job_id, token)
+        )
+        return cursor.rowcount == 1
+
+    def counts(self):
+        """Return the number of jobs in each status."""
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+# Runs the /create_case pipeline for one job payload.
+def process_job(payload, create_case=None):
+    """
+    Classify the query and create its Salesforce case.
+
+    Args:
+        payload (dict): {"customer_name", "query", "escalated"}
+        create_case (callable): Case creation function (defaults to sf_integration.create_case)
+
+    Returns:
+        dict: The same fields as the /create_case response
+
+    Raises:
+        RuntimeError: When the case could not be created, so the job is retried
+    """
+    from ai_engine import classify_query
+    from salesforce_integration import sf_integration
+
+    create_case = create_case or sf_integration.create_case
+    result = classify_query(payload["query"])
+    sf_result = create_case(
+        customer_name=payload["customer_name"],
+        query=payload["query"],
+        category=result['category'],
+        priority=result['priority'],
+        ai_response=result['response'],
+        escalated=payload.get("escalated", False)
+    )
+    if not sf_result['success']:
+        raise RuntimeError(f"Case creation failed: {sf_result.get('error')}")
+    return {
+        "customer_name": payload["customer_name"],
+        "query": payload["query"],
+        "category": result['category'],
+        "priority": result['priority'],
+        "response": result['response'],
+        "confidence": result['confidence'],
+        "salesforce_case_id": sf_result.get('case_id'),
+        "salesforce_status": sf_result.get('status'),
+        "salesforce_task_id": sf_result.get('task_id'),
+        "duplicate": sf_result.get('duplicate', False),
+        "escalated": payload.get("escalated", False)
+    }
+
+
+class JobWorkerPool:
+    """
+    Threads that claim jobs from a JobStore and run process_job() on them.
+
+    A heartbeat thread renews the lease of every running job three times per lease
+    period, so slow jobs are not claimed a second time by another worker.
+    """
+
+    def __init__(self, store, threads=2, poll_interval=0.2, handler=process_job):
+        self.store = store
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.handler = handler
+        self._stop = threading.Event()
+        self._workers = []
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+        self._leases = {}  # job_id -> lease token of jobs running in this pool
+        self._leases_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.lost_leases = 0
+
+    def start(self):
+        self._stop.clear()
+        for i in range(self.threads):
+            worker = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop(self):
+        """Stop claiming new jobs and wait for running ones to finish."""
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        # Running jobs keep their leases until they have finished.
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+    def stats(self):
+        return {"threads": self.threads, "processed": self.processed, "failed": self.failed,
+                "lost_leases": self.lost_leases, **{
+            f"jobs_{status}": count for status, count in self.store.counts().items()
+        }}
+
+    # Renews the leases of running jobs until the pool has stopped.
+    def _heartbeat(self):
+        while not self._heartbeat_stop.wait(self.store.lease_seconds / 3):
+            with self._leases_lock:
+                leases = list(self._leases.items())
+            for job_id, token in leases:
+                try:
+                    self.store.renew(job_id, token)
+                except sqlite3.OperationalError as e:
+                    record_error("job_heartbeat", e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim()
+            except sqlite3.OperationalError as e:
+                # The database is busy with another process; try again shortly.
+                record_error("job_claim", e)
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            job_id, payload, token = job
+            with self._leases_lock:
+                self._leases[job_id] = token
+            try:
+                try:
+                    owned = self.store.complete(job_id, token, self.handler(payload))
+                    self.processed += 1
+                except Exception as e:
+                    print(f"Error processing job {job_id}: {e}")
+                    record_error("job", e)
+                    owned = self.store.fail(job_id, token, str(e))
+                    self.failed += 1
+            finally:
+                with self._leases_lock:
+                    del self._leases[job_id]
+            if not owned:
+                # The lease ran out (e.g. the heartbeat could not reach the database) and the job
+                # went to another worker, whose outcome stands.
+                print(f"Lost the lease on job {job_id}; its result was not stored")
+                self.lost_leases += 1
+
+# Builds the store described by the JOB_* environment variables.
+def store_from_env():
+    return JobStore(
+        lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "120")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    )
+
+# Entry point of one worker process.
+def _worker_process(threads):
+    from salesforce_integration import sf_integration
+    from duplicate_detector import deduplicator_from_env
+
+    deduplicator = deduplicator_from_env(sf_integration)
+    handler = partial(process_job, create_case=deduplicator.create_case) if deduplicator else process_job
+    pool = JobWorkerPool(store_from_env(), threads=threads, handler=handler)
+    pool.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker_parser = subparsers.add_parser("worker", help="Process queued jobs")
+    worker_parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    worker_parser.add_argument("--threads", type=int, default=4, help="Worker threads per process")
+    args = parser.parse_args()
+
+    # Each process would keep its own duplicate index, so duplicates sent to different processes
+    # would each open a case.
+    if args.processes > 1 and os.getenv("DUPLICATE_DETECTION", "false").lower() in ("1", "true", "yes"):
+        parser.error(f"DUPLICATE_DETECTION keeps its index in one process and cannot be used with --processes {args.processes}; "
+                     "run a single process or turn it off")
+
+    print(f"Starting {args.processes} worker process(es) x {args.threads} thread(s) on {store_from_env().path}")
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(args.threads,), name=f"job-worker-process-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# Keyword rules that guess a ticket's category and priority without any model. The stub LLM
+# backend answers with them, and the priority scheduler uses them to order tickets it has no
+# local classifier for.
+
+CATEGORY_KEYWORDS = [
+    ("Billing", ("bill", "invoice", "charge", "refund", "payment", "price", "subscription")),
+    ("Technical Issue", ("error", "crash", "bug", "login", "password", "not working", "broken", "access")),
+    ("Product Inquiry", ("feature", "product", "support for", "does it", "available", "compatible")),
+    ("Feedback", ("love", "great", "terrible", "suggest", "feedback", "disappointed"))
+]
+URGENT_KEYWORDS = ("urgent", "immediately", "asap", "down", "can't", "cannot", "twice", "lost")
+
+# Returns the (category, priority) the keyword rules assign to a query.
+def classify_by_keywords(query):
+    text = query.lower()
+    category = next((c for c, words in CATEGORY_KEYWORDS if any(w in text for w in words)), "General Inquiry")
+    urgent = any(w in text for w in URGENT_KEYWORDS)
+    priority = "High" if urgent else ("Low" if category in ("Feedback", "General Inquiry") else "Medium")
+    return category, priority
@@ -0,0 +1,623 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import importlib.util
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from metrics import REGISTRY, record_error
+from keyword_rules import classify_by_keywords
+
+BACKEND_CALLS = REGISTRY.counter(
+    "helpdesk_llm_backend_calls_total",
+    "LLM calls by backend and outcome (ok or error).",
+    ["backend", "outcome"]
+)
+HEDGES = REGISTRY.counter(
+    "helpdesk_llm_hedges_total",
+    "Hedged LLM requests, by outcome (fired, or won by the primary or the hedge backend).",
+    ["outcome"]
+)
+
+
+@dataclass(slots=True)
+class UsageMetadata:
+    """Token counts in the shape of Gemini's usage_metadata, for backends that report them."""
+    prompt_token_count: int = 0
+    candidates_token_count: int = 0
+
+
+@dataclass(slots=True)
+class LLMResponse:
+    """Reply of a non-Gemini backend; exposes .text and .usage_metadata like a Gemini response."""
+    text: str
+    usage_metadata: UsageMetadata = None
+
+
+class LLMBackend:
+    """
+    Base class for LLM backends.
+
+    Subclasses implement generate(); agenerate() defaults to running it on a worker
+    thread, and streaming defaults to iterating generate_stream() on a worker thread.
+    Backends with a guard (a resilience.ResilientCaller) are called through it.
+    system_instruction carries a prompt's static instructions separately from its
+    per-request text.
+    """
+
+    name = "base"
+
+    def __init__(self, guard=None, executor=None):
+        self.guard = guard
+        self.executor = executor
+
+    def generate(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        raise NotImplementedError
+
+    # Builds clients and loads models ahead of the first call; backends with nothing to prepare do nothing.
+    def warm(self, system_instructions=(None,)):
+        pass
+
+    # Yields the reply in chunks; backends without native streaming return it in one piece.
+    def generate_stream(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        yield self.generate(prompt, generation_config, timeout, system_instruction)
+
+    async def agenerate(self, prompt, generation_config=None, timeout=None, stream=False, system_instruction=None):
+        if stream:
+            return self._aiter_in_thread(
+                partial(self.generate_stream, prompt, generation_config, timeout, system_instruction)
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self.generate, prompt, generation_config, timeout, system_instruction)
+        )
+
+    # Pumps a blocking iterator on a worker thread into an async iterator.
+    async def _aiter_in_thread(self, make_iterator):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+
+        def pump():
+            try:
+                for item in make_iterator():
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        loop.run_in_executor(self.executor, pump)
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def call(self, prompt, **kwargs):
+        """Run generate(), through the guard when the backend has one."""
+        try:
+            if self.guard is None:
+                result = self.generate(prompt, **kwargs)
+            else:
+                result = self.guard.call(lambda timeout: self.generate(prompt, timeout=timeout, **kwargs))
+        except Exception:
+            BACKEND_CALLS.inc(backend=self.name, outcome="error")
+            raise
+        BACKEND_CALLS.inc(backend=self.name, outcome="ok")
+        return result
+
+    async def acall(self, prompt, **kwargs):
+        """Async version of call()."""
+        try:
+            if self.guard is None:
+                result = await self.agenerate(prompt, **kwargs)
+            else:
+                result = await self.guard.acall(lambda timeout: self.agenerate(prompt, timeout=timeout, **kwargs))
+        except Exception:
+            BACKEND_CALLS.inc(backend=self.name, outcome="error")
+            raise
+        BACKEND_CALLS.inc(backend=self.name, outcome="ok")
+        return result
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini through google-generativeai; the client is configured on first use.
+
+    Static prompt instructions are sent as the model's system instruction. With
+    context_cache enabled they are stored once as Gemini cached content, named after
+    a hash of the instruction text so a changed template gets a new entry, and each
+    call then only sends the per-request text.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model_name="gemini-1.5-flash", api_key=None, model=None, context_cache=False,
+                 context_cache_ttl=3600, guard=None, executor=None):
+        super().__init__(guard, executor)
+        self.model_name = model_name
+        self.api_key = api_key
+        self.model = model  # explicit model (e.g. a test fake) used for every call instead of the real client
+        self.context_cache = context_cache
+        self.context_cache_ttl = context_cache_ttl
+        self._models = {}  # system instruction -> (GenerativeModel, rebuild after)
+        self._configured = False
+        self._lock = threading.Lock()
+
+    # Returns the client for a system instruction, building it (and its cached content) when missing or expiring.
+    def _model(self, system_instruction=None):
+        if self.model is not None:
+            return self.model
+        entry = self._models.get(system_instruction)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        with self._lock:
+            entry = self._models.get(system_instruction)
+            if entry is None or entry[1] <= time.time():
+                entry = self._models[system_instruction] = self._build_model(system_instruction)
+            return entry[0]
+
+    def _build_model(self, system_instruction):
+        import google.generativeai as genai
+        if not self._configured:
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+        if system_instruction and self.context_cache:
+            try:
+                return self._cached_model(genai, system_instruction)
+            except Exception as e:
+                # Typically a prompt below the model's minimum cacheable size; try again after one TTL.
+                print(f"Gemini context cache unavailable, sending instructions with each call: {e}")
+                record_error("context_cache", e)
+                model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+                return model, time.time() + self.context_cache_ttl
+        return genai.GenerativeModel(self.model_name, system_instruction=system_instruction), float("inf")
+
+    # Reuses the cached content for an instruction if any process already created it, otherwise creates it.
+    def _cached_model(self, genai, system_instruction):
+        from google.generativeai import caching
+        display_name = "helpdesk-" + hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:16]
+        cached = next(
+            (c for c in caching.CachedContent.list(page_size=100)
+             if c.display_name == display_name and c.model.endswith(self.model_name)
+             and c.expire_time.timestamp() > time.time() + 60),
+            None
+        )
+        if cached is None:
+            cached = caching.CachedContent.create(
+                model=self.model_name,
+                display_name=display_name,
+                system_instruction=system_instruction,
+                ttl=timedelta(seconds=self.context_cache_ttl)
+            )
+        # Rebuild a minute before expiry so no call lands on an expired cache.
+        return genai.GenerativeModel.from_cached_content(cached), cached.expire_time.timestamp() - 60
+
+    def warm(self, system_instructions=(None,)):
+        for system_instruction in system_instructions:
+            self._model(system_instruction)
+
+    # Gemini's per-request timeout; omitted when the caller has no deadline.
+    @staticmethod
+    def _options(timeout):
+        return {"request_options": {"timeout": timeout}} if timeout is not None else {}
+
+    def generate(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        return self._model(system_instruction).generate_content(
+            prompt, generation_config=generation_config, **self._options(timeout)
+        )
+
+    def generate_stream(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        return self._model(system_instruction).generate_content(
+            prompt, generation_config=generation_config, stream=True, **self._options(timeout)
+        )
+
+    async def agenerate(self, prompt, generation_config=None, timeout=None, stream=False, system_instruction=None):
+        model = self._model(system_instruction)
+        if not hasattr(model, "generate_content_async"):
+            return await super().agenerate(prompt, generation_config, timeout, stream, system_instruction)
+        if stream:
+            return await model.generate_content_async(
+                prompt, generation_config=generation_config, stream=True, **self._options(timeout)
+            )
+        return await model.generate_content_async(prompt, generation_config=generation_config, **self._options(timeout))
+
+
+class LlamaCppBackend(LLMBackend):
+    """
+    Local quantized model (GGUF) on the CPU through llama-cpp-python.
+
+    JSON output is constrained with the request's response_schema. A llama.cpp model
+    is not thread-safe, so calls are serialized.
+    """
+
+    name = "llama_cpp"
+
+    def __init__(self, model_path, n_ctx=2048, n_threads=None, max_tokens=512, guard=None, executor=None):
+        super().__init__(guard, executor)
+        if importlib.util.find_spec("llama_cpp") is None:
+            raise ImportError("The llama_cpp backend needs llama-cpp-python: pip install llama-cpp-python")
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self.max_tokens = max_tokens
+        self._llm = None
+        self._lock = threading.Lock()
+
+    # Loads the model on first use (or in warm()); call with self._lock held.
+    def _model(self):
+        if self._llm is None:
+            from llama_cpp import Llama
+            self._llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads, verbose=False)
+        return self._llm
+
+    def warm(self, system_instructions=(None,)):
+        with self._lock:
+            self._model()
+
+    # Takes the model lock, giving up with TimeoutError once the deadline passes.
+    def _acquire(self, deadline):
+        wait = -1 if deadline is None else max(0.0, deadline - time.monotonic())
+        if not self._lock.acquire(timeout=wait):
+            raise TimeoutError("Timed out waiting for the llama.cpp model")
+
+    # Chat completion arguments for a prompt, with JSON-schema constrained output when requested.
+    # The model runs in-process, so the timeout is enforced by stopping generation at the deadline.
+    def _request(self, prompt, generation_config, system_instruction, deadline=None):
+        messages = [{"role": "user", "content": prompt}]
+        if system_instruction:
+            messages.insert(0, {"role": "system", "content": system_instruction})
+        request = {"messages": messages, "max_tokens": self.max_tokens, "temperature": 0}
+        config = generation_config or {}
+        if config.get("response_mime_type") == "application/json":
+            request["response_format"] = {"type": "json_object", "schema": config.get("response_schema")}
+        if deadline is not None:
+            from llama_cpp import StoppingCriteriaList
+            request["stopping_criteria"] = StoppingCriteriaList([lambda input_ids, logits: time.monotonic() >= deadline])
+        return request
+
+    # A reply cut off at the deadline is incomplete, so it is reported as a timeout.
+    @staticmethod
+    def _check_deadline(deadline):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError("llama.cpp generation did not finish before the timeout")
+
+    def generate(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        request = self._request(prompt, generation_config, system_instruction, deadline)
+        self._acquire(deadline)
+        try:
+            completion = self._model().create_chat_completion(**request)
+        finally:
+            self._lock.release()
+        self._check_deadline(deadline)
+        usage = completion.get("usage") or {}
+        return LLMResponse(
+            text=completion["choices"][0]["message"]["content"] or "",
+            usage_metadata=UsageMetadata(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        )
+
+    def generate_stream(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        request = self._request(prompt, generation_config, system_instruction, deadline)
+        self._acquire(deadline)
+        try:
+            for chunk in self._model().create_chat_completion(stream=True, **request):
+                text = chunk["choices"][0]["delta"].get("content")
+                if text:
+                    yield LLMResponse(text=text)
+        finally:
+            self._lock.release()
+        self._check_deadline(deadline)
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic keyword-based backend for tests and offline development.
+
+    Answers every prompt format ai_engine sends (JSON object, batch JSON array,
+    line-prefixed text, reply only) without any model or network access.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, guard=None, executor=None):
+        super().__init__(guard, executor)
+        self.latency = latency
+
+    @classmethod
+    def classify(cls, query):
+        """Return the (category, priority) the stub assigns to a query."""
+        return classify_by_keywords(query)
+
+    @classmethod
+    def _item(cls, query):
+        category, priority = cls.classify(query)
+        return {
+            "category": category,
+            "priority": priority,
+            "response": f"Thank you for contacting us. We have logged your {category.lower()} request and will follow up shortly.",
+            "confidence": 0.75
+        }
+
+    def generate(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        if self.latency:
+            time.sleep(self.latency)
+        schema = (generation_config or {}).get("response_schema") or {}
+        if schema.get("type") == "array":
+            items = re.findall(r"^\s*\[(\d+)\] (.*)$", prompt, re.MULTILINE)
+            return LLMResponse(json.dumps([{"index": int(i), **self._item(q)} for i, q in items]))
+
+        match = re.search(r"Query: (.*)", prompt)
+        query = match.group(1).strip() if match else prompt.strip()
+        item = self._item(query)
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            return LLMResponse(json.dumps(item))
+        if "Category: [category]" in f"{system_instruction or ''}{prompt}":
+            return LLMResponse(
+                f"Category: {item['category']}\nPriority: {item['priority']}\n"
+                f"Response: {item['response']}\nConfidence: {item['confidence']}"
+            )
+        return LLMResponse(item['response'])
+
+    def generate_stream(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        text = self.generate(prompt, generation_config, timeout, system_instruction).text
+        for i in range(0, len(text), 16):
+            yield LLMResponse(text[i:i + 16])
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Serves replies recorded with TRAFFIC_MODE=record instead of calling a model.
+
+    Replies are looked up by prompt and system instruction, and each takes its recorded
+    latency divided by the log's replay speed. Recorded failures are raised again.
+    Prompts that were never recorded go to the fallback backend, or fail without one.
+    """
+
+    name = "replay"
+
+    def __init__(self, log, fallback=None, executor=None):
+        super().__init__(None, executor)
+        self.log = log
+        self.fallback = fallback
+
+    # The recorded call for a prompt, or None when it has to go to the fallback.
+    def _record(self, prompt, system_instruction):
+        from traffic_replay import prompt_key
+        record = self.log.reply(prompt_key(system_instruction, prompt))
+        if record is None and self.fallback is None:
+            raise LookupError("No recorded reply for this prompt and no LLM_REPLAY_FALLBACK backend")
+        return record
+
+    # Misses go through the fallback's call()/acall(), so its guard and BACKEND_CALLS apply; a guarded
+    # fallback takes its timeout from the guard.
+    def _fallback_kwargs(self, generation_config, timeout, system_instruction):
+        kwargs = {"generation_config": generation_config, "system_instruction": system_instruction}
+        if self.fallback.guard is None:
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    @staticmethod
+    def _response(record):
+        if "error" in record:
+            raise RuntimeError(record["error"])
+        usage = record.get("usage")
+        return LLMResponse(record["reply"], UsageMetadata(*usage) if usage else None)
+
+    def generate(self, prompt, generation_config=None, timeout=None, system_instruction=None):
+        record = self._record(prompt, system_instruction)
+        if record is None:
+            return self.fallback.call(prompt, **self._fallback_kwargs(generation_config, timeout, system_instruction))
+        time.sleep(self.log.delay(record))
+        return self._response(record)
+
+    async def agenerate(self, prompt, generation_config=None, timeout=None, stream=False, system_instruction=None):
+        if stream:
+            return await super().agenerate(prompt, generation_config, timeout, True, system_instruction)
+        record = self._record(prompt, system_instruction)
+        if record is None:
+            return await self.fallback.acall(prompt, **self._fallback_kwargs(generation_config, timeout, system_instruction))
+        await asyncio.sleep(self.log.delay(record))
+        return self._response(record)
+
+
+class LLMRouter:
+    """
+    Picks a backend per request and optionally hedges slow calls.
+
+    Queries up to cheap_max_chars long, or whose priority is already known to be in
+    cheap_priorities, go to the cheap backend; everything else goes to the default.
+    With a hedge backend configured, a call still running after the chosen backend's
+    hedge_percentile latency (over its recent successful calls) is sent to the hedge
+    backend too, and whichever answers first wins.
+    """
+
+    def __init__(self, backends, default, cheap=None, cheap_max_chars=0, cheap_priorities=(),
+                 hedge=None, hedge_percentile=95.0, hedge_min_samples=20, hedge_min_delay=0.05, window=200):
+        self.backends = backends
+        self.default = default
+        self.cheap = cheap
+        self.cheap_max_chars = cheap_max_chars
+        self.cheap_priorities = set(cheap_priorities)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.window = window
+        self._latencies = {name: deque(maxlen=window) for name in backends}
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge") if hedge else None
+
+    def select(self, query=None, priority=None):
+        """Return the name of the backend that should serve a request."""
+        if self.cheap is not None and query is not None:
+            if len(query) <= self.cheap_max_chars or priority in self.cheap_priorities:
+                return self.cheap
+        return self.default
+
+    def _observe(self, name, seconds):
+        with self._lock:
+            self._latencies.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    # Seconds to wait on a backend before hedging, or None while there is too little history.
+    def hedge_delay(self, name):
+        with self._lock:
+            samples = sorted(self._latencies.get(name, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, samples[index])
+
+    # Calls one backend, recording the latency of successful calls for hedging decisions.
+    def _timed_call(self, name, prompt, kwargs):
+        start = time.perf_counter()
+        result = self.backends[name].call(prompt, **kwargs)
+        self._observe(name, time.perf_counter() - start)
+        return result
+
+    async def _timed_acall(self, name, prompt, kwargs):
+        start = time.perf_counter()
+        result = await self.backends[name].acall(prompt, **kwargs)
+        self._observe(name, time.perf_counter() - start)
+        return result
+
+    def generate(self, prompt, query=None, priority=None, **kwargs):
+        """Generate a reply on the selected backend, hedging to the hedge backend if it is slow."""
+        name = self.select(query, priority)
+        delay = self.hedge_delay(name) if self.hedge not in (None, name) else None
+        if delay is None:
+            return self._timed_call(name, prompt, kwargs)
+
+        primary = self._hedge_pool.submit(self._timed_call, name, prompt, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        HEDGES.inc(outcome="fired")
+        hedged = self._hedge_pool.submit(self._timed_call, self.hedge, prompt, kwargs)
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    HEDGES.inc(outcome="hedge_won" if future is hedged else "primary_won")
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def agenerate(self, prompt, query=None, priority=None, stream=False, **kwargs):
+        """Async version of generate(); streamed calls are never hedged."""
+        name = self.select(query, priority)
+        if stream:
+            return await self.backends[name].acall(prompt, stream=True, **kwargs)
+        delay = self.hedge_delay(name) if self.hedge not in (None, name) else None
+        if delay is None:
+            return await self._timed_acall(name, prompt, kwargs)
+
+        primary = asyncio.ensure_future(self._timed_acall(name, prompt, kwargs))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        HEDGES.inc(outcome="fired")
+        hedged = asyncio.ensure_future(self._timed_acall(self.hedge, prompt, kwargs))
+        pending = {primary, hedged}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        HEDGES.inc(outcome="hedge_won" if task is hedged else "primary_won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def warm(self, system_instructions=(None,)):
+        """
+        Build every backend's clients for the given system instructions.
+
+        Returns:
+            dict: {backend name: True if it is ready}
+        """
+        ready = {}
+        for name, backend in self.backends.items():
+            try:
+                backend.warm(system_instructions)
+                ready[name] = True
+            except Exception as e:
+                print(f"Error warming up LLM backend {name}: {e}")
+                record_error("llm_warmup", e)
+                ready[name] = False
+        return ready
+
+    def stats(self):
+        """Return the current hedge delay per backend, in milliseconds (-1 while warming up)."""
+        stats = {}
+        for name in self.backends:
+            delay = self.hedge_delay(name)
+            stats[f"{name}_hedge_delay_ms"] = delay * 1000 if delay is not None else -1
+        return stats
+
+# Builds one backend by name from its environment variables.
+def _backend_from_env(name, guard=None, executor=None):
+    if name == "gemini":
+        return GeminiBackend(
+            model_name=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+            api_key=os.getenv("GEMINI_API_KEY"),
+            context_cache=os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() in ("1", "true", "yes"),
+            context_cache_ttl=float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600")),
+            guard=guard,
+            executor=executor
+        )
+    if name == "llama_cpp":
+        return LlamaCppBackend(
+            model_path=os.getenv("LLAMA_MODEL_PATH"),
+            n_ctx=int(os.getenv("LLAMA_CONTEXT", "2048")),
+            n_threads=int(os.getenv("LLAMA_THREADS", "0")) or None,
+            max_tokens=int(os.getenv("LLAMA_MAX_TOKENS", "512")),
+            executor=executor
+        )
+    if name == "stub":
+        return StubBackend(latency=float(os.getenv("LLM_STUB_LATENCY_MS", "0")) / 1000, executor=executor)
+    if name == "replay":
+        from traffic_replay import replay_log
+        fallback = os.getenv("LLM_REPLAY_FALLBACK", "").lower()
+        return ReplayBackend(
+            replay_log(),
+            fallback=_backend_from_env(fallback, guard=guard if fallback == "gemini" else None, executor=executor) if fallback else None,
+            executor=executor
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+# Builds the router from the LLM_* environment variables; only backends that are used get loaded.
+def router_from_env(gemini_guard=None, executor=None):
+    default = os.getenv("LLM_BACKEND", "gemini").lower()
+    cheap = os.getenv("LLM_CHEAP_BACKEND", "").lower() or None
+    hedge = os.getenv("LLM_HEDGE_BACKEND", "").lower() or None
+    backends = {}
+    for name in dict.fromkeys(n for n in (default, cheap, hedge) if n):
+        # A replay backend passes the guard on to a Gemini fallback, which its misses are sent through.
+        backends[name] = _backend_from_env(name, guard=gemini_guard if name in ("gemini", "replay") else None, executor=executor)
+    return LLMRouter(
+        backends,
+        default=default,
+        cheap=cheap,
+        cheap_max_chars=int(os.getenv("LLM_CHEAP_MAX_CHARS", "0")),
+        cheap_priorities=[p.strip() for p in os.getenv("LLM_CHEAP_PRIORITIES", "").split(",") if p.strip()],
+        hedge=hedge,
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+        hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "50")) / 1000
+    )
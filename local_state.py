@@ -0,0 +1,29 @@
+import os
+import stat
+import tempfile
+
+# File modes and owners are only checked where the OS has them (not on Windows).
+_CHECK_OWNER = hasattr(os, "getuid")
+
+# True when a file or directory belongs to the current user and no one else may open it.
+def is_private(st):
+    if not _CHECK_OWNER:
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+
+# Directory for the state files this deployment's processes share (session cache, response cache, job
+# store, rate limit): HELPDESK_STATE_DIR, or a per-user directory under the temp directory. The files
+# hold Salesforce sessions and customer queries, so the directory is created with mode 0700 and refused
+# when another user owns it or can open it.
+def state_dir():
+    default = os.path.join(tempfile.gettempdir(), f"helpdesk-{os.getuid()}" if _CHECK_OWNER else "helpdesk")
+    path = os.getenv("HELPDESK_STATE_DIR") or default
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or not is_private(st):
+        raise PermissionError(f"{path} must be a directory owned by the current user with mode 0700")
+    return path
+
+# Default location of a shared state file.
+def state_path(name):
+    return os.path.join(state_dir(), name)
@@ -0,0 +1,273 @@
+import sys
+import time
+import threading
+from collections import Counter as _StackCounter
+from contextlib import contextmanager
+
+# Default latency buckets in seconds, from cache-hit speed up to slow LLM calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Escapes a label value for the Prometheus text format.
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+# Renders a {name="value"} label set; extra pairs are appended after the metric's own labels.
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(n, "") for n in self.labelnames), 0)
+
+    def samples(self):
+        """Return every label set with its value, as ({label: value}, count) pairs."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {state[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds metrics and gauge callbacks and renders them in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix, callback):
+        """
+        Expose a component's stats dict as gauges.
+
+        Args:
+            prefix (str): Metric name prefix, e.g. "helpdesk_response_cache"
+            callback (callable): Returns a dict of stat name to number, or None to skip
+        """
+        self._collectors.append((prefix, callback))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for prefix, callback in self._collectors:
+            try:
+                stats = callback() or {}
+            except Exception as e:
+                print(f"Error collecting {prefix} metrics: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "helpdesk_stage_seconds",
+    "Time spent per pipeline stage (prompt_build, generate_content, parse, salesforce_create).",
+    ["stage"]
+)
+HANDLER_SECONDS = REGISTRY.histogram(
+    "helpdesk_handler_seconds",
+    "Total time spent in each API handler.",
+    ["method", "path", "status"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "helpdesk_llm_tokens_total",
+    "Tokens reported by the LLM, by kind (prompt, cached part of the prompt, or completion) and prompt template.",
+    ["kind", "prompt"]
+)
+LLM_CALLS = REGISTRY.counter(
+    "helpdesk_llm_calls_total",
+    "LLM calls that reported usage, by prompt template.",
+    ["prompt"]
+)
+FALLBACKS = REGISTRY.counter(
+    "helpdesk_classification_fallbacks_total",
+    "Classifications that fell back to default values, by reason.",
+    ["reason"]
+)
+SCHEDULER_WAIT_SECONDS = REGISTRY.histogram(
+    "helpdesk_scheduler_wait_seconds",
+    "Time work waited in the priority scheduler before starting, by stage (classify, salesforce) and priority class.",
+    ["stage", "priority_class"]
+)
+ERRORS = REGISTRY.counter(
+    "helpdesk_errors_total",
+    "Errors caught by the pipeline, by stage and exception type.",
+    ["stage", "type"]
+)
+
+# Times a block of work under the given stage label.
+def timed(stage):
+    return STAGE_SECONDS.time(stage=stage)
+
+# Counts an exception caught at a stage.
+def record_error(stage, error):
+    ERRORS.inc(stage=stage, type=type(error).__name__)
+
+# Adds prompt/cached/completion token counts from a Gemini response's usage metadata, when present.
+def record_usage(response, prompt=""):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    LLM_CALLS.inc(prompt=prompt)
+    LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, kind="prompt", prompt=prompt)
+    LLM_TOKENS.inc(getattr(usage, "cached_content_token_count", 0) or 0, kind="cached", prompt=prompt)
+    LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, kind="completion", prompt=prompt)
+
+# Per-call token averages for each prompt template; "cached" tokens were served from the context cache.
+def token_usage_by_prompt():
+    usage = {}
+    for labels, calls in LLM_CALLS.samples():
+        usage[labels["prompt"]] = {"calls": calls}
+    for labels, tokens in LLM_TOKENS.samples():
+        entry = usage.get(labels["prompt"])
+        if entry is not None and entry["calls"]:
+            entry[f"{labels['kind']}_tokens_per_call"] = tokens / entry["calls"]
+    for entry in usage.values():
+        prompt_tokens = entry.get("prompt_tokens_per_call", 0)
+        entry["cached_share"] = entry.get("cached_tokens_per_call", 0) / prompt_tokens if prompt_tokens else 0.0
+    return usage
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler for the API process.
+
+    A background thread snapshots every thread's Python stack at a fixed interval and
+    counts identical stacks; report() returns them in collapsed-stack format
+    ("frame;frame;frame count"), which flame graph tools read directly.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = _StackCounter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def report(self, limit=None):
+        """Return the most frequent stacks in collapsed-stack format."""
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks) + "\n"
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            collected = []
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                collected.append(";".join(reversed(stack)))
+            with self._lock:
+                self.samples += 1
+                self._stacks.update(collected)
@@ -0,0 +1,239 @@
+import os
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from keyword_rules import classify_by_keywords
+from metrics import SCHEDULER_WAIT_SECONDS, record_error
+
+# Load environment variables
+load_dotenv()
+
+# Priority classes, most urgent first.
+PRIORITY_CLASSES = ("escalated", "high", "medium", "low")
+_PRIORITY_CLASS = {"High": "high", "Medium": "medium", "Low": "low"}
+
+# Customer tiers whose tickets are scheduled one class higher (never above "high").
+PREMIUM_TIERS = {t.strip().lower() for t in os.getenv("SCHEDULER_PREMIUM_TIERS", "enterprise,premium").split(",") if t.strip()}
+
+# Maps a ticket priority ("High", "Medium", "Low") to its scheduling class.
+def priority_class(priority, escalated=False, customer_tier=None):
+    """
+    Return the scheduling class of a ticket.
+
+    Args:
+        priority (str): Ticket priority ("High", "Medium" or "Low")
+        escalated (bool): Escalated tickets always get the "escalated" class
+        customer_tier (str): Tiers in SCHEDULER_PREMIUM_TIERS move up one class
+
+    Returns:
+        str: One of PRIORITY_CLASSES
+    """
+    if escalated:
+        return "escalated"
+    cls = _PRIORITY_CLASS.get(priority, "medium")
+    if customer_tier and customer_tier.lower() in PREMIUM_TIERS and cls != "high":
+        cls = PRIORITY_CLASSES[PRIORITY_CLASSES.index(cls) - 1]
+    return cls
+
+# Cheap estimate of a ticket's class before it is classified, used to order pending work.
+def pre_score(query, escalated=False, customer_tier=None, classifier=None):
+    """
+    Estimate the scheduling class of a ticket without calling the LLM.
+
+    Args:
+        query (str): Customer query text
+        escalated (bool): Escalation flag from the request
+        customer_tier (str): Customer tier from the request, if any
+        classifier (FastClassifier): Local model to estimate the priority with; keyword rules otherwise
+
+    Returns:
+        str: One of PRIORITY_CLASSES
+    """
+    if escalated:
+        return "escalated"
+    priority = None
+    if classifier is not None:
+        try:
+            # Any prediction is good enough for ordering, so the confidence threshold does not apply.
+            priority = classifier.predict_many([query])[0]['priority']
+        except Exception as e:
+            print(f"Error in scheduler pre-score: {e}")
+            record_error("scheduler_pre_score", e)
+    if priority is None:
+        _, priority = classify_by_keywords(query)
+    return priority_class(priority, customer_tier=customer_tier)
+
+
+class _Waiter:
+    """A queued request for a slot; finish is its weighted fair queuing tag."""
+
+    __slots__ = ("future", "enqueued", "start", "finish")
+
+    def __init__(self, future, enqueued, start, finish):
+        self.future = future
+        self.enqueued = enqueued
+        self.start = start
+        self.finish = finish
+
+
+class PriorityScheduler:
+    """
+    Weighted fair queue in front of one pipeline stage, for use on a single event loop.
+
+    At most max_concurrency requests hold a slot at once. Waiting requests get slots in
+    weighted fair queuing order: each class is served in proportion to its weight, so
+    urgent classes go first under a backlog without shutting the others out. A class
+    never holds more than its entry in class_limits, which keeps slots free for more
+    urgent work, and a class with requests waiting that has not been served for
+    max_wait seconds goes next regardless of its weight.
+    """
+
+    def __init__(self, stage, max_concurrency=16, weights=None, class_limits=None, max_wait=5.0):
+        self.stage = stage
+        self.max_concurrency = max_concurrency
+        self.weights = dict(weights or {"escalated": 8, "high": 4, "medium": 2, "low": 1})
+        self.class_limits = dict(class_limits or {})
+        self.max_wait = max_wait
+        self._queues = {cls: deque() for cls in self.weights}
+        self._last_finish = {cls: 0.0 for cls in self.weights}
+        self._virtual_time = 0.0
+        self._running = {cls: 0 for cls in self.weights}
+        self._last_served = {cls: 0.0 for cls in self.weights}
+        self._active = 0
+        self.dispatched = {cls: 0 for cls in self.weights}
+        self.promoted = {cls: 0 for cls in self.weights}
+        self._wait_total = {cls: 0.0 for cls in self.weights}
+        self._wait_max = {cls: 0.0 for cls in self.weights}
+
+    @asynccontextmanager
+    async def slot(self, priority_class):
+        """
+        Hold a slot of this stage for the duration of the block.
+
+        Args:
+            priority_class (str): One of the scheduler's classes
+
+        Yields:
+            float: Seconds spent waiting for the slot
+        """
+        waited = await self.acquire(priority_class)
+        try:
+            yield waited
+        finally:
+            self.release(priority_class)
+
+    async def acquire(self, priority_class):
+        """Wait for a slot; returns the seconds waited. Every acquire() needs a matching release()."""
+        if priority_class not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority_class}")
+        enqueued = time.perf_counter()
+        start = max(self._virtual_time, self._last_finish[priority_class])
+        finish = self._last_finish[priority_class] = start + 1.0 / self.weights[priority_class]
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), enqueued, start, finish)
+        self._queues[priority_class].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just before the caller was cancelled: hand the slot on.
+                self.release(priority_class)
+            else:
+                try:
+                    self._queues[priority_class].remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        waited = time.perf_counter() - enqueued
+        self._wait_total[priority_class] += waited
+        self._wait_max[priority_class] = max(self._wait_max[priority_class], waited)
+        SCHEDULER_WAIT_SECONDS.observe(waited, stage=self.stage, priority_class=priority_class)
+        return waited
+
+    def release(self, priority_class):
+        self._active -= 1
+        self._running[priority_class] -= 1
+        self._dispatch()
+
+    # Picks the class whose head request goes next, or None when nothing can start.
+    def _next_class(self, now):
+        eligible = [
+            cls for cls, queue in self._queues.items()
+            if queue and self._running[cls] < self.class_limits.get(cls, self.max_concurrency)
+        ]
+        if not eligible:
+            return None
+        if self.max_wait > 0:
+            # A class is starving when it has had work waiting but no slot for max_wait seconds.
+            starving = [
+                cls for cls in eligible
+                if now - max(self._last_served[cls], self._queues[cls][0].enqueued) >= self.max_wait
+            ]
+            if starving:
+                cls = min(starving, key=lambda c: max(self._last_served[c], self._queues[c][0].enqueued))
+                self.promoted[cls] += 1
+                return cls
+        return min(eligible, key=lambda c: self._queues[c][0].finish)
+
+    # Grants free slots to waiting requests.
+    def _dispatch(self):
+        now = time.perf_counter()
+        while self._active < self.max_concurrency:
+            cls = self._next_class(now)
+            if cls is None:
+                return
+            waiter = self._queues[cls].popleft()
+            if waiter.future.done():
+                # Cancelled while queued.
+                continue
+            self._virtual_time = max(self._virtual_time, waiter.start)
+            self._active += 1
+            self._running[cls] += 1
+            self._last_served[cls] = now
+            self.dispatched[cls] += 1
+            waiter.future.set_result(None)
+
+    def stats(self):
+        """Return queue depth, running requests and wait times per priority class."""
+        stats = {"max_concurrency": self.max_concurrency, "active": self._active, "max_wait_seconds": self.max_wait}
+        for cls in self.weights:
+            dispatched = self.dispatched[cls]
+            stats.update({
+                f"{cls}_queued": len(self._queues[cls]),
+                f"{cls}_running": self._running[cls],
+                f"{cls}_dispatched": dispatched,
+                f"{cls}_starvation_promotions": self.promoted[cls],
+                f"{cls}_wait_mean_ms": self._wait_total[cls] / dispatched * 1000 if dispatched else 0.0,
+                f"{cls}_wait_max_ms": self._wait_max[cls] * 1000
+            })
+        return stats
+
+# Parses "name=value,name=value" into {name: float}.
+def _parse_class_values(text):
+    values = {}
+    for part in text.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            values[name.strip()] = float(value)
+    return values
+
+# Builds the scheduler for one stage from the SCHEDULER_* environment variables, or None when
+# PRIORITY_SCHEDULING is off.
+def scheduler_from_env(stage, default_concurrency):
+    if os.getenv("PRIORITY_SCHEDULING", "false").lower() not in ("1", "true", "yes"):
+        return None
+    max_concurrency = int(os.getenv(f"SCHEDULER_{stage.upper()}_CONCURRENCY", str(default_concurrency)))
+    weights = _parse_class_values(os.getenv("SCHEDULER_WEIGHTS", "escalated=8,high=4,medium=2,low=1"))
+    if set(weights) != set(PRIORITY_CLASSES):
+        raise ValueError(f"SCHEDULER_WEIGHTS must give a weight for each of {', '.join(PRIORITY_CLASSES)}")
+    # Limits are fractions of the stage's slots, so one setting serves stages of any size.
+    fractions = _parse_class_values(os.getenv("SCHEDULER_CLASS_LIMITS", ""))
+    return PriorityScheduler(
+        stage,
+        max_concurrency=max_concurrency,
+        weights=weights,
+        class_limits={cls: max(1, int(fraction * max_concurrency)) for cls, fraction in fractions.items()},
+        max_wait=float(os.getenv("SCHEDULER_MAX_WAIT", "5"))
+    )
@@ -0,0 +1,138 @@
+import hashlib
+import argparse
+from dataclasses import dataclass
+
+CATEGORIES = ["Billing", "Technical Issue", "Product Inquiry", "Feedback", "General Inquiry"]
+PRIORITIES = ["Low", "Medium", "High"]
+
+
+@dataclass(frozen=True, slots=True)
+class Prompt:
+    """A rendered prompt: the per-request text plus the static instructions sent alongside it."""
+    key: str
+    text: str
+    system_instruction: str = None
+
+
+@dataclass(frozen=True, slots=True)
+class PromptTemplate:
+    """
+    Versioned prompt split into a static instruction block and a per-request part.
+
+    The static block is identical for every call, so it can be sent as a system
+    instruction or served from Gemini's context cache; only the rendered user part
+    changes per ticket. Bump version whenever either part changes.
+    """
+    name: str
+    version: int
+    system: str
+    user: str
+
+    @property
+    def key(self):
+        return f"{self.name}.v{self.version}"
+
+    @property
+    def fingerprint(self):
+        """Short hash of the template text, so edits without a version bump still change cache keys."""
+        return hashlib.sha256(f"{self.system}\0{self.user}".encode("utf-8")).hexdigest()[:12]
+
+    def render(self, inline=False, **fields):
+        """
+        Fill in the per-request fields.
+
+        Args:
+            inline (bool): Put the instructions in the prompt text itself instead of a system instruction
+
+        Returns:
+            Prompt: The rendered prompt
+        """
+        text = self.user.format(**fields)
+        if inline:
+            return Prompt(self.key, f"{self.system}\n\n{text}")
+        return Prompt(self.key, text, self.system)
+
+
+# Compact prompt for structured-output mode; the response schema carries the format and allowed labels.
+CLASSIFY_JSON = PromptTemplate(
+    name="classify_json",
+    version=2,
+    system=(
+        "Classify each customer support query and write a helpful reply to the customer. "
+        "Priority reflects urgency; confidence (0-1) is how sure you are of the classification."
+    ),
+    user="Query: {query}"
+)
+
+# Line-prefixed classification prompt, also used for streaming.
+CLASSIFY_TEXT = PromptTemplate(
+    name="classify_text",
+    version=2,
+    system=(
+        "Analyze the customer query and provide:\n"
+        f"1. Category: Choose from [{', '.join(CATEGORIES)}]\n"
+        f"2. Priority: Choose from [{', '.join(PRIORITIES)}] based on urgency\n"
+        "3. Automated Response: A helpful response to the customer\n"
+        "4. Confidence Score: A score from 0.0 to 1.0 indicating how confident you are in the classification\n\n"
+        "Format your response as:\n"
+        "Category: [category]\n"
+        "Priority: [priority]\n"
+        "Response: [response text]\n"
+        "Confidence: [score]"
+    ),
+    user="Query: {query}"
+)
+
+# Reply-only prompt, used once the fast path has classified the query.
+REPLY = PromptTemplate(
+    name="reply",
+    version=2,
+    system="Write a helpful response to the customer query. Reply with the response text only.",
+    user="It has been classified as a {priority} priority {category} ticket.\nQuery: {query}"
+)
+
+# One prompt covering many queries, answered as a JSON array keyed by position.
+CLASSIFY_BATCH = PromptTemplate(
+    name="classify_batch",
+    version=2,
+    system=(
+        "Classify each customer support query and write a helpful reply to each customer.\n"
+        f"category: one of {', '.join(CATEGORIES)}; priority: {', '.join(PRIORITIES)} by urgency; "
+        "confidence: 0-1 for the classification.\n"
+        "Reply with only a JSON array of objects with index, category, priority, response and confidence, "
+        "one per query."
+    ),
+    user="Queries:\n{numbered}"
+)
+
+TEMPLATES = [CLASSIFY_JSON, CLASSIFY_TEXT, REPLY, CLASSIFY_BATCH]
+
+# Identifies the current set of templates; cached classifications are only reused under the same version.
+def templates_version():
+    signature = ",".join(f"{t.key}:{t.fingerprint}" for t in TEMPLATES)
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()[:12]
+
+# Rough token count (about four characters per token for English text), for offline estimates only.
+def estimate_tokens(text):
+    return max(1, round(len(text) / 4))
+
+def main():
+    parser = argparse.ArgumentParser(description="Show prompt template versions and the share of each prompt that is static.")
+    parser.add_argument("--query", default="I was charged twice for my subscription this month, please refund one payment.",
+                        help="Sample customer query used to size the per-request part")
+    args = parser.parse_args()
+
+    print(f"Prompt templates version {templates_version()}")
+    print(f"{'template':<20} {'fingerprint':<13} {'static tok':>10} {'per-query tok':>13} {'static share':>12}")
+    samples = {
+        "classify_batch": {"numbered": f"[1] {args.query}"},
+        "reply": {"query": args.query, "category": "Billing", "priority": "Medium"}
+    }
+    for template in TEMPLATES:
+        static = estimate_tokens(template.system)
+        delta = estimate_tokens(template.render(**samples.get(template.name, {"query": args.query})).text)
+        print(f"{template.key:<20} {template.fingerprint:<13} {static:>10} {delta:>13} {static / (static + delta):>12.0%}")
+    print("Estimates only; GET /prompts/stats reports the token counts Gemini actually billed and cached.")
+
+if __name__ == "__main__":
+    main()
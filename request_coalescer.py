@@ -0,0 +1,135 @@
+import asyncio
+from ai_engine import aclassify_query, aclassify_queries
+from response_cache import normalize_query
+
+
+class RequestCoalescer:
+    """
+    Background dispatcher that merges concurrent classification requests.
+
+    Queries are collected for up to max_wait_ms or max_batch items and sent upstream
+    as one batched classification; each caller's future is resolved with its own result.
+    Identical queries already in flight share the pending upstream call.
+    """
+
+    def __init__(self, max_wait_ms=10, max_batch=16, classify_one=None, classify_many=None):
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self.classify_one = classify_one or aclassify_query
+        self.classify_many = classify_many or aclassify_queries
+        self._queue = None
+        self._task = None
+        self._collecting = []  # batch the dispatcher is still collecting
+        self._dispatches = set()
+        self._inflight = {}  # normalized query -> future
+        self.requests = 0
+        self.deduplicated = 0
+        self.upstream_calls = 0
+
+    async def start(self):
+        """Start the dispatcher on the running event loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop collecting new batches and wait for in-flight dispatches to finish.
+
+        Requests that were queued but not yet dispatched fail with RuntimeError.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Nothing will dispatch these any more, so their callers would wait forever.
+            pending, self._collecting = self._collecting, []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            error = RuntimeError("Request coalescer stopped")
+            for _, key, future in pending:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(error)
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+
+    async def classify(self, query):
+        """
+        Classify a query through the shared dispatcher.
+
+        Args:
+            query (str): Customer query text
+
+        Returns:
+            dict: Same shape as classify_query()
+
+        Raises:
+            RuntimeError: When the coalescer is not running or stops before the query is sent
+        """
+        if self._task is None:
+            raise RuntimeError("Request coalescer is not running")
+        self.requests += 1
+        key = normalize_query(query)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._queue.put_nowait((query, key, future))
+        # shield() so one cancelled caller doesn't cancel the result others are waiting on.
+        return dict(await asyncio.shield(future))
+
+    def stats(self):
+        """Return request, de-duplication and upstream call counters."""
+        return {
+            "requests": self.requests,
+            "deduplicated": self.deduplicated,
+            "upstream_calls": self.upstream_calls,
+            "in_flight": len(self._inflight),
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch": self.max_batch
+        }
+
+    # Collects a batch per window and hands it to a dispatch task so collection never waits on upstream.
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._collecting = []
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    # Sends one upstream classification for the batch and resolves every waiting future.
+    async def _dispatch(self, batch):
+        self.upstream_calls += 1
+        try:
+            if len(batch) == 1:
+                results = [await self.classify_one(batch[0][0])]
+            else:
+                results = await self.classify_many([query for query, _, _ in batch])
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _, key, _ in batch:
+                self._inflight.pop(key, None)
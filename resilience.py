@@ -0,0 +1,338 @@
+import time
+import random
+import sqlite3
+import asyncio
+import threading
+from metrics import REGISTRY
+
+RATE_LIMIT_WAITS = REGISTRY.counter(
+    "helpdesk_rate_limit_waits_total",
+    "Calls that had to wait for a rate-limit token, by limiter.",
+    ["limiter"]
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    "helpdesk_rate_limit_rejections_total",
+    "Calls rejected because no token was available before their deadline, by limiter.",
+    ["limiter"]
+)
+RETRIES = REGISTRY.counter(
+    "helpdesk_retries_total",
+    "Retried upstream calls, by upstream.",
+    ["upstream"]
+)
+RETRY_BUDGET_EXHAUSTED = REGISTRY.counter(
+    "helpdesk_retry_budget_exhausted_total",
+    "Retries skipped because the retry budget was spent, by upstream.",
+    ["upstream"]
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "helpdesk_circuit_rejections_total",
+    "Calls failed fast because the circuit breaker was open, by upstream.",
+    ["upstream"]
+)
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "helpdesk_circuit_transitions_total",
+    "Circuit breaker state changes, by upstream and new state.",
+    ["upstream", "state"]
+)
+
+
+class RateLimitTimeout(Exception):
+    """No rate-limit token became available before the call's deadline."""
+
+
+class CircuitOpenError(Exception):
+    """The upstream is considered unhealthy and calls are being failed fast."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill continuously at rate per second up to capacity; each call takes one.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, capacity=None, name="llm"):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.name = name
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Takes a token if one is available, otherwise returns how long until one will be.
+    def _take(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    # _take() for async callers; it only holds an in-process lock briefly, so it runs inline.
+    async def _atake(self):
+        return self._take()
+
+    def acquire(self, timeout=None):
+        """Block until a token is available; returns False if timeout expires first."""
+        if not self.rate:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            wait = self._take()
+            if wait == 0.0:
+                return True
+            if not waited:
+                RATE_LIMIT_WAITS.inc(limiter=self.name)
+                waited = True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                RATE_LIMIT_REJECTIONS.inc(limiter=self.name)
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout=None):
+        """Async version of acquire() that sleeps without blocking the event loop."""
+        if not self.rate:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        while True:
+            wait = await self._atake()
+            if wait == 0.0:
+                return True
+            if not waited:
+                RATE_LIMIT_WAITS.inc(limiter=self.name)
+                waited = True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                RATE_LIMIT_REJECTIONS.inc(limiter=self.name)
+                return False
+            await asyncio.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose budget lives in a SQLite file, so every worker process on the
+    host draws from one limit instead of each getting the full rate.
+    """
+
+    def __init__(self, path, rate, capacity=None, name="llm"):
+        super().__init__(rate, capacity, name)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("INSERT OR IGNORE INTO token_buckets VALUES (?, ?, ?)", (name, self.capacity, time.time()))
+
+    # One connection per thread; WAL keeps the other workers' reads from blocking on a refill.
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Same refill arithmetic as TokenBucket, on wall-clock time since monotonic clocks are per process.
+    def _take(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, updated = conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute("UPDATE token_buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # BEGIN IMMEDIATE can wait up to the busy timeout on other workers, so keep it off the event loop.
+    async def _atake(self):
+        return await asyncio.to_thread(self._take)
+
+# A per-process bucket, or one shared through the SQLite file at path by all workers on the host.
+def token_bucket(rate, capacity=None, name="llm", path=None):
+    if path and rate:
+        return SharedTokenBucket(path, rate, capacity, name)
+    return TokenBucket(rate, capacity, name)
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls fail fast
+    for reset_timeout seconds; then a single probe call is let through (half-open),
+    which closes the circuit on success or re-opens it on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, name="llm"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            CIRCUIT_TRANSITIONS.inc(upstream=self.name, state=state)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state("half_open")
+            if self.state == "closed":
+                return
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+        CIRCUIT_REJECTIONS.inc(upstream=self.name)
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._set_state("closed")
+
+    # Frees a half-open probe slot when the probe ended without telling us anything about health.
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def stats(self):
+        return {
+            "open": self.state == "open",
+            "half_open": self.state == "half_open",
+            "consecutive_failures": self.failures
+        }
+
+
+class ResilientCaller:
+    """
+    Wraps upstream calls with a rate limiter, a circuit breaker and jittered
+    exponential retries that all fit inside a per-call deadline.
+
+    Retries also draw from a shared budget that grows by retry_ratio per call, so
+    under a sustained outage retries stay a small fraction of traffic instead of
+    multiplying it.
+
+    The wrapped function receives the remaining time budget in seconds, so it can pass
+    it on as its own request timeout.
+    """
+
+    def __init__(self, limiter, breaker, retryable, max_retries=3, base_delay=0.5,
+                 max_delay=8.0, deadline=20.0, retry_ratio=0.1, min_retry_budget=10, name="llm"):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.retryable = retryable
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_ratio = retry_ratio
+        self.max_retry_budget = min_retry_budget
+        self._retry_budget = float(min_retry_budget)
+        self._budget_lock = threading.Lock()
+        self.name = name
+
+    # Credits the retry budget for a new call.
+    def _deposit(self):
+        with self._budget_lock:
+            self._retry_budget = min(self.max_retry_budget, self._retry_budget + self.retry_ratio)
+
+    # Spends one retry from the budget, returning False when it is empty.
+    def _withdraw(self):
+        with self._budget_lock:
+            if self._retry_budget < 1:
+                RETRY_BUDGET_EXHAUSTED.inc(upstream=self.name)
+                return False
+            self._retry_budget -= 1
+            return True
+
+    # Full-jitter backoff for the given retry attempt.
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func):
+        """Run func(remaining_seconds) under the limiter, breaker and retry policy."""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        self._deposit()
+        while True:
+            self.breaker.before_call()
+            try:
+                if not self.limiter.acquire(timeout=deadline - time.monotonic()):
+                    raise RateLimitTimeout(f"No {self.name} rate-limit token before deadline")
+                result = func(max(0.1, deadline - time.monotonic()))
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                if isinstance(e, RateLimitTimeout) or not self.retryable(e):
+                    self.breaker.release_probe()
+                    raise
+                self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline or not self._withdraw():
+                    raise
+                attempt += 1
+                RETRIES.inc(upstream=self.name)
+                time.sleep(delay)
+
+    async def acall(self, func):
+        """Async version of call(); func(remaining_seconds) must return an awaitable."""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        self._deposit()
+        while True:
+            self.breaker.before_call()
+            try:
+                if not await self.limiter.acquire_async(timeout=deadline - time.monotonic()):
+                    raise RateLimitTimeout(f"No {self.name} rate-limit token before deadline")
+                result = await func(max(0.1, deadline - time.monotonic()))
+                self.breaker.record_success()
+                return result
+            except asyncio.CancelledError:
+                # e.g. the losing side of a hedged request; says nothing about upstream health.
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if isinstance(e, RateLimitTimeout) or not self.retryable(e):
+                    self.breaker.release_probe()
+                    raise
+                self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline or not self._withdraw():
+                    raise
+                attempt += 1
+                RETRIES.inc(upstream=self.name)
+                await asyncio.sleep(delay)
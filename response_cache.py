@@ -0,0 +1,285 @@
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import asyncio
+import threading
+from itertools import islice
+from collections import OrderedDict, Counter
+from dotenv import load_dotenv
+from local_state import state_path
+
+# Load environment variables
+load_dotenv()
+
+# Lowercases the query, drops punctuation and collapses whitespace so trivially different tickets share a key.
+def normalize_query(query):
+    text = query.lower().replace("'", "")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return " ".join(text.split())
+
+# Character trigram counts of the normalized text, used as a sparse vector for near-duplicate lookup.
+def _vectorize(normalized):
+    padded = f" {normalized} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+# Cosine similarity between two sparse trigram vectors.
+def _cosine(a, b):
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    norm_a = math.sqrt(sum(c * c for c in a.values()))
+    norm_b = math.sqrt(sum(c * c for c in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry."""
+
+    # Calls only take an in-process lock, so async callers may use it on the event loop.
+    blocking = False
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, value, vector)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, vector=None):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    # Yields (key, vector) for up to limit live entries, most recently used first.
+    def recent(self, limit):
+        now = time.time()
+        with self._lock:
+            snapshot = list(islice(reversed(self._entries.items()), limit))
+        for key, (expires_at, _, vector) in snapshot:
+            if expires_at >= now:
+                yield key, vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskBackend:
+    """SQLite-backed store so every uvicorn worker on the host shares one cache."""
+
+    # Reads and writes can wait on another process's write lock, so async callers run them off the event loop.
+    blocking = True
+
+    def __init__(self, path, max_size=10000):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON response_cache (accessed_at)")
+        conn.commit()
+
+    # One connection per thread; WAL lets readers and a writer in other processes proceed together.
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl, vector=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl, now)
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_size
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM response_cache WHERE key IN "
+                "(SELECT key FROM response_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def delete(self, key):
+        return self._conn().execute("DELETE FROM response_cache WHERE key = ?", (key,)).rowcount > 0
+
+    # Yields (key, vector) for up to limit live entries, most recently used first; vectors are
+    # rebuilt from the stored key, and values are not read at all.
+    def recent(self, limit):
+        rows = self._conn().execute(
+            "SELECT key FROM response_cache WHERE expires_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+            (time.time(), limit)
+        ).fetchall()
+        for (key,) in rows:
+            # Keys are "[namespace:]normalized query"; normalized text never contains ":".
+            yield key, _vectorize(key.rpartition(":")[2])
+
+    def clear(self):
+        self._conn().execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache of classify_query() results keyed on normalized query text.
+
+    Lookups try the exact normalized key first. When similarity_threshold is set,
+    a miss falls back to the most similar cached query (trigram cosine) above it,
+    among the similarity_scan most recently used entries: that comparison is a
+    linear scan, so each such miss costs time proportional to similarity_scan.
+    Keys are prefixed with namespace, so entries written under another namespace
+    (e.g. an older prompt version) are never returned.
+    """
+
+    def __init__(self, backend, ttl=3600, similarity_threshold=None, namespace="", similarity_scan=500):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.similarity_scan = similarity_scan
+        self.prefix = f"{namespace}:" if namespace else ""
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        """
+        Look up a cached result for the query.
+
+        Args:
+            query (str): Customer query text
+
+        Returns:
+            dict or None: A copy of the cached result, or None on a miss
+        """
+        normalized = normalize_query(query)
+        value = self.backend.get(self.prefix + normalized)
+        if value is not None:
+            self.hits += 1
+            return dict(value)
+
+        if self.similarity_threshold is not None:
+            vector = _vectorize(normalized)
+            best_score, best_key = 0.0, None
+            for key, candidate_vector in self.backend.recent(self.similarity_scan):
+                if not key.startswith(self.prefix):
+                    continue
+                score = _cosine(vector, candidate_vector)
+                if score > best_score:
+                    best_score, best_key = score, key
+            if best_key is not None and best_score >= self.similarity_threshold:
+                # Only the best match's value is read; it may have expired since the scan.
+                value = self.backend.get(best_key)
+                if value is not None:
+                    self.near_hits += 1
+                    return dict(value)
+
+        self.misses += 1
+        return None
+
+    def set(self, query, result):
+        """Store a classification result for the query."""
+        normalized = normalize_query(query)
+        vector = _vectorize(normalized) if self.similarity_threshold is not None else None
+        self.backend.set(self.prefix + normalized, dict(result), self.ttl, vector)
+
+    async def aget(self, query):
+        """Async version of get(); blocking backends are queried on a worker thread."""
+        if self.backend.blocking:
+            return await asyncio.to_thread(self.get, query)
+        return self.get(query)
+
+    async def aset(self, query, result):
+        """Async version of set()."""
+        if self.backend.blocking:
+            await asyncio.to_thread(self.set, query, result)
+        else:
+            self.set(query, result)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0
+        }
+
+# Builds the cache described by the RESPONSE_CACHE_* environment variables, or None when disabled.
+def cache_from_env(namespace=""):
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "none").lower()
+    if backend_name in ("", "none", "off"):
+        return None
+
+    max_size = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    if backend_name == "disk":
+        path = os.getenv("RESPONSE_CACHE_PATH") or state_path("response_cache.sqlite3")
+        backend = DiskBackend(path, max_size=max_size)
+    else:
+        backend = MemoryBackend(max_size=max_size)
+
+    similarity = os.getenv("RESPONSE_CACHE_SIMILARITY")
+    return ResponseCache(
+        backend,
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        similarity_threshold=float(similarity) if similarity else None,
+        namespace=namespace,
+        similarity_scan=int(os.getenv("RESPONSE_CACHE_SIMILARITY_SCAN", "500"))
+    )
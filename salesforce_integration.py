@@ -1,36 +1,355 @@
 import os
-from simple_salesforce.api import Salesforce
+import re
+import json
+import time
+import asyncio
+import functools
+import threading
+from urllib.parse import urlparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from typing import Any
+from metrics import timed, record_error
+from response_cache import MemoryBackend, DiskBackend
+from traffic_replay import recorded_case_creation
+from local_state import is_private
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers starting together may each log in once
+    fcntl = None
 
 # Load environment variables
 load_dotenv()
 
-class SalesforceIntegration:
-    # Initializes the Salesforce connection when an object is created.
-    def __init__(self):
-        self.sf: Any = None  # type: ignore
-        self.connect()
+# sObject Collections accept at most 200 records per request.
+COMPOSITE_BATCH_SIZE = 200
+
+# IDs per SOQL "Id IN (...)" lookup, which keeps the query URL well under Salesforce's length limit.
+QUERY_BATCH_SIZE = 200
+
+# Fields get_cases() returns when the caller does not pick any.
+CASE_FIELDS = [
+    "Id", "CaseNumber", "Subject", "Status", "Priority", "Origin",
+    "AI_Predicted_Category__c", "AI_Predicted_Priority__c", "Escalated__c",
+    "CreatedDate", "LastModifiedDate"
+]
+
+# Record IDs are 15 (case-sensitive) or 18 characters; anything else never reaches a SOQL string.
+_RECORD_ID = re.compile(r"^[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$")
+_FIELD_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+
+class PartialCreateError(Exception):
+    """
+    Creating many cases failed part way; results covers the records sent before the failing request.
+
+    The next `uncertain` records, those of the failing request, may have been created anyway and must
+    not be sent again; the records after them were never sent.
+    """
+
+    def __init__(self, results, cause, uncertain=0):
+        super().__init__(str(cause))
+        self.results = results
+        self.uncertain = uncertain
+
+class SalesforceSessionManager:
+    """
+    Lazily created, shared and self-refreshing Salesforce session.
+
+    The first call logs in; the session ID and instance URL are cached in a file so
+    other workers on the host reuse them instead of logging in again. All clients share
+    one pooled keep-alive HTTP session. Calls that fail with INVALID_SESSION_ID are
+    retried once on a fresh login, and failed logins are retried after a backoff.
+    """
+
+    def __init__(self, cache_path=None, pool_size=10, login_retry_interval=30.0):
+        self.cache_path = cache_path
+        self.login_retry_interval = login_retry_interval
+        self.pool_size = pool_size
+        self._http = None
+        self._client: Any = None
+        self._lock = threading.Lock()
+        self._next_login_attempt = 0.0
+        self.logins = 0
+        self.login_failures = 0
+        self.session_cache_hits = 0
+        self.refreshes = 0
+        self.calls = 0
+
+    # Pooled keep-alive HTTP session; requests and simple_salesforce are only imported once a
+    # client is built, so importing this module stays cheap.
+    @property
+    def http(self):
+        if self._http is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            http.mount("https://", adapter)
+            http.mount("http://", adapter)
+            self._http = http
+        return self._http
+
+    def get_client(self):
+        """
+        Return a connected Salesforce client, logging in on first use.
+
+        Returns:
+            Salesforce or None: None while Salesforce is unreachable or credentials are rejected
+        """
+        client = self._client
+        if client is not None:
+            return client
+
+        with self._lock, self._host_lock():
+            if self._client is None:
+                self._client = self._load_cached_session() or self._login()
+            return self._client
+
+    # Exclusive lock on "<cache file>.lock", so workers starting together log in once and the
+    # others pick that session up from the cache file.
+    @contextmanager
+    def _host_lock(self):
+        if not self.cache_path or fcntl is None:
+            yield
+            return
+        with open(f"{self.cache_path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def set_client(self, client):
+        """Install an already connected client, e.g. one pointed at a test server."""
+        with self._lock:
+            self._client = client
+
+    def call(self, func):
+        """
+        Run func(client), logging in again once if the session has expired.
+
+        Raises:
+            ConnectionError: When no session can be established
+        """
+        from simple_salesforce.exceptions import SalesforceExpiredSession
+
+        client = self.get_client()
+        if client is None:
+            raise ConnectionError("Not connected to Salesforce")
+        self.calls += 1
+        try:
+            return func(client)
+        except SalesforceExpiredSession:
+            self.refreshes += 1
+            self.invalidate(client)
+            client = self.get_client()
+            if client is None:
+                raise ConnectionError("Salesforce session expired and re-login failed")
+            return func(client)
+
+    def invalidate(self, stale_client=None):
+        """Drop the current session (only if it is still stale_client) and its cached copy."""
+        with self._lock:
+            if stale_client is not None and self._client is not stale_client:
+                return
+            if self._client is not None:
+                self._forget_cached_session(self._client.session_id)
+            self._client = None
+            self._next_login_attempt = 0.0
+
+    def metrics(self):
+        """Return login, reuse and refresh counters."""
+        return {
+            "connected": self._client is not None,
+            "logins": self.logins,
+            "login_failures": self.login_failures,
+            "session_cache_hits": self.session_cache_hits,
+            "refreshes": self.refreshes,
+            "calls": self.calls
+        }
 
     # Taking credentials from .env file to connect to Salesforce
-    def connect(self):
-        """Connect to Salesforce using credentials from environment variables."""
+    def _login(self):
+        if time.time() < self._next_login_attempt:
+            return None
+        from simple_salesforce.api import Salesforce
         try:
-            self.sf = Salesforce(
+            client = Salesforce(
                 username=os.getenv('SALESFORCE_USERNAME'),
                 password=os.getenv('SALESFORCE_PASSWORD'),
                 security_token=os.getenv('SALESFORCE_SECURITY_TOKEN'),
-                domain=os.getenv('SALESFORCE_DOMAIN', 'login')
+                domain=os.getenv('SALESFORCE_DOMAIN', 'login'),
+                session=self.http
             )
+            self.logins += 1
+            self._save_cached_session(client)
             print("Successfully connected to Salesforce")
+            return client
         except Exception as e:
+            self.login_failures += 1
+            self._next_login_attempt = time.time() + self.login_retry_interval
             print(f"Failed to connect to Salesforce: {e}")
-            self.sf = None
+            return None
+
+    # Builds a client from a session another worker already established. The file is only trusted when
+    # this user owns it, no one else can read it and it points at a Salesforce host.
+    def _load_cached_session(self):
+        if not self.cache_path:
+            return None
+        from simple_salesforce.api import Salesforce
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                if not is_private(os.fstat(f.fileno())):
+                    print(f"Ignoring Salesforce session cache {self.cache_path}: not private to this user")
+                    return None
+                cached = json.load(f)
+            if not _is_salesforce_url(cached["instance_url"]):
+                print(f"Ignoring Salesforce session cache {self.cache_path}: unexpected instance URL")
+                return None
+            client = Salesforce(
+                session_id=cached["session_id"],
+                instance_url=cached["instance_url"],
+                session=self.http
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self.session_cache_hits += 1
+        return client
+
+    def _save_cached_session(self, client):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({
+                    "session_id": client.session_id,
+                    "instance_url": f"https://{client.sf_instance}",
+                    "created_at": time.time()
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not cache Salesforce session: {e}")
+
+    def _forget_cached_session(self, session_id):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                if json.load(f).get("session_id") != session_id:
+                    return  # Another worker has already refreshed it
+            os.remove(self.cache_path)
+        except (OSError, ValueError):
+            pass
+
+# True for https URLs on Salesforce's own domains, the only hosts a cached session may send cases to.
+def _is_salesforce_url(url):
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    return parsed.scheme == "https" and host.endswith((".salesforce.com", ".force.com"))
+
+# Builds the session manager described by the SALESFORCE_SESSION_* environment variables; the session
+# cache is off unless SALESFORCE_SESSION_CACHE names a file.
+def session_manager_from_env():
+    cache_path = os.getenv("SALESFORCE_SESSION_CACHE", "")
+    return SalesforceSessionManager(
+        cache_path=None if cache_path.lower() in ("", "none", "off") else cache_path,
+        pool_size=int(os.getenv("SALESFORCE_WORKERS", "8")),
+        login_retry_interval=float(os.getenv("SALESFORCE_LOGIN_RETRY_INTERVAL", "30"))
+    )
+
+class SalesforceIntegration:
+    # Sets up the session manager; the actual login happens on first use.
+    def __init__(self):
+        self.session_manager = session_manager_from_env()
+        # simple_salesforce is blocking, so async callers go through this bounded pool.
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SALESFORCE_WORKERS", "8")),
+            thread_name_prefix="salesforce"
+        )
+        # Read-through cache of Case records keyed on the 15-character ID; 0 seconds turns it off.
+        # With SALESFORCE_CASE_CACHE_PATH it is a SQLite file shared (and invalidated) by all workers.
+        self.case_cache_ttl = float(os.getenv("SALESFORCE_CASE_CACHE_TTL", "30"))
+        case_cache_size = int(os.getenv("SALESFORCE_CASE_CACHE_SIZE", "10000"))
+        case_cache_path = os.getenv("SALESFORCE_CASE_CACHE_PATH")
+        if self.case_cache_ttl <= 0:
+            self.case_cache = None
+        elif case_cache_path:
+            self.case_cache = DiskBackend(case_cache_path, max_size=case_cache_size)
+        else:
+            self.case_cache = MemoryBackend(case_cache_size)
+        self._case_stats_lock = threading.Lock()
+        self.case_cache_hits = 0
+        self.case_cache_misses = 0
+        self.case_invalidations = 0
+        self.case_queries = 0
+
+    # Connected client, or None while Salesforce is unreachable.
+    @property
+    def sf(self) -> Any:
+        return self.session_manager.get_client()
+
+    @sf.setter
+    def sf(self, client):
+        self.session_manager.set_client(client)
+
+    def connect(self):
+        """Connect to Salesforce now instead of on first use."""
+        return self.session_manager.get_client() is not None
+
+    # Builds the Case record for a classified query; shared by single and bulk creation.
+    def build_case_data(self, customer_name, query, category, priority, ai_response, escalated=False):
+        """
+        Build the Salesforce Case fields for a classified query.
+
+        Args:
+            customer_name (str): Name of the customer
+            query (str): Original customer query
+            category (str): Predicted category
+            priority (str): Predicted priority
+            ai_response (str): AI-generated response
+            escalated (bool): Whether the case should be escalated
+
+        Returns:
+            dict: Case field values keyed by API name
+        """
+        # Determine status based on escalation
+        status = "Open" if escalated else "Closed"
+
+        # Map priority to Salesforce format
+        sf_priority = {
+            "Low": "Low",
+            "Medium": "Medium",
+            "High": "High"
+        }.get(priority, "Medium")
+
+        return {
+            "Subject": f"AI Helpdesk: {category} - {customer_name}",
+            "Description": f"Customer Query: {query}\n\nAI Response: {ai_response}",
+            "Status": status,
+            "Priority": sf_priority,
+            "Origin": "AI Helpdesk",
+            "Type": category,
+            "SuppliedName": customer_name,
+            "SuppliedEmail": "",  # Can be added later if available
+            "SuppliedPhone": "",  # Can be added later if available
+            # Custom fields for AI predictions
+            "AI_Predicted_Category__c": category,
+            "AI_Predicted_Priority__c": priority,
+            "AI_Response__c": ai_response,
+            "Escalated__c": escalated
+        }
 
     # Creating the Case
+    @recorded_case_creation
     def create_case(self, customer_name, query, category, priority, ai_response, escalated=False):
         """
-        Create a new Case record in Salesforce.
+        Create a new Case record in Salesforce (recorded, or served from the traffic log, per TRAFFIC_MODE).
 
         Args:
             customer_name (str): Name of the customer
@@ -48,42 +367,112 @@ class SalesforceIntegration:
 
         # If escalated, marks the Case as open
         try:
-            # Determine status based on escalation
-            status = "Open" if escalated else "Closed"
-
-            # Map priority to Salesforce format
-            sf_priority = {
-                "Low": "Low",
-                "Medium": "Medium",
-                "High": "High"
-            }.get(priority, "Medium")
-
-            # Create a dictionary case_data with all required fields.
-            case_data = {
-                "Subject": f"AI Helpdesk: {category} - {customer_name}",
-                "Description": f"Customer Query: {query}\n\nAI Response: {ai_response}",
-                "Status": status,
-                "Priority": sf_priority,
-                "Origin": "AI Helpdesk",
-                "Type": category,
-                "SuppliedName": customer_name,
-                "SuppliedEmail": "",  # Can be added later if available
-                "SuppliedPhone": "",  # Can be added later if available
-                # Custom fields for AI predictions
-                "AI_Predicted_Category__c": category,
-                "AI_Predicted_Priority__c": priority,
-                "AI_Response__c": ai_response,
-                "Escalated__c": escalated
-            }
+            case_data = self.build_case_data(customer_name, query, category, priority, ai_response, escalated)
 
             # create the case
-            result = self.sf.Case.create(case_data)  # type: ignore
-            return {"success": True, "case_id": result['id'], "status": status}
+            with timed("salesforce_create"):
+                result = self.session_manager.call(lambda sf: sf.Case.create(case_data))
+            return {"success": True, "case_id": result['id'], "status": case_data["Status"]}
 
         except Exception as e:
             print(f"Error creating case: {e}")
+            record_error("salesforce_create", e)
             return {"success": False, "error": str(e)}
 
+    # Creates up to 200 Cases per request through the sObject Collections (Composite) API.
+    def create_cases(self, case_data_list):
+        """
+        Create many Case records with one API call per 200 records.
+
+        Args:
+            case_data_list (list[dict]): Case field values, as returned by build_case_data()
+
+        Returns:
+            list[dict]: One {"success", "case_id", "status"} or {"success", "error"} per record, in input order
+
+        Raises:
+            PartialCreateError: When a request fails as a whole; its results cover the records of the
+                requests before it, so callers retry only the rest
+        """
+        if not self.sf:
+            raise ConnectionError("Not connected to Salesforce")
+
+        results = []
+        for start in range(0, len(case_data_list), COMPOSITE_BATCH_SIZE):
+            chunk = case_data_list[start:start + COMPOSITE_BATCH_SIZE]
+            payload = {
+                "allOrNone": False,
+                "records": [{"attributes": {"type": "Case"}, **data} for data in chunk]
+            }
+            try:
+                with timed("salesforce_create_batch"):
+                    response = self.session_manager.call(
+                        lambda sf: sf.restful("composite/sobjects", method="POST", json=payload)
+                    )
+            except Exception as e:
+                raise PartialCreateError(results, e) from e
+            for data, item in zip(chunk, response or []):
+                if item.get("success"):
+                    results.append({"success": True, "case_id": item["id"], "status": data["Status"]})
+                else:
+                    errors = "; ".join(e.get("message", "") for e in item.get("errors", []))
+                    results.append({"success": False, "error": errors or "Unknown error"})
+        return results
+
+    # Creates Cases through the Bulk API, which is cheaper on API limits for large backfills.
+    def bulk_create_cases(self, case_data_list, batch_size=10000):
+        """
+        Create many Case records through the Bulk API, one job per batch_size records.
+
+        Args:
+            case_data_list (list[dict]): Case field values, as returned by build_case_data()
+            batch_size (int): Records per Bulk API job
+
+        Returns:
+            list[dict]: One {"success", "case_id", "status"} or {"success", "error"} per record, in input order
+
+        Raises:
+            PartialCreateError: When a job fails as a whole; its results cover the records of the
+                jobs before it. Records of the failed job may have been created anyway, so they are
+                counted as uncertain rather than left to be resent.
+        """
+        if not self.sf:
+            raise ConnectionError("Not connected to Salesforce")
+
+        results = []
+        for start in range(0, len(case_data_list), batch_size):
+            chunk = case_data_list[start:start + batch_size]
+            try:
+                with timed("salesforce_create_bulk"):
+                    response = self.session_manager.call(
+                        lambda sf: sf.bulk.Case.insert(chunk, batch_size=batch_size)
+                    )
+            except Exception as e:
+                raise PartialCreateError(results, e, uncertain=len(chunk)) from e
+            for data, item in zip(chunk, response):
+                if item.get("success"):
+                    results.append({"success": True, "case_id": item["id"], "status": data["Status"]})
+                else:
+                    results.append({"success": False, "error": str(item.get("errors") or "Unknown error")})
+        return results
+
+    # Runs a blocking integration method on the Salesforce pool without stalling the event loop.
+    async def _run_async(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def acreate_case(self, customer_name, query, category, priority, ai_response, escalated=False):
+        """Async counterpart of create_case() for use from request handlers."""
+        return await self._run_async(
+            self.create_case,
+            customer_name=customer_name,
+            query=query,
+            category=category,
+            priority=priority,
+            ai_response=ai_response,
+            escalated=escalated
+        )
+
     # Updates the Status field of a case using its case_id.
     def update_case_status(self, case_id, status):
         """Update the status of an existing case."""
@@ -91,21 +480,120 @@ class SalesforceIntegration:
             return {"success": False, "error": "Not connected to Salesforce"}
 
         try:
-            self.sf.Case.update(case_id, {"Status": status})  # type: ignore
+            self.session_manager.call(lambda sf: sf.Case.update(case_id, {"Status": status}))
             return {"success": True}
         except Exception as e:
             return {"success": False, "error": str(e)}
+        finally:
+            # Dropped even when the update failed, since it may have been applied anyway.
+            self.invalidate_cases([case_id])
 
-    def get_case_details(self, case_id):
-        """Retrieve case details."""
-        if not self.sf:
-            return {"success": False, "error": "Not connected to Salesforce"}
-
+    def get_case_details(self, case_id, fields=None):
+        """Retrieve case details (CASE_FIELDS unless fields are given) through the case cache."""
         try:
-            case = self.sf.Case.get(case_id)  # type: ignore
-            return {"success": True, "case": case}
-        except Exception as e:
+            result = self.get_cases([case_id], fields)
+        except ValueError as e:
             return {"success": False, "error": str(e)}
+        if not result['success']:
+            return result
+        if case_id not in result['cases']:
+            return {"success": False, "error": f"Case {case_id} not found"}
+        return {"success": True, "case": result['cases'][case_id]}
+
+    def get_cases(self, case_ids, fields=None):
+        """
+        Retrieve many cases with as few API calls as possible.
+
+        Cases in the read-through cache are served from memory; the rest are fetched
+        with one SOQL query per QUERY_BATCH_SIZE IDs. Fetched records keep CASE_FIELDS
+        as well as the requested fields, so later default lookups hit the cache.
+
+        Args:
+            case_ids (list): 15- or 18-character Case IDs
+            fields (list): Case fields to return (defaults to CASE_FIELDS)
+
+        Returns:
+            dict: {"success", "cases": {case_id: record}, "missing": [IDs that matched no case]}
+
+        Raises:
+            ValueError: If an ID or field name is malformed
+        """
+        fields = list(dict.fromkeys(["Id", *(fields or CASE_FIELDS)]))
+        case_ids = list(dict.fromkeys(case_ids))
+        invalid = [f for f in fields if not _FIELD_NAME.match(f)] + [i for i in case_ids if not _RECORD_ID.match(i)]
+        if invalid:
+            raise ValueError(f"Invalid case ID or field name: {', '.join(invalid)}")
+
+        cases = {}
+        to_fetch = []
+        for case_id in case_ids:
+            record = self.case_cache.get(case_id[:15]) if self.case_cache is not None else None
+            if record is not None and all(f in record for f in fields):
+                cases[case_id] = {f: record[f] for f in fields}
+            else:
+                to_fetch.append(case_id)
+        with self._case_stats_lock:
+            self.case_cache_hits += len(cases)
+            self.case_cache_misses += len(to_fetch)
+
+        if to_fetch:
+            if not self.sf:
+                return {"success": False, "error": "Not connected to Salesforce"}
+            select = list(dict.fromkeys([*fields, *CASE_FIELDS])) if self.case_cache is not None else fields
+            try:
+                with timed("salesforce_get_cases"):
+                    for start in range(0, len(to_fetch), QUERY_BATCH_SIZE):
+                        chunk = to_fetch[start:start + QUERY_BATCH_SIZE]
+                        id_list = ", ".join(f"'{i}'" for i in chunk)
+                        soql = f"SELECT {', '.join(select)} FROM Case WHERE Id IN ({id_list})"
+                        result = self.session_manager.call(lambda sf, soql=soql: sf.query_all(soql))
+                        with self._case_stats_lock:
+                            self.case_queries += 1
+                        # Salesforce answers with 18-character IDs whichever form was asked for.
+                        records = {r['Id'][:15]: r for r in result['records']}
+                        for case_id in chunk:
+                            record = records.get(case_id[:15])
+                            if record is None:
+                                continue
+                            record = {f: record.get(f) for f in select}
+                            if self.case_cache is not None:
+                                self.case_cache.set(case_id[:15], record, self.case_cache_ttl)
+                            cases[case_id] = {f: record[f] for f in fields}
+            except Exception as e:
+                print(f"Error querying cases: {e}")
+                record_error("salesforce_get_cases", e)
+                return {"success": False, "error": str(e)}
+
+        return {
+            "success": True,
+            "cases": {i: cases[i] for i in case_ids if i in cases},
+            "missing": [i for i in case_ids if i not in cases]
+        }
+
+    async def aget_cases(self, case_ids, fields=None):
+        """Async counterpart of get_cases() for use from request handlers."""
+        return await self._run_async(self.get_cases, case_ids, fields)
+
+    # Drops cases from the read-through cache after they changed (our own updates or Change Data Capture events).
+    def invalidate_cases(self, case_ids):
+        if self.case_cache is None:
+            return 0
+        dropped = sum(1 for case_id in case_ids if self.case_cache.delete(str(case_id)[:15]))
+        with self._case_stats_lock:
+            self.case_invalidations += dropped
+        return dropped
+
+    def case_cache_stats(self):
+        """Return hit, miss, query and invalidation counters of the case cache."""
+        with self._case_stats_lock:
+            return {
+                "enabled": self.case_cache is not None,
+                "size": len(self.case_cache) if self.case_cache is not None else 0,
+                "hits": self.case_cache_hits,
+                "misses": self.case_cache_misses,
+                "soql_queries": self.case_queries,
+                "invalidations": self.case_invalidations
+            }
 
     # Creates a task linked to a case (WhatId). Optionally assigns it to a user (OwnerId).
     def create_task(self, case_id, subject, description, assigned_to=None):
@@ -124,7 +612,7 @@ class SalesforceIntegration:
             if assigned_to:
                 task_data["OwnerId"] = assigned_to
 
-            result = self.sf.Task.create(task_data)  # type: ignore
+            result = self.session_manager.call(lambda sf: sf.Task.create(task_data))
             return {"success": True, "task_id": result['id']}
         except Exception as e:
             return {"success": False, "error": str(e)}
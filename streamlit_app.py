@@ -1,6 +1,12 @@
 import streamlit as st
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import os
+import re
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,6 +17,15 @@ API_HOST = os.getenv("API_HOST", "localhost")
 API_PORT = os.getenv("API_PORT", "8000")
 API_URL = f"http://{API_HOST}:{API_PORT}"
 
+# Upper bound of the bulk mode's concurrency slider (and of the pooled connections).
+BULK_MAX_CONCURRENCY = int(os.getenv("STREAMLIT_BULK_CONCURRENCY", "32"))
+
+# Columns the bulk mode fills in for every uploaded ticket.
+BULK_RESULT_COLUMNS = [
+    "category", "priority", "confidence", "response", "salesforce_case_id", "error",
+    "queue_ms", "classify_ms", "salesforce_ms", "round_trip_ms"
+]
+
 st.set_page_config(
     page_title="AI-Powered Helpdesk Automation",
     page_icon="🤖",
@@ -20,87 +35,314 @@ st.set_page_config(
 st.title("🤖 AI-Powered Helpdesk Automation")
 st.markdown("Test the AI model for customer query classification and automated responses.")
 
-# Input section
-st.header("Customer Query Input")
+# One pooled keep-alive HTTP session for the whole server process, reused by every rerun and browser tab.
+@st.cache_resource
+def get_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BULK_MAX_CONCURRENCY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+session = get_session()
+
+# Submits a case creation job and polls until it finishes; returns (status_code, body) like a /create_case call.
+def run_job(payload, timeout=60):
+    response = session.post(f"{API_URL}/jobs", json=payload, timeout=10)
+    if response.status_code != 202:
+        return response.status_code, response.text
+    job_id = response.json()['job_id']
+    deadline = time.monotonic() + timeout
+    # Polls at least once, so a job that finished quickly is reported even with a short timeout.
+    while True:
+        job = session.get(f"{API_URL}/jobs/{job_id}", timeout=10).json()
+        if job['status'] == "done":
+            return 200, job['result']
+        if job['status'] == "failed":
+            return 500, job['error']
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(0.5)
+    return 504, f"Job {job_id} is still {job['status']}; check GET /jobs/{job_id} later."
+
+# Reads server-sent events from a streaming response as (event, data) pairs.
+def iter_sse(response):
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:") and event:
+            yield event, json.loads(line[len("data:"):].strip())
+            event = None
+
+# Parses a Server-Timing header into {stage: milliseconds}.
+def parse_server_timing(header):
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        match = re.search(r"dur=([0-9.]+)", params)
+        if name and match:
+            stages[name] = float(match.group(1))
+    return stages
+
+# Sends one group of tickets (one ticket to /create_case, or a chunk to /predict/batch) and
+# returns a result row per ticket, timed per stage.
+def send_bulk_group(items, create_cases, submitted):
+    start = time.perf_counter()
+    timing = {"queue_ms": (start - submitted) * 1000}
+    try:
+        if create_cases:
+            response = session.post(f"{API_URL}/create_case", json=items[0], timeout=60)
+        else:
+            response = session.post(f"{API_URL}/predict/batch", json={"items": items}, timeout=120)
+    except requests.exceptions.RequestException as e:
+        return [{"error": str(e), **timing} for _ in items]
+    timing["round_trip_ms"] = (time.perf_counter() - start) * 1000
+    timing.update({f"{stage}_ms": ms for stage, ms in parse_server_timing(response.headers.get("Server-Timing")).items()})
+    if response.status_code != 200:
+        return [{"error": f"{response.status_code}: {response.text[:200]}", **timing} for _ in items]
+    results = [response.json()] if create_cases else response.json()['results']
+    return [{**result, **timing} for result in results]
+
+# Runs tickets through the API with up to concurrency requests in flight, yielding
+# (ticket indexes, result rows) as each request finishes.
+def analyze_bulk(items, create_cases, concurrency, chunk_size):
+    size = 1 if create_cases else chunk_size
+    groups = [list(range(i, min(i + size, len(items)))) for i in range(0, len(items), size)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(send_bulk_group, [items[i] for i in group], create_cases, time.perf_counter()): group
+            for group in groups
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+single_tab, bulk_tab = st.tabs(["🔍 Single Query", "📦 Bulk Upload"])
+
+with single_tab:
+    # Input section
+    st.subheader("Customer Query Input")
+
+    col1, col2 = st.columns(2)
 
-col1, col2 = st.columns(2)
+    with col1:
+        customer_name = st.text_input("Customer Name", placeholder="Enter customer name")
 
-with col1:
-    customer_name = st.text_input("Customer Name", placeholder="Enter customer name")
+    with col2:
+        query = st.text_area("Customer Query", placeholder="Enter the customer's query here...", height=100)
 
-with col2:
-    query = st.text_area("Customer Query", placeholder="Enter the customer's query here...", height=100)
+    # Escalation checkbox
+    escalate_case = st.checkbox("🚨 Escalate this case to human agent", help="If checked, the case will be marked as 'Open' in Salesforce for agent handling")
 
-# Escalation checkbox
-escalate_case = st.checkbox("🚨 Escalate this case to human agent", help="If checked, the case will be marked as 'Open' in Salesforce for agent handling")
+    # Streaming mode shows the AI reply as it is generated, but only runs the prediction
+    stream_response = st.checkbox("⚡ Stream the AI response as it is generated", help="Shows category, priority and the reply progressively. Prediction only: no Salesforce case is created.")
 
-# Predict button
-if st.button("🔍 Analyze Query", type="primary"):
-    if not customer_name.strip():
-        st.error("Please enter a customer name.")
-    elif not query.strip():
-        st.error("Please enter a customer query.")
-    else:
-        with st.spinner("Analyzing query with AI and creating Salesforce case..."):
+    # Job mode submits to /jobs and polls for the result instead of holding one long request open
+    background_job = st.checkbox("🕒 Run as a background job", help="The server queues the ticket durably and the page polls for the result. Needs BACKGROUND_JOBS=true on the server.")
+
+    # Predict button
+    if st.button("🔍 Analyze Query", type="primary"):
+        if not customer_name.strip():
+            st.error("Please enter a customer name.")
+        elif not query.strip():
+            st.error("Please enter a customer query.")
+        elif stream_response:
             try:
-                # Make API request to create case
-                response = requests.post(
-                    f"{API_URL}/create_case",
-                    json={
-                        "customer_name": customer_name.strip(),
-                        "query": query.strip(),
-                        "escalated": escalate_case
-                    },
+                with session.post(
+                    f"{API_URL}/predict/stream",
+                    json={"customer_name": customer_name.strip(), "query": query.strip()},
+                    stream=True,
                     timeout=30
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-
-                    # Display results
-                    st.success("✅ Analysis Complete!")
-
-                    # Results in columns
-                    col1, col2, col3 = st.columns(3)
-
-                    with col1:
-                        st.metric("📂 Category", result['category'])
-
-                    with col2:
-                        priority_color = {
-                            "Low": "🟢",
-                            "Medium": "🟡",
-                            "High": "🔴"
-                        }
-                        st.metric("⚡ Priority", f"{priority_color.get(result['priority'], '⚪')} {result['priority']}")
-
-                    with col3:
-                        st.metric("🎯 Confidence", f"{result['confidence']:.2%}")
-
-                    # AI Response
-                    st.header("💬 AI-Generated Response")
-                    st.info(result['response'])
-
-                    # Salesforce Integration Status
-                    st.header("☁️ Salesforce Integration")
-                    if result.get('salesforce_case_id'):
-                        st.success(f"✅ Case created successfully in Salesforce!")
-                        st.code(f"Case ID: {result['salesforce_case_id']}")
-                        st.code(f"Status: {result['salesforce_status']}")
-                        if result['escalated']:
-                            st.warning("🚨 This case has been escalated and is now open for agent handling.")
-                        else:
-                            st.info("📋 Case is closed (auto-resolved by AI).")
+                ) as response:
+                    if response.status_code != 200:
+                        st.error(f"API Error: {response.status_code} - {response.text}")
                     else:
-                        st.error("❌ Failed to create Salesforce case. Check credentials and connection.")
+                        col1, col2, col3 = st.columns(3)
+                        category_slot, priority_slot, confidence_slot = col1.empty(), col2.empty(), col3.empty()
+                        category_slot.metric("📂 Category", "…")
+                        priority_slot.metric("⚡ Priority", "…")
+                        confidence_slot.metric("🎯 Confidence", "…")
 
-                else:
-                    st.error(f"API Error: {response.status_code} - {response.text}")
+                        st.header("💬 AI-Generated Response")
+                        response_slot = st.empty()
+                        reply = ""
+                        priority_color = {"Low": "🟢", "Medium": "🟡", "High": "🔴"}
+
+                        for event, data in iter_sse(response):
+                            if event == "category":
+                                category_slot.metric("📂 Category", data['category'])
+                            elif event == "priority":
+                                priority_slot.metric("⚡ Priority", f"{priority_color.get(data['priority'], '⚪')} {data['priority']}")
+                            elif event == "token":
+                                reply += data['text']
+                                response_slot.info(reply + " ▌")
+                            elif event == "done":
+                                category_slot.metric("📂 Category", data['category'])
+                                priority_slot.metric("⚡ Priority", f"{priority_color.get(data['priority'], '⚪')} {data['priority']}")
+                                confidence_slot.metric("🎯 Confidence", f"{data['confidence']:.2%}")
+                                response_slot.info(data['response'])
+                                st.success("✅ Analysis Complete!")
+                            elif event == "error":
+                                st.error(data['detail'])
 
             except requests.exceptions.RequestException as e:
                 st.error(f"Connection Error: {str(e)}")
                 st.info("Make sure the API server is running on the configured host and port.")
+        else:
+            with st.spinner("Analyzing query with AI and creating Salesforce case..."):
+                try:
+                    payload = {
+                        "customer_name": customer_name.strip(),
+                        "query": query.strip(),
+                        "escalated": escalate_case
+                    }
+
+                    # Make API request to create case, directly or as a background job
+                    if background_job:
+                        status_code, body = run_job(payload)
+                    else:
+                        response = session.post(f"{API_URL}/create_case", json=payload, timeout=30)
+                        status_code = response.status_code
+                        body = response.json() if status_code == 200 else response.text
+
+                    if status_code == 200:
+                        result = body
+
+                        # Display results
+                        st.success("✅ Analysis Complete!")
+
+                        # Results in columns
+                        col1, col2, col3 = st.columns(3)
+
+                        with col1:
+                            st.metric("📂 Category", result['category'])
+
+                        with col2:
+                            priority_color = {
+                                "Low": "🟢",
+                                "Medium": "🟡",
+                                "High": "🔴"
+                            }
+                            st.metric("⚡ Priority", f"{priority_color.get(result['priority'], '⚪')} {result['priority']}")
+
+                        with col3:
+                            st.metric("🎯 Confidence", f"{result['confidence']:.2%}")
+
+                        # AI Response
+                        st.header("💬 AI-Generated Response")
+                        st.info(result['response'])
+
+                        # Salesforce Integration Status
+                        st.header("☁️ Salesforce Integration")
+                        if result.get('salesforce_case_id'):
+                            st.success(f"✅ Case created successfully in Salesforce!")
+                            st.code(f"Case ID: {result['salesforce_case_id']}")
+                            st.code(f"Status: {result['salesforce_status']}")
+                            if result['escalated']:
+                                st.warning("🚨 This case has been escalated and is now open for agent handling.")
+                            else:
+                                st.info("📋 Case is closed (auto-resolved by AI).")
+                        elif result.get('salesforce_tracking_id'):
+                            st.success("📨 Case queued for creation in Salesforce.")
+                            st.code(f"Tracking ID: {result['salesforce_tracking_id']}")
+                            st.code(f"Status: {result['salesforce_status']}")
+                        else:
+                            st.error("❌ Failed to create Salesforce case. Check credentials and connection.")
+
+                    else:
+                        st.error(f"API Error: {status_code} - {body}")
+
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Connection Error: {str(e)}")
+                    st.info("Make sure the API server is running on the configured host and port.")
+
+with bulk_tab:
+    st.subheader("Bulk Ticket Analysis")
+    uploaded = st.file_uploader("CSV of tickets", type=["csv"], help="One ticket per row, with the query text in one column.")
+    if uploaded is not None:
+        tickets = pd.read_csv(uploaded)
+        columns = list(tickets.columns)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            query_column = st.selectbox("Query column", columns, index=columns.index("query") if "query" in columns else 0)
+        with col2:
+            name_options = ["(none)"] + columns
+            name_column = st.selectbox(
+                "Customer name column", name_options,
+                index=name_options.index("customer_name") if "customer_name" in columns else 0
+            )
+
+        create_cases = st.checkbox(
+            "☁️ Create a Salesforce case for every ticket",
+            help="Sends each ticket to /create_case. Otherwise tickets are classified in chunks through /predict/batch and no cases are created."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            concurrency = st.slider("Concurrent requests", 1, BULK_MAX_CONCURRENCY, min(8, BULK_MAX_CONCURRENCY))
+        with col2:
+            chunk_size = st.slider("Tickets per batch request", 5, 100, 25, disabled=create_cases)
+        st.caption(f"{len(tickets)} tickets loaded from {uploaded.name}")
+
+        progress = st.empty()
+        table = st.empty()
+        if st.button("📦 Analyze All Tickets", type="primary"):
+            items = [
+                {
+                    "customer_name": str(row[name_column]) if name_column != "(none)" else "Bulk Upload",
+                    "query": str(row[query_column])
+                }
+                for _, row in tickets.iterrows()
+            ]
+            results = pd.DataFrame(items)
+            for column in BULK_RESULT_COLUMNS:
+                results[column] = pd.Series([None] * len(items), dtype=object)
+
+            start = time.perf_counter()
+            done = 0
+            last_render = 0.0
+            for indexes, rows in analyze_bulk(items, create_cases, concurrency, chunk_size):
+                for index, row in zip(indexes, rows):
+                    for column in BULK_RESULT_COLUMNS:
+                        if column in row:
+                            results.at[index, column] = row[column]
+                done += len(indexes)
+                progress.progress(done / len(items), text=f"{done}/{len(items)} tickets analyzed")
+                # Redrawing the table is the slow part, so refresh it a few times per second.
+                if time.perf_counter() - last_render > 0.25 or done == len(items):
+                    table.dataframe(results, use_container_width=True)
+                    last_render = time.perf_counter()
+
+            # Kept in the session so the results survive the rerun triggered by the download button.
+            st.session_state["bulk_results"] = results
+            st.session_state["bulk_elapsed"] = time.perf_counter() - start
+            st.session_state["bulk_source"] = (uploaded.name, uploaded.size)
+
+        if "bulk_results" in st.session_state and st.session_state["bulk_source"] == (uploaded.name, uploaded.size):
+            results = st.session_state["bulk_results"]
+            elapsed = st.session_state["bulk_elapsed"]
+            table.dataframe(results, use_container_width=True)
+            failed = int(results["error"].notna().sum())
+            st.success(f"✅ {len(results)} tickets in {elapsed:.1f}s ({len(results) / elapsed:.1f} tickets/s), {failed} failed")
+
+            st.markdown("**⏱️ Per-stage timing (ms)**")
+            stages = [c for c in ("queue_ms", "classify_ms", "salesforce_ms", "round_trip_ms") if results[c].notna().any()]
+            timing = results[stages].astype(float)
+            st.dataframe(pd.DataFrame({
+                "mean": timing.mean(),
+                "p50": timing.quantile(0.5),
+                "p95": timing.quantile(0.95),
+                "max": timing.max()
+            }).round(1))
+            if not create_cases:
+                st.caption("Batch requests report one timing for the whole chunk on each of its tickets.")
 
+            st.download_button(
+                "⬇️ Download results as CSV",
+                results.to_csv(index=False),
+                file_name="analyzed_tickets.csv",
+                mime="text/csv"
+            )
 # Sidebar with information
 st.sidebar.header("ℹ️ About")
 st.sidebar.markdown("""
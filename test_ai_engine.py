@@ -0,0 +1,94 @@
+"""
+Tests for batch classification in ai_engine.py, using the stub LLM backend.
+"""
+
+import os
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+
+import re
+import json
+import asyncio
+import pytest
+import ai_engine
+from llm_backends import StubBackend, LLMResponse
+
+QUERIES = ["I was charged twice", "The app crashes on login", "Do you ship to Canada?"]
+
+
+class ScriptedRouter:
+    """Answers like the stub backend, except that batch calls reply as scripted."""
+
+    def __init__(self, batch_reply):
+        self.batch_reply = batch_reply
+        self.stub = StubBackend()
+        self.batch_calls = 0
+        self.single_calls = 0
+        self.routed = []  # (query, priority) of each single call
+
+    def generate(self, prompt, query=None, priority=None, **kwargs):
+        if re.search(r"^\s*\[\d+\] ", prompt, re.MULTILINE):
+            self.batch_calls += 1
+            return self.batch_reply(self.stub.generate(prompt, **kwargs))
+        self.single_calls += 1
+        self.routed.append((query, priority))
+        return self.stub.generate(prompt, **kwargs)
+
+    async def agenerate(self, prompt, query=None, priority=None, **kwargs):
+        return self.generate(prompt, query, priority, **kwargs)
+
+def as_is(response):
+    return response
+
+def unparseable(response):
+    return LLMResponse("Sorry, I can only answer one question at a time.")
+
+def first_item_only(response):
+    return LLMResponse(json.dumps(json.loads(response.text)[:1]))
+
+def upstream_down(response):
+    raise RuntimeError("429 Resource has been exhausted")
+
+def classify(queries, use_async):
+    if use_async:
+        return asyncio.run(ai_engine.aclassify_queries(queries))
+    return ai_engine.classify_queries(queries)
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_unparseable_reply_is_classified_per_item(monkeypatch, use_async):
+    router = ScriptedRouter(unparseable)
+    monkeypatch.setattr(ai_engine, "llm_router", router)
+
+    results = classify(QUERIES, use_async)
+    assert (router.batch_calls, router.single_calls) == (1, len(QUERIES))
+    assert all("fallback" not in result for result in results)
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_items_missing_from_the_reply_are_classified_per_item(monkeypatch, use_async):
+    router = ScriptedRouter(first_item_only)
+    monkeypatch.setattr(ai_engine, "llm_router", router)
+
+    results = classify(QUERIES, use_async)
+    assert (router.batch_calls, router.single_calls) == (1, len(QUERIES) - 1)
+    assert results[0]["category"] == StubBackend.classify(QUERIES[0])[0]
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_failed_batch_call_does_not_fan_out(monkeypatch, use_async):
+    router = ScriptedRouter(upstream_down)
+    monkeypatch.setattr(ai_engine, "llm_router", router)
+
+    results = classify(QUERIES, use_async)
+    assert (router.batch_calls, router.single_calls) == (1, 0)
+    assert all(result["fallback"] for result in results)
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_fast_path_hits_skip_the_batch_prompt(monkeypatch, use_async):
+    router = ScriptedRouter(as_is)
+    monkeypatch.setattr(ai_engine, "llm_router", router)
+    prediction = {"category": "Billing", "priority": "Low", "confidence": 0.97}
+    monkeypatch.setattr(ai_engine, "_fast_path", lambda query: prediction if query == QUERIES[0] else None)
+
+    results = classify(QUERIES, use_async)
+    assert (router.batch_calls, router.single_calls) == (1, 1)
+    assert router.routed == [(QUERIES[0], "Low")]
+    assert (results[0]["category"], results[0]["confidence"]) == ("Billing", 0.97)
@@ -0,0 +1,105 @@
+"""
+Tests for bulk_ingest.py against the stub LLM backend and the local Salesforce stand-in.
+"""
+
+import os
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+
+import json
+import pytest
+import bulk_ingest
+from bulk_ingest import BulkIngest
+from salesforce_integration import sf_integration
+from benchmarks.fakes import FakeSalesforceServer, fake_salesforce_client
+
+
+@pytest.fixture
+def salesforce():
+    server = FakeSalesforceServer(latency=0).start()
+    sf_integration.sf = fake_salesforce_client(server.url)
+    yield server
+    sf_integration.sf = None
+    server.stop()
+
+@pytest.fixture
+def tickets(tmp_path):
+    path = tmp_path / "tickets.jsonl"
+    path.write_text("".join(
+        json.dumps({"customer_name": f"Customer {i}", "query": f"Ticket {i}: I was charged twice"}) + "\n"
+        for i in range(7)
+    ))
+    return str(path)
+
+def read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def queries(rows):
+    return sorted(row["query"] for row in rows)
+
+# Makes classify_queries() fall back for the queries in failing, like during an LLM outage.
+def failing_for(monkeypatch, failing):
+    classify_queries = bulk_ingest.classify_queries
+
+    def classify(queries, **kwargs):
+        results = classify_queries(queries, **kwargs)
+        return [
+            {**result, "confidence": 0.5, "fallback": "error"} if query in failing else result
+            for query, result in zip(queries, results)
+        ]
+    monkeypatch.setattr(bulk_ingest, "classify_queries", classify)
+
+def test_resume_neither_loses_nor_duplicates_rows(tickets, tmp_path):
+    output, checkpoint = str(tmp_path / "out.jsonl"), str(tmp_path / "out.checkpoint")
+    first = BulkIngest().run(tickets, output, checkpoint, chunk_size=2, limit=3)
+    second = BulkIngest().run(tickets, output, checkpoint, chunk_size=2)
+
+    assert (first["records"], second["records"]) == (3, 4)
+    rows = read_rows(output)
+    assert queries(rows) == queries(bulk_ingest.iter_records(tickets))
+    assert all(row["category"] and "fallback" not in row for row in rows)
+
+def test_fallback_rows_are_retried_not_pushed(tickets, tmp_path, monkeypatch, salesforce):
+    output, checkpoint = str(tmp_path / "out.jsonl"), str(tmp_path / "out.checkpoint")
+    failing = {"Ticket 1: I was charged twice", "Ticket 4: I was charged twice"}
+    failing_for(monkeypatch, failing)
+
+    first = BulkIngest(push_to_salesforce=True).run(tickets, output, checkpoint, chunk_size=3)
+    assert (first["fallbacks"], first["retry_pending"], first["cases_created"]) == (2, 2, 5)
+    assert len(salesforce.cases) == 5
+    assert not failing.intersection(row["query"] for row in read_rows(output))
+
+    monkeypatch.undo()
+    second = BulkIngest(push_to_salesforce=True).run(tickets, output, checkpoint, chunk_size=3)
+    assert (second["records"], second["fallbacks"], second["retry_pending"]) == (2, 0, 0)
+    assert len(salesforce.cases) == 7
+    rows = read_rows(output)
+    assert queries(rows) == queries(bulk_ingest.iter_records(tickets))
+    assert all(row["salesforce_case_id"] for row in rows)
+
+def test_interrupted_push_is_not_repeated(tickets, tmp_path, monkeypatch, salesforce):
+    output, checkpoint = str(tmp_path / "out.jsonl"), str(tmp_path / "out.checkpoint")
+    create_cases = sf_integration.create_cases
+    pushes = []
+
+    # Creates the second chunk's cases, then dies before the result is recorded.
+    def crash_on_second_push(case_data):
+        pushes.append(len(case_data))
+        results = create_cases(case_data)
+        if len(pushes) == 2:
+            raise KeyboardInterrupt
+        return results
+    monkeypatch.setattr(sf_integration, "create_cases", crash_on_second_push)
+
+    with pytest.raises(KeyboardInterrupt):
+        BulkIngest(push_to_salesforce=True).run(tickets, output, checkpoint, chunk_size=3)
+    assert len(salesforce.cases) == 6
+
+    monkeypatch.undo()
+    summary = BulkIngest(push_to_salesforce=True).run(tickets, output, checkpoint, chunk_size=3)
+    assert summary["push_interrupted"] == 3
+    assert len(salesforce.cases) == 7
+    rows = read_rows(output)
+    assert queries(rows) == queries(bulk_ingest.iter_records(tickets))
+    assert sum(1 for row in rows if row["salesforce_error"]) == 3
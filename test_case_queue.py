@@ -0,0 +1,94 @@
+"""
+Tests for the write-behind case queue against the local Salesforce stand-in.
+"""
+
+import pytest
+import case_queue
+from case_queue import CaseWriteQueue
+from salesforce_integration import sf_integration, PartialCreateError
+from benchmarks.fakes import FakeSalesforceServer, fake_salesforce_client
+
+
+@pytest.fixture
+def salesforce(monkeypatch):
+    server = FakeSalesforceServer(latency=0).start()
+    sf_integration.sf = fake_salesforce_client(server.url)
+    # No backoff between retries.
+    monkeypatch.setattr(case_queue.time, "sleep", lambda seconds: None)
+    yield server
+    sf_integration.sf = None
+    server.stop()
+
+
+class FlakyIntegration:
+    """Creates cases on the fake server through sf_integration, misbehaving on the first call."""
+
+    def __init__(self, created_before_failure=None, uncertain=0, drop_results=0):
+        self.created_before_failure = created_before_failure
+        self.uncertain = uncertain
+        self.drop_results = drop_results
+        self.calls = []
+
+    def build_case_data(self, *args):
+        return sf_integration.build_case_data(*args)
+
+    def create_cases(self, records):
+        self.calls.append(len(records))
+        if len(self.calls) == 1 and self.created_before_failure is not None:
+            created = sf_integration.create_cases(records[:self.created_before_failure])
+            raise PartialCreateError(created, RuntimeError("request failed"), uncertain=self.uncertain)
+        results = sf_integration.create_cases(records)
+        return results[:len(results) - self.drop_results] if len(self.calls) == 1 else results
+
+    bulk_create_cases = create_cases
+
+def enqueue(queue, count):
+    return [
+        queue.enqueue(f"Customer {i}", f"Ticket {i}", "Billing", "Medium", "We are on it.")["tracking_id"]
+        for i in range(count)
+    ]
+
+def test_groups_never_exceed_one_composite_call(salesforce):
+    queue = CaseWriteQueue(sf_integration, max_batch=500, bulk_threshold=10000)
+    tracking_ids = enqueue(queue, 450)
+    queue.flush()
+
+    assert queue.max_batch == 200
+    assert queue.stats()["api_calls"] == 3
+    assert len(salesforce.cases) == 450
+    assert all(queue.status(t)["state"] == "created" for t in tracking_ids)
+
+def test_retry_resends_only_records_without_a_result(salesforce):
+    integration = FlakyIntegration(created_before_failure=30)
+    queue = CaseWriteQueue(integration, bulk_threshold=50)
+    tracking_ids = enqueue(queue, 80)
+    queue.flush()
+
+    assert integration.calls == [80, 50]
+    assert len(salesforce.cases) == 80
+    assert queue.stats()["retries"] == 1
+    assert all(queue.status(t)["state"] == "created" for t in tracking_ids)
+
+def test_records_of_a_failed_bulk_job_are_not_resent(salesforce):
+    # Jobs of 30 and 20 records: the first is created, the second fails and may have been created.
+    integration = FlakyIntegration(created_before_failure=30, uncertain=20)
+    queue = CaseWriteQueue(integration, bulk_threshold=50)
+    tracking_ids = enqueue(queue, 80)
+    queue.flush()
+
+    assert integration.calls == [80, 30]
+    states = [queue.status(t)["state"] for t in tracking_ids]
+    assert states == ["created"] * 30 + ["failed"] * 20 + ["created"] * 30
+    assert "may have been created" in queue.status(tracking_ids[30])["error"]
+    assert queue.stats()["pending"] == 0
+
+def test_missing_results_fail_their_entries(salesforce):
+    integration = FlakyIntegration(drop_results=2)
+    queue = CaseWriteQueue(integration)
+    tracking_ids = enqueue(queue, 5)
+    queue.flush()
+
+    states = [queue.status(t)["state"] for t in tracking_ids]
+    assert states == ["created"] * 3 + ["failed"] * 2
+    assert queue.status(tracking_ids[-1])["error"] == "No result returned by Salesforce"
+    assert queue.stats()["failed"] == 2
@@ -0,0 +1,130 @@
+"""
+Tests for the MinHash near-duplicate index and the case deduplicator, with a scripted integration.
+"""
+
+import time
+import threading
+import pytest
+from duplicate_detector import MinHashLSH, CaseDeduplicator
+
+QUERY = "I was charged twice for my subscription this month, please refund one payment"
+NEAR_DUPLICATE = "I was charged twice for my subscription this month. Please refund one of the payments"
+UNRELATED = "The mobile app crashes whenever I open the settings screen"
+
+
+class ScriptedIntegration:
+    """Creates numbered cases and tasks, optionally holding case creation until released."""
+
+    def __init__(self, hold_cases=False, case_success=True, task_success=True):
+        self.release = threading.Event()
+        if not hold_cases:
+            self.release.set()
+        self.case_success = case_success
+        self.task_success = task_success
+        self.cases = []
+        self.tasks = []
+
+    def create_case(self, customer_name, query, category, priority, ai_response, escalated=False):
+        self.release.wait(5)
+        if not self.case_success:
+            return {"success": False, "error": "UNABLE_TO_LOCK_ROW"}
+        self.cases.append(query)
+        return {"success": True, "case_id": f"500CASE{len(self.cases)}", "status": "New"}
+
+    def create_task(self, case_id, subject, description):
+        if not self.task_success:
+            return {"success": False, "error": "INSUFFICIENT_ACCESS"}
+        self.tasks.append(case_id)
+        return {"success": True, "task_id": f"00TTASK{len(self.tasks)}"}
+
+def report(deduplicator, query, category="Billing", escalated=False):
+    return deduplicator.create_case("Jane Doe", query, category, "Medium", "We are on it.", escalated)
+
+def test_near_duplicates_share_a_bucket_and_clear_the_threshold():
+    index = MinHashLSH(threshold=0.5)
+    index.add("parent", index.signature(QUERY))
+
+    key, similarity = index.query(index.signature(NEAR_DUPLICATE))
+    assert key == "parent" and 0.5 <= similarity < 1.0
+    assert index.query(index.signature(UNRELATED)) is None
+
+    index.remove("parent")
+    assert len(index) == 0 and not index._buckets
+
+def test_threshold_rejects_candidates_below_it():
+    index = MinHashLSH(threshold=0.99)
+    index.add("parent", index.signature(QUERY))
+    assert index.query(index.signature(NEAR_DUPLICATE)) is None
+    assert index.query(index.signature(QUERY.upper()))[0] == "parent"
+
+def test_entries_only_match_within_their_group():
+    index = MinHashLSH(threshold=0.5)
+    index.add("billing", index.signature(QUERY), group=("Billing", False))
+    assert index.query(index.signature(NEAR_DUPLICATE), group=("Billing", True)) is None
+    assert index.query(index.signature(NEAR_DUPLICATE), group=("Billing", False))[0] == "billing"
+
+def test_expired_entries_are_dropped():
+    index = MinHashLSH(window=60)
+    index.add("old", index.signature(QUERY), now=1000.0)
+    assert index.expire(now=1100.0) == ["old"]
+    assert index.query(index.signature(QUERY)) is None
+
+def test_duplicate_becomes_a_task_on_the_parent_case():
+    integration = ScriptedIntegration()
+    deduplicator = CaseDeduplicator(integration, MinHashLSH())
+
+    parent = report(deduplicator, QUERY)
+    duplicate = report(deduplicator, NEAR_DUPLICATE)
+    assert duplicate["duplicate"] and duplicate["case_id"] == parent["case_id"]
+    assert integration.cases == [QUERY]
+    assert deduplicator.clusters()[0]["reports"] == 2
+
+@pytest.mark.parametrize("category, escalated", [("Technical Support", False), ("Billing", True)])
+def test_other_category_or_escalation_opens_its_own_case(category, escalated):
+    integration = ScriptedIntegration()
+    deduplicator = CaseDeduplicator(integration, MinHashLSH())
+
+    report(deduplicator, QUERY)
+    result = report(deduplicator, NEAR_DUPLICATE, category, escalated)
+    assert "duplicate" not in result
+    assert len(integration.cases) == 2 and integration.tasks == []
+
+def test_duplicate_waits_for_a_parent_still_being_created():
+    integration = ScriptedIntegration(hold_cases=True)
+    deduplicator = CaseDeduplicator(integration, MinHashLSH(), wait_timeout=5)
+    results = {}
+
+    parent_thread = threading.Thread(target=lambda: results.setdefault("parent", report(deduplicator, QUERY)))
+    parent_thread.start()
+    while len(deduplicator.index) == 0:
+        time.sleep(0.01)
+    duplicate_thread = threading.Thread(target=lambda: results.setdefault("duplicate", report(deduplicator, NEAR_DUPLICATE)))
+    duplicate_thread.start()
+    duplicate_thread.join(0.2)
+    assert duplicate_thread.is_alive()
+
+    integration.release.set()
+    parent_thread.join(5)
+    duplicate_thread.join(5)
+    assert results["duplicate"]["case_id"] == results["parent"]["case_id"]
+    assert integration.cases == [QUERY]
+
+def test_duplicate_of_a_failed_parent_opens_its_own_case():
+    integration = ScriptedIntegration(case_success=False)
+    deduplicator = CaseDeduplicator(integration, MinHashLSH(), wait_timeout=0.1)
+
+    assert not report(deduplicator, QUERY)["success"]
+    integration.case_success = True
+    result = report(deduplicator, NEAR_DUPLICATE)
+    assert result["success"] and "duplicate" not in result
+    assert integration.cases == [NEAR_DUPLICATE]
+
+def test_failed_attach_does_not_count_as_a_report():
+    integration = ScriptedIntegration(task_success=False)
+    deduplicator = CaseDeduplicator(integration, MinHashLSH())
+
+    report(deduplicator, QUERY)
+    result = report(deduplicator, NEAR_DUPLICATE)
+    assert "duplicate" not in result and len(integration.cases) == 2
+    assert deduplicator.clusters() == []
+    assert deduplicator.stats()["attach_failures"] == 1
@@ -0,0 +1,106 @@
+"""
+Tests for the SQLite job store and worker pool, using the stub LLM backend.
+"""
+
+import os
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+
+import time
+import threading
+from functools import partial
+import pytest
+from job_queue import JobStore, JobWorkerPool, process_job
+
+PAYLOAD = {"customer_name": "Jane Doe", "query": "I was charged twice this month", "escalated": False}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(path=str(tmp_path / "jobs.sqlite3"), lease_seconds=0.3, max_attempts=2)
+
+# Runs a pool until every job has left the queue, or fails after timeout seconds.
+def drain(pool, timeout=10.0):
+    pool.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while set(pool.store.counts()) - {"done", "failed"}:
+            assert time.monotonic() < deadline, pool.store.counts()
+            time.sleep(0.05)
+    finally:
+        pool.stop()
+
+def test_expired_lease_goes_to_the_next_claim(store):
+    job_id = store.create(PAYLOAD)
+    _, _, first_token = store.claim()
+    assert store.claim() is None
+
+    time.sleep(0.4)
+    claimed_id, payload, second_token = store.claim()
+    assert (claimed_id, payload) == (job_id, PAYLOAD)
+    assert not store.complete(job_id, first_token, {"stale": True})
+    assert not store.renew(job_id, first_token)
+    assert store.complete(job_id, second_token, {"fresh": True})
+    assert store.get(job_id)["result"] == {"fresh": True}
+
+def test_expired_lease_without_attempts_left_fails_the_job(store):
+    job_id = store.create(PAYLOAD)
+    for _ in range(2):
+        assert store.claim()[0] == job_id
+        time.sleep(0.4)
+
+    assert store.claim() is None
+    job = store.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 2, "lease expired")
+
+def test_renewed_lease_is_not_claimed_again(store):
+    store.create(PAYLOAD)
+    job_id, _, token = store.claim()
+    for _ in range(3):
+        time.sleep(0.2)
+        assert store.renew(job_id, token)
+    assert store.claim() is None
+
+def test_heartbeat_keeps_slow_jobs_with_their_worker(store):
+    calls = []
+
+    # Takes several lease periods, like a slow LLM call followed by Salesforce retries.
+    def slow_handler(payload):
+        calls.append(threading.current_thread().name)
+        time.sleep(1.0)
+        return {"ok": True}
+
+    job_id = store.create(PAYLOAD)
+    pool = JobWorkerPool(store, threads=2, poll_interval=0.05, handler=slow_handler)
+    drain(pool)
+
+    assert len(calls) == 1
+    assert store.get(job_id)["status"] == "done"
+    assert pool.lost_leases == 0
+
+def test_failed_case_creation_is_retried_then_failed(store):
+    attempts = []
+
+    def create_case(**kwargs):
+        attempts.append(kwargs["query"])
+        return {"success": False, "error": "UNABLE_TO_LOCK_ROW"}
+
+    job_id = store.create(PAYLOAD)
+    pool = JobWorkerPool(store, threads=1, poll_interval=0.05, handler=partial(process_job, create_case=create_case))
+    drain(pool)
+
+    job = store.get(job_id)
+    assert (job["status"], job["attempts"], len(attempts)) == ("failed", 2, 2)
+    assert "UNABLE_TO_LOCK_ROW" in job["error"]
+
+def test_created_case_completes_the_job(store):
+    def create_case(**kwargs):
+        return {"success": True, "case_id": "500FAKE00000001AAA", "status": "New"}
+
+    job_id = store.create(PAYLOAD)
+    drain(JobWorkerPool(store, threads=1, poll_interval=0.05, handler=partial(process_job, create_case=create_case)))
+
+    job = store.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"]["salesforce_case_id"] == "500FAKE00000001AAA"
+    assert job["result"]["category"]
@@ -0,0 +1,79 @@
+"""
+Tests for the priority scheduler's ordering, class limits and starvation promotion.
+"""
+
+import asyncio
+from priority_scheduler import PriorityScheduler, pre_score
+
+
+# Holds the only slot with holder_class, queues one request per entry of classes (in that order),
+# then frees the slot and returns the classes in the order they were granted.
+async def dispatch_order(scheduler, holder_class, classes):
+    order = []
+
+    async def request(cls):
+        async with scheduler.slot(cls):
+            order.append(cls)
+
+    await scheduler.acquire(holder_class)
+    tasks = [asyncio.create_task(request(cls)) for cls in classes]
+    await asyncio.sleep(0)
+    scheduler.release(holder_class)
+    await asyncio.gather(*tasks)
+    return order
+
+def test_backlog_is_served_in_weighted_fair_order():
+    scheduler = PriorityScheduler("test", max_concurrency=1, max_wait=0)
+    order = asyncio.run(dispatch_order(scheduler, "escalated", ["low"] * 3 + ["high"] * 8))
+
+    # High has four times low's weight, so it gets four slots for each one low gets.
+    assert order == ["high"] * 4 + ["low"] + ["high"] * 4 + ["low"] * 2
+
+def test_class_limit_keeps_slots_for_other_classes():
+    async def scenario():
+        scheduler = PriorityScheduler("test", max_concurrency=4, class_limits={"low": 1})
+        low = [asyncio.create_task(scheduler.acquire("low")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        high_waited = await asyncio.wait_for(scheduler.acquire("high"), timeout=1)
+        stats = scheduler.stats()
+        scheduler.release("high")
+        scheduler.release("low")
+        await asyncio.sleep(0.01)
+        granted = sum(task.done() for task in low)
+        for task in low:
+            task.cancel()
+        return stats, high_waited, granted
+
+    stats, high_waited, granted = asyncio.run(scenario())
+    assert (stats["low_running"], stats["low_queued"], stats["high_running"]) == (1, 2, 1)
+    assert high_waited < 0.5
+    assert granted == 2
+
+def test_starving_class_is_promoted_past_heavier_ones():
+    async def scenario():
+        scheduler = PriorityScheduler("test", max_concurrency=1, max_wait=0.05)
+        order = []
+
+        async def request(cls):
+            async with scheduler.slot(cls):
+                order.append(cls)
+
+        await scheduler.acquire("high")
+        low = asyncio.create_task(request("low"))
+        await asyncio.sleep(0.1)
+        # Fresh high-priority work would win on weight alone.
+        high = [asyncio.create_task(request("high")) for _ in range(3)]
+        await asyncio.sleep(0)
+        scheduler.release("high")
+        await asyncio.gather(low, *high)
+        return scheduler, order
+
+    scheduler, order = asyncio.run(scenario())
+    assert order == ["low", "high", "high", "high"]
+    assert scheduler.promoted["low"] == 1
+
+def test_pre_score_uses_keyword_rules_without_a_classifier():
+    assert pre_score("Our site is down, please help immediately") == "high"
+    assert pre_score("I love the new dashboard") == "low"
+    assert pre_score("I love the new dashboard", customer_tier="Enterprise") == "medium"
+    assert pre_score("I love the new dashboard", escalated=True) == "escalated"
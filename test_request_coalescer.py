@@ -0,0 +1,54 @@
+"""
+Tests for the /predict request coalescer with scripted classification functions.
+"""
+
+import os
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+
+import asyncio
+import pytest
+from request_coalescer import RequestCoalescer
+
+
+def result_for(query):
+    return {"category": "Billing", "priority": "Medium", "response": f"About: {query}", "confidence": 0.9}
+
+async def classify_one(query):
+    return result_for(query)
+
+async def classify_many(queries):
+    return [result_for(query) for query in queries]
+
+def test_concurrent_queries_share_one_upstream_call():
+    async def scenario():
+        coalescer = RequestCoalescer(max_wait_ms=20, max_batch=16, classify_one=classify_one, classify_many=classify_many)
+        await coalescer.start()
+        queries = ["Refund please", "refund please!", "Where is my order?"]
+        results = await asyncio.gather(*(coalescer.classify(q) for q in queries))
+        await coalescer.stop()
+        return coalescer, results
+
+    coalescer, results = asyncio.run(scenario())
+    assert [r["response"] for r in results] == ["About: Refund please", "About: Refund please", "About: Where is my order?"]
+    assert (coalescer.upstream_calls, coalescer.deduplicated) == (1, 1)
+
+def test_stop_fails_queries_that_were_never_dispatched():
+    async def scenario():
+        # The window is far longer than the test, so the queries are still being collected at stop().
+        coalescer = RequestCoalescer(max_wait_ms=60000, max_batch=16, classify_one=classify_one, classify_many=classify_many)
+        await coalescer.start()
+        callers = [asyncio.create_task(coalescer.classify(f"Ticket {i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(coalescer.stop(), timeout=1)
+        outcomes = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), timeout=1)
+        return coalescer, outcomes
+
+    coalescer, outcomes = asyncio.run(scenario())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert coalescer.stats()["in_flight"] == 0
+
+def test_classify_needs_a_running_coalescer():
+    coalescer = RequestCoalescer(classify_one=classify_one, classify_many=classify_many)
+    with pytest.raises(RuntimeError):
+        asyncio.run(coalescer.classify("Refund please"))
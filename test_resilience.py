@@ -0,0 +1,89 @@
+"""
+Tests for the circuit breaker, the retry policy and the shared rate limiter.
+"""
+
+import time
+import pytest
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, SharedTokenBucket, TokenBucket
+
+
+class Upstream:
+    """Fails every call with a retryable error, counting calls and the time budgets passed in."""
+
+    def __init__(self):
+        self.budgets = []
+
+    def __call__(self, remaining):
+        self.budgets.append(remaining)
+        raise RuntimeError("503 Service Unavailable")
+
+def caller(**kwargs):
+    options = {"max_retries": 5, "base_delay": 0.0, "deadline": 10.0, "retry_ratio": 0.0, "min_retry_budget": 10}
+    options.update(kwargs)
+    return ResilientCaller(TokenBucket(0), CircuitBreaker(failure_threshold=100), lambda e: True, **options)
+
+def test_circuit_opens_then_probes_then_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one probe at a time.
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+    breaker.before_call()
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_retries_stop_when_the_budget_is_spent():
+    policy = caller(min_retry_budget=2)
+    upstream = Upstream()
+    with pytest.raises(RuntimeError):
+        policy.call(upstream)
+    assert len(upstream.budgets) == 3
+
+    # The budget is empty, so the next call is not retried at all.
+    upstream = Upstream()
+    with pytest.raises(RuntimeError):
+        policy.call(upstream)
+    assert len(upstream.budgets) == 1
+
+def test_no_retry_is_started_that_would_end_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    policy = caller(base_delay=0.2, max_delay=0.2, deadline=0.3)
+    upstream = Upstream()
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        policy.call(upstream)
+
+    assert len(upstream.budgets) == 2
+    assert time.monotonic() - started < 0.3
+    assert upstream.budgets[1] < upstream.budgets[0] <= 0.3
+
+def test_shared_bucket_limits_all_instances_together(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    first = SharedTokenBucket(path, rate=0.1, capacity=2)
+    second = SharedTokenBucket(path, rate=0.1, capacity=2)
+
+    assert first.acquire(timeout=0)
+    assert second.acquire(timeout=0)
+    assert not first.acquire(timeout=0)
+    assert not second.acquire(timeout=0)
@@ -0,0 +1,39 @@
+"""
+Tests for the response cache's exact and near-duplicate lookups on both backends.
+"""
+
+import asyncio
+import pytest
+from response_cache import ResponseCache, MemoryBackend, DiskBackend, cache_from_env
+
+RESULT = {"category": "Billing", "priority": "High", "response": "We will refund you.", "confidence": 0.9}
+
+
+@pytest.fixture(params=["memory", "disk"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_size=100)
+    return DiskBackend(str(tmp_path / "cache.sqlite3"), max_size=100)
+
+def test_cache_is_off_unless_configured(monkeypatch):
+    monkeypatch.delenv("RESPONSE_CACHE_BACKEND", raising=False)
+    assert cache_from_env() is None
+
+def test_exact_lookup_ignores_case_and_punctuation(backend):
+    cache = ResponseCache(backend, namespace="v1")
+    cache.set("I was charged TWICE!", RESULT)
+
+    assert cache.get("i was charged twice") == RESULT
+    assert asyncio.run(cache.aget("I was charged twice.")) == RESULT
+    assert ResponseCache(backend, namespace="v2").get("i was charged twice") is None
+
+def test_near_duplicate_lookup_only_scans_recent_entries(backend):
+    cache = ResponseCache(backend, similarity_threshold=0.6, similarity_scan=5)
+    cache.set("I was charged twice for my subscription this month", RESULT)
+    assert cache.get("I was charged twice for my subscription this month again") == RESULT
+    assert cache.stats()["near_hits"] == 1
+
+    # Five newer, unrelated entries push the match out of the scanned window.
+    for i in range(5):
+        cache.set(f"unrelated question number {i} about shipping", {**RESULT, "category": "General Inquiry"})
+    assert cache.get("I was charged twice for my subscription this month again") is None
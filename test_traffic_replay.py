@@ -0,0 +1,65 @@
+"""
+Tests for recording LLM traffic and replaying it through ReplayBackend.
+"""
+
+import asyncio
+import pytest
+from llm_backends import ReplayBackend, StubBackend, BACKEND_CALLS
+from traffic_replay import TrafficRecorder, TrafficLog, prompt_key
+
+SYSTEM = "Classify the query."
+PROMPT = "Query: I was charged twice"
+
+
+class CountingGuard:
+    """Stands in for resilience.ResilientCaller and counts the calls made through it."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def call(self, func):
+        self.calls += 1
+        return func(5.0)
+
+    async def acall(self, func):
+        self.calls += 1
+        return await func(5.0)
+
+
+def record_log(path, **fields):
+    recorder = TrafficRecorder(str(path))
+    recorder.record("llm", 0.0, key=prompt_key(SYSTEM, PROMPT), prompt=PROMPT, latency=0.2, **fields)
+    return TrafficLog.load(str(path), speed=0)
+
+def test_replay_serves_recorded_reply(tmp_path):
+    log = record_log(tmp_path / "traffic.jsonl", reply="recorded reply", usage=[12, 4])
+    backend = ReplayBackend(log)
+
+    response = backend.generate(PROMPT, system_instruction=SYSTEM)
+    assert response.text == "recorded reply"
+    assert response.usage_metadata.prompt_token_count == 12
+    assert asyncio.run(backend.agenerate(PROMPT, system_instruction=SYSTEM)).text == "recorded reply"
+    assert log.stats()["llm_hits"] == 2
+
+def test_replay_raises_recorded_error(tmp_path):
+    backend = ReplayBackend(record_log(tmp_path / "traffic.jsonl", error="429 Resource has been exhausted"))
+    with pytest.raises(RuntimeError, match="429"):
+        backend.generate(PROMPT, system_instruction=SYSTEM)
+
+def test_replay_miss_without_fallback_fails(tmp_path):
+    backend = ReplayBackend(record_log(tmp_path / "traffic.jsonl", reply="recorded reply"))
+    with pytest.raises(LookupError):
+        backend.generate("Query: something never recorded", system_instruction=SYSTEM)
+
+def test_replay_miss_goes_through_fallback_guard(tmp_path):
+    guard = CountingGuard()
+    fallback = StubBackend(guard=guard)
+    backend = ReplayBackend(record_log(tmp_path / "traffic.jsonl", reply="recorded reply"), fallback=fallback)
+    calls_before = BACKEND_CALLS.value(backend="stub", outcome="ok")
+
+    miss = "Query: my invoice is wrong"
+    assert backend.generate(miss).text
+    assert asyncio.run(backend.agenerate(miss)).text
+    assert backend.generate(PROMPT, system_instruction=SYSTEM).text == "recorded reply"
+    assert guard.calls == 2
+    assert BACKEND_CALLS.value(backend="stub", outcome="ok") - calls_before == 2
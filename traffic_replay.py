@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Record and replay of classification and Salesforce traffic.
+
+With TRAFFIC_MODE=record every classify_query() call (the workload), every LLM call
+(prompt, reply, latency, token usage) and every SalesforceIntegration.create_case()
+call (payload, result, latency) is appended to TRAFFIC_LOG_PATH, one compact JSON
+object per line. Each line is written with a single append, so several worker
+processes can record into the same file.
+
+Replaying serves those recorded results instead of the live services, sleeping the
+recorded latency divided by TRAFFIC_REPLAY_SPEED (0 answers at once):
+LLM_BACKEND=replay serves LLM replies by prompt, and TRAFFIC_MODE=replay serves
+Salesforce case creation by customer and query.
+
+Re-run a recorded workload offline against the current engine, at the original
+arrival times or faster, and compare two runs side by side with:
+    python traffic_replay.py replay traffic.jsonl --speed 10 --output candidate.jsonl
+    python traffic_replay.py compare baseline.jsonl candidate.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import argparse
+import threading
+import contextvars
+from collections import deque
+from functools import wraps
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+TRAFFIC_MODE = os.getenv("TRAFFIC_MODE", "").lower()
+TRAFFIC_LOG_PATH = os.getenv("TRAFFIC_LOG_PATH", "traffic.jsonl")
+TRAFFIC_REPLAY_SPEED = float(os.getenv("TRAFFIC_REPLAY_SPEED", "1"))
+
+# Identifies an LLM request by its static instructions and per-request text.
+def prompt_key(system_instruction, prompt):
+    return hashlib.sha256(f"{system_instruction or ''}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+# Identifies a case creation by who reported what, so it still matches when a different engine
+# version classified the ticket differently.
+def case_key(payload):
+    identity = json.dumps([payload["customer_name"], payload["query"], bool(payload.get("escalated"))])
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+class TrafficRecorder:
+    """Appends traffic records to a JSONL file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.records = 0
+
+    def record(self, kind, start, **fields):
+        """
+        Append one record.
+
+        Args:
+            kind (str): "classify", "llm", "salesforce" or "engine"
+            start (float): Wall-clock time the call started, as from time.time()
+            **fields: JSON-serializable details of the call
+        """
+        line = json.dumps({"kind": kind, "t": round(start, 4), **fields}, separators=(",", ":"), default=str)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                self.records += 1
+        except OSError as e:
+            print(f"Error recording traffic: {e}")
+
+    def stats(self):
+        return {"records": self.records}
+
+
+class TrafficLog:
+    """
+    Recorded LLM replies and Salesforce results, served by key.
+
+    Records sharing a key are served in recorded order and then from the start again,
+    so a replay makes the same upstream answers in the same order every run.
+    """
+
+    def __init__(self, records, speed=1.0):
+        self.speed = speed
+        self._replies = {}  # prompt key -> deque of llm records
+        self._cases = {}  # case key -> deque of salesforce records
+        self._lock = threading.Lock()
+        self.hits = {"llm": 0, "salesforce": 0}
+        self.misses = {"llm": 0, "salesforce": 0}
+        for record in records:
+            if record["kind"] == "llm":
+                self._replies.setdefault(record["key"], deque()).append(record)
+            elif record["kind"] == "salesforce":
+                self._cases.setdefault(case_key(record["payload"]), deque()).append(record)
+
+    @classmethod
+    def load(cls, path, speed=1.0):
+        return cls(read_records(path), speed=speed)
+
+    def _next(self, kind, index, key):
+        with self._lock:
+            records = index.get(key)
+            if not records:
+                self.misses[kind] += 1
+                return None
+            self.hits[kind] += 1
+            records.rotate(-1)
+            return records[-1]
+
+    def reply(self, key):
+        """Return the next recorded LLM call for a prompt key, or None."""
+        return self._next("llm", self._replies, key)
+
+    def case(self, payload):
+        """Return the next recorded create_case() call for a payload, or None."""
+        return self._next("salesforce", self._cases, case_key(payload))
+
+    def delay(self, record):
+        """Seconds a replayed call takes: the recorded latency at the replay speed."""
+        return record["latency"] / self.speed if self.speed else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "speed": self.speed,
+                "llm_hits": self.hits["llm"],
+                "llm_misses": self.misses["llm"],
+                "salesforce_hits": self.hits["salesforce"],
+                "salesforce_misses": self.misses["salesforce"]
+            }
+
+# Reads every record of a traffic log (or replay output) file.
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# Recorder used when TRAFFIC_MODE=record, else None.
+traffic_recorder = TrafficRecorder(TRAFFIC_LOG_PATH) if TRAFFIC_MODE == "record" else None
+
+_replay_log = None
+_replay_lock = threading.Lock()
+
+# Returns the log replayed from TRAFFIC_LOG_PATH, loading it on first use.
+def replay_log():
+    global _replay_log
+    if _replay_log is None:
+        with _replay_lock:
+            if _replay_log is None:
+                _replay_log = TrafficLog.load(TRAFFIC_LOG_PATH, speed=TRAFFIC_REPLAY_SPEED)
+    return _replay_log
+
+# Set while a recorded classification runs, so calls it makes itself (batch fallbacks) are not
+# recorded as workload of their own.
+_recording = contextvars.ContextVar("traffic_recording", default=False)
+
+# Wraps a classification entry point so each top-level call is recorded as a workload entry.
+def _recorded(func, kind, describe):
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def arecorded(*args, **kwargs):
+            if traffic_recorder is None or _recording.get():
+                return await func(*args, **kwargs)
+            token = _recording.set(True)
+            start, started = time.time(), time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            finally:
+                _recording.reset(token)
+            traffic_recorder.record(kind, start, **describe(*args, **kwargs), result=result,
+                                    latency=round(time.perf_counter() - started, 4))
+            return result
+        return arecorded
+
+    @wraps(func)
+    def recorded(*args, **kwargs):
+        if traffic_recorder is None or _recording.get():
+            return func(*args, **kwargs)
+        token = _recording.set(True)
+        start, started = time.time(), time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _recording.reset(token)
+        traffic_recorder.record(kind, start, **describe(*args, **kwargs), result=result,
+                                latency=round(time.perf_counter() - started, 4))
+        return result
+    return recorded
+
+# Records classify_query() / aclassify_query() calls.
+def recorded_classification(func):
+    return _recorded(func, "classify", lambda query: {"query": query})
+
+# Records classify_queries() / aclassify_queries() calls.
+def recorded_batch_classification(func):
+    return _recorded(
+        func, "classify_batch",
+        lambda queries, batch_size=None, max_concurrency=None: {"queries": queries, "batch_size": batch_size}
+    )
+
+# Fields of an "llm" record for a finished (or failed) call.
+def _llm_fields(prompt, query, response, error, latency):
+    fields = {"key": prompt_key(prompt.system_instruction, prompt.text), "template": prompt.key, "query": query,
+              "prompt": prompt.text, "latency": round(latency, 4)}
+    if error is not None:
+        fields["error"] = str(error)
+        return fields
+    usage = getattr(response, "usage_metadata", None)
+    fields["reply"] = response.text
+    fields["usage"] = [getattr(usage, "prompt_token_count", 0) or 0,
+                       getattr(usage, "candidates_token_count", 0) or 0] if usage is not None else None
+    return fields
+
+# Runs call() (an LLM request for prompt) and records it, including failures.
+def record_llm_call(prompt, query, call):
+    start, started = time.time(), time.perf_counter()
+    try:
+        response = call()
+    except Exception as e:
+        traffic_recorder.record("llm", start, **_llm_fields(prompt, query, None, e, time.perf_counter() - started))
+        raise
+    traffic_recorder.record("llm", start, **_llm_fields(prompt, query, response, None, time.perf_counter() - started))
+    return response
+
+# Async version of record_llm_call(); call() returns an awaitable.
+async def arecord_llm_call(prompt, query, call):
+    start, started = time.time(), time.perf_counter()
+    try:
+        response = await call()
+    except Exception as e:
+        traffic_recorder.record("llm", start, **_llm_fields(prompt, query, None, e, time.perf_counter() - started))
+        raise
+    traffic_recorder.record("llm", start, **_llm_fields(prompt, query, response, None, time.perf_counter() - started))
+    return response
+
+# Wraps SalesforceIntegration.create_case() to record calls, or to serve them from the log when TRAFFIC_MODE=replay.
+def recorded_case_creation(func):
+    @wraps(func)
+    def wrapper(integration, customer_name, query, category, priority, ai_response, escalated=False):
+        payload = {
+            "customer_name": customer_name, "query": query, "category": category,
+            "priority": priority, "ai_response": ai_response, "escalated": escalated
+        }
+        if TRAFFIC_MODE == "replay":
+            log = replay_log()
+            record = log.case(payload)
+            if record is None:
+                return {"success": False, "error": "No recorded Salesforce result for this case"}
+            time.sleep(log.delay(record))
+            return dict(record["result"])
+        if traffic_recorder is None:
+            return func(integration, **payload)
+        start, started = time.time(), time.perf_counter()
+        result = func(integration, **payload)
+        traffic_recorder.record("salesforce", start, payload=payload, result=result,
+                                latency=round(time.perf_counter() - started, 4))
+        return result
+    return wrapper
+
+# Reports recording or replay counters, or None when neither is on.
+def traffic_stats():
+    if traffic_recorder is not None:
+        return traffic_recorder.stats()
+    if _replay_log is not None:
+        return _replay_log.stats()
+    return None
+
+# Nearest-rank percentile in milliseconds of a list of seconds.
+def _percentile_ms(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] * 1000
+
+# Fraction of paired results that agree on every given field.
+def _agreement(pairs, fields):
+    pairs = [(a, b) for a, b in pairs if a and b and "success" not in a]
+    if not pairs:
+        return None
+    return sum(all(a.get(f) == b.get(f) for f in fields) for a, b in pairs) / len(pairs)
+
+# Replays one workload record against the engine, returning its output row.
+async def _replay_one(record, ai_engine, sf_integration):
+    started = time.perf_counter()
+    if record["kind"] == "classify":
+        result = await ai_engine.aclassify_query(record["query"])
+    elif record["kind"] == "classify_batch":
+        result = await ai_engine.aclassify_queries(record["queries"], batch_size=record.get("batch_size"))
+    else:
+        result = await sf_integration.acreate_case(**record["payload"])
+    return {
+        "kind": record["kind"],
+        "t": record["t"],
+        "query": record.get("query") or record.get("payload", {}).get("query"),
+        "recorded": record["result"],
+        "result": result,
+        "recorded_latency": record["latency"],
+        "latency": round(time.perf_counter() - started, 4)
+    }
+
+# Issues the recorded workload at its recorded arrival times divided by speed (all at once for 0).
+async def replay_workload(records, speed, concurrency):
+    import ai_engine
+    from salesforce_integration import sf_integration
+
+    workload = sorted((r for r in records if r["kind"] in ("classify", "classify_batch", "salesforce")),
+                      key=lambda r: r["t"])
+    if not workload:
+        return [], 0.0
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    origin = workload[0]["t"]
+    start = time.perf_counter()
+
+    async def run(record):
+        if speed:
+            await asyncio.sleep(max(0.0, (record["t"] - origin) / speed - (time.perf_counter() - start)))
+        if semaphore is None:
+            return await _replay_one(record, ai_engine, sf_integration)
+        async with semaphore:
+            return await _replay_one(record, ai_engine, sf_integration)
+
+    rows = await asyncio.gather(*(run(record) for record in workload))
+    return rows, time.perf_counter() - start
+
+# Prints count, throughput and latency per kind, plus agreement with the recorded results.
+def print_summary(name, rows, elapsed=None):
+    if elapsed:
+        print(f"{name}: {len(rows)} calls in {elapsed:.2f} s ({len(rows) / elapsed:.1f}/s)")
+    print(f"{'kind':<15} {'count':>6} {'rec p50':>9} {'rec p99':>9} {'p50 ms':>9} {'p99 ms':>9} {'agree':>7}")
+    for kind in ("classify", "classify_batch", "salesforce"):
+        selected = [row for row in rows if row["kind"] == kind]
+        if not selected:
+            continue
+        if kind == "classify":
+            agree = _agreement([(row["recorded"], row["result"]) for row in selected], ("category", "priority"))
+        elif kind == "classify_batch":
+            agree = _agreement([pair for row in selected for pair in zip(row["recorded"], row["result"])],
+                               ("category", "priority"))
+        else:
+            agree = sum(row["recorded"].get("success") == row["result"].get("success") for row in selected) / len(selected)
+        print(
+            f"{kind:<15} {len(selected):>6} {_percentile_ms([r['recorded_latency'] for r in selected], 50):>9.1f} "
+            f"{_percentile_ms([r['recorded_latency'] for r in selected], 99):>9.1f} "
+            f"{_percentile_ms([r['latency'] for r in selected], 50):>9.1f} "
+            f"{_percentile_ms([r['latency'] for r in selected], 99):>9.1f} "
+            f"{agree if agree is None else format(agree, '.1%'):>7}"
+        )
+
+# Compares the classifications of two replay outputs of the same workload (or a recording and a
+# replay of it) in arrival order.
+def compare_runs(baseline_path, candidate_path, limit):
+    baseline, candidate = read_records(baseline_path), read_records(candidate_path)
+    base_engine = next((r for r in baseline if r["kind"] == "engine"), {})
+    cand_engine = next((r for r in candidate if r["kind"] == "engine"), {})
+    baseline = sorted((r for r in baseline if r["kind"] == "classify"), key=lambda r: r["t"])
+    candidate = sorted((r for r in candidate if r["kind"] == "classify"), key=lambda r: r["t"])
+    pairs = list(zip(baseline, candidate))
+    if len(baseline) != len(candidate):
+        print(f"Warning: {len(baseline)} vs {len(candidate)} classifications; comparing the first {len(pairs)}")
+    print(f"{'':<12} {'baseline':>20} {'candidate':>20}")
+    for field in ("prompts", "output_mode", "backends"):
+        print(f"{field:<12} {str(base_engine.get(field, '-')):>20} {str(cand_engine.get(field, '-')):>20}")
+    for pct in (50, 99):
+        print(f"{f'p{pct} ms':<12} {_percentile_ms([a['latency'] for a, _ in pairs], pct):>20.1f} "
+              f"{_percentile_ms([b['latency'] for _, b in pairs], pct):>20.1f}")
+    results = [(a["result"], b["result"]) for a, b in pairs]
+    for fields in (("category",), ("priority",), ("response",)):
+        agree = _agreement(results, fields)
+        print(f"same {fields[0]:<7} {agree if agree is None else format(agree, '.1%'):>41}")
+    differing = [(a, b) for a, b in pairs if (a["result"]["category"], a["result"]["priority"])
+                 != (b["result"]["category"], b["result"]["priority"])]
+    for a, b in differing[:limit]:
+        print(f"- {a['query'][:70]!r}: {a['result']['category']}/{a['result']['priority']} -> "
+              f"{b['result']['category']}/{b['result']['priority']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded helpdesk traffic offline and compare runs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subparsers.add_parser("replay", help="Run a recorded workload against the current engine")
+    replay_parser.add_argument("log", help="Traffic log written with TRAFFIC_MODE=record")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="Time compression of arrivals and upstream latency (0 = no waiting)")
+    replay_parser.add_argument("--concurrency", type=int, default=0, help="Calls in flight at most (0 = unbounded)")
+    replay_parser.add_argument("--live-llm", action="store_true",
+                               help="Call the configured LLM backend instead of replaying recorded replies")
+    replay_parser.add_argument("--output", help="Write one result row per replayed call here, for compare")
+    compare_parser = subparsers.add_parser("compare", help="Compare two replay outputs of the same workload")
+    compare_parser.add_argument("baseline", help="Replay output, or the recorded traffic log itself")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--limit", type=int, default=20, help="Differing classifications to list")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        compare_runs(args.baseline, args.candidate, args.limit)
+        return
+
+    # The engine reads these when it is imported by replay_workload().
+    os.environ.update(TRAFFIC_MODE="replay", TRAFFIC_LOG_PATH=args.log, TRAFFIC_REPLAY_SPEED=str(args.speed))
+    if not args.live_llm:
+        os.environ.update(LLM_BACKEND="replay", LLM_CHEAP_BACKEND="", LLM_HEDGE_BACKEND="")
+    records = read_records(args.log)
+    rows, elapsed = asyncio.run(replay_workload(records, args.speed, args.concurrency))
+
+    import ai_engine
+    from prompts import templates_version
+    engine = {"kind": "engine", "t": time.time(), "prompts": templates_version(), "output_mode": ai_engine.OUTPUT_MODE,
+              "backends": ",".join(ai_engine.llm_router.backends)}
+    print(f"Replayed {args.log} at speed {args.speed:g} with prompts {engine['prompts']}")
+    print_summary("replay", rows, elapsed)
+    stats = sys.modules["traffic_replay"].traffic_stats()
+    if stats:
+        print(", ".join(f"{name} {value}" for name, value in stats.items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for row in [engine] + rows:
+                f.write(json.dumps(row, separators=(",", ":"), default=str) + "\n")
+
+if __name__ == "__main__":
+    main()